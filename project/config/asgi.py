@@ -13,4 +13,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# 앱이 로드된 후에 import
+from notice.stream import notice_stream  # noqa: E402
+
+
+async def application(scope, receive, send):
+    # 알림 스트림은 연결을 오래 유지하므로 Django의 요청 처리를 거치지 않는 ASGI 앱에서 처리
+    if scope["type"] == "http" and scope["path"] == "/api/v1/notices/stream/":
+        return await notice_stream(scope, receive, send)
+    return await django_application(scope, receive, send)
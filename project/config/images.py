@@ -0,0 +1,202 @@
+import logging
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+__all__ = (
+    "VARIANT_WIDTHS",
+    "variant_names",
+    "make_variants",
+    "process",
+    "generate_variants",
+    "blurhash",
+)
+
+logger = logging.getLogger(__name__)
+
+# 원본보다 작은 것만 만드는 가로 크기 (프로필 사진, 피드 미리보기, 화면 너비)
+VARIANT_WIDTHS = (160, 480, 1080)
+# WebP를 지원하지 않는 Pillow에서는 JPEG로
+VARIANT_FORMAT = "WEBP" if features.check("webp") else "JPEG"
+VARIANT_QUALITY = 80
+
+BLURHASH_SIZE = 32
+BLURHASH_COMPONENTS = (4, 3)
+BASE83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+
+def to_rgb(image):
+    # 투명한 부분은 흰 배경으로
+    if image.mode in ("RGBA", "LA") or (
+        image.mode == "P" and "transparency" in image.info
+    ):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def encode83(value, length):
+    return "".join(BASE83[value // 83 ** (length - i - 1) % 83] for i in range(length))
+
+
+def srgb_to_linear(value):
+    value /= 255
+    if value <= 0.04045:
+        return value / 12.92
+    return ((value + 0.055) / 1.055) ** 2.4
+
+
+def linear_to_srgb(value):
+    value = min(max(value, 0), 1)
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def sign_pow(value, exponent):
+    return math.copysign(abs(value) ** exponent, value)
+
+
+def blurhash(image):
+    # 이미지를 불러오기 전에 보여줄 흐린 미리보기 (https://blurha.sh)
+    # 작게 줄인 이미지의 코사인 성분 x_components * y_components개를 base83으로
+    x_components, y_components = BLURHASH_COMPONENTS
+    width = BLURHASH_SIZE
+    height = max(1, round(image.height * BLURHASH_SIZE / image.width))
+    small = image.resize((width, height), Image.BILINEAR)
+    table = [srgb_to_linear(value) for value in range(256)]
+    pixels = [tuple(table[value] for value in pixel) for pixel in small.getdata()]
+
+    factors = []
+    for j in range(y_components):
+        cos_y = [math.cos(math.pi * j * y / height) for y in range(height)]
+        for i in range(x_components):
+            cos_x = [math.cos(math.pi * i * x / width) for x in range(width)]
+            r = g = b = 0
+            for index, (red, green, blue) in enumerate(pixels):
+                basis = cos_x[index % width] * cos_y[index // width]
+                r += basis * red
+                g += basis * green
+                b += basis * blue
+            scale = (1 if i == j == 0 else 2) / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    result = encode83((x_components - 1) + (y_components - 1) * 9, 1)
+    maximum = max((abs(value) for factor in ac for value in factor), default=0)
+    quantised_maximum = max(0, min(82, int(maximum * 166 - 0.5)))
+    maximum = (quantised_maximum + 1) / 166
+    result += encode83(quantised_maximum, 1)
+    result += encode83(
+        (linear_to_srgb(dc[0]) << 16)
+        + (linear_to_srgb(dc[1]) << 8)
+        + linear_to_srgb(dc[2]),
+        4,
+    )
+    for factor in ac:
+        r, g, b = (
+            max(0, min(18, int(sign_pow(value / maximum, 0.5) * 9 + 9.5)))
+            for value in factor
+        )
+        result += encode83(r * 19 * 19 + g * 19 + b, 2)
+    return result
+
+
+def variant_name(name, width):
+    extension = VARIANT_FORMAT.lower().replace("jpeg", "jpg")
+    return f"{os.path.splitext(name)[0]}_w{width}.{extension}"
+
+
+def variant_names(name):
+    return [variant_name(name, width) for width in VARIANT_WIDTHS]
+
+
+def is_image_name(name):
+    # Pillow로 열 수 있는 형식의 확장자인지, 동영상 등은 storage에서 내려받지 않고 건너뛰기
+    extension = os.path.splitext(name)[1].lower()
+    return Image.registered_extensions().get(extension) in Image.OPEN
+
+
+def make_variants(storage, name):
+    # storage의 이미지 name으로 가로 크기별 축소본을 저장하고
+    # {"width", "height", "blurhash", "variants": {가로 크기: 저장된 이름}} 반환, 이미지가 아니면 None
+    if not is_image_name(name):
+        return None
+    try:
+        with storage.open(name) as file:
+            image = Image.open(file)
+            image.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError):
+        return None
+    image = to_rgb(ImageOps.exif_transpose(image))
+
+    variants = {}
+    for width in VARIANT_WIDTHS:
+        if width >= image.width:
+            break
+        variant = variant_name(name, width)
+        # 같은 파일(Blob)을 다시 올린 경우 이미 만든 축소본을 사용
+        if not storage.exists(variant):
+            height = max(1, round(image.height * width / image.width))
+            buffer = BytesIO()
+            image.resize((width, height), Image.LANCZOS, reducing_gap=3.0).save(
+                buffer, VARIANT_FORMAT, quality=VARIANT_QUALITY
+            )
+            variant = storage.save(variant, ContentFile(buffer.getvalue()))
+        variants[str(width)] = variant
+    return {
+        "width": image.width,
+        "height": image.height,
+        "blurhash": blurhash(image),
+        "variants": variants,
+    }
+
+
+def process(model, pk, field_name, name):
+    try:
+        # 이미지가 아닌 파일(동영상 등)은 다시 처리하지 않도록 {}
+        meta = make_variants(model._meta.get_field(field_name).storage, name) or {}
+        # 그 사이에 다른 파일로 바뀌었으면 저장하지 않음
+        model.objects.filter(pk=pk, **{field_name: name}).update(
+            **{f"{field_name}_meta": meta}
+        )
+    except Exception:
+        logger.exception("image variants for %s failed", name)
+
+
+def process_in_background(*args):
+    close_old_connections()
+    try:
+        process(*args)
+    finally:
+        close_old_connections()
+
+
+image_pool = ThreadPoolExecutor(
+    max_workers=max(1, settings.IMAGE_WORKERS), thread_name_prefix="image-variants"
+)
+
+
+def generate_variants(instances, field_name):
+    # instances의 field_name 이미지 축소본을 커밋 후에 백그라운드에서 만들고 <field_name>_meta에 저장
+    # IMAGE_WORKERS가 0이면 커밋 직후 요청을 처리하던 스레드에서 만들기
+    for instance in instances:
+        name = getattr(instance, field_name).name
+        if not name:
+            continue
+        args = (type(instance), instance.pk, field_name, name)
+        if settings.IMAGE_WORKERS:
+            transaction.on_commit(
+                partial(image_pool.submit, process_in_background, *args)
+            )
+        else:
+            transaction.on_commit(partial(process, *args))
@@ -30,6 +30,27 @@ SECRET_KEY = get_secret("SECRET_KEY")
 DEBUG = True
 DEBUG_TOOLBAR = os.getenv("DEBUG_TOOLBAR") in ("true", "True")
 
+# 게시글 좋아요를 프로세스 로컬 버퍼에 모았다가 주기적으로 DB에 반영 (인기 게시글용)
+LIKE_BUFFER_ENABLED = os.getenv("LIKE_BUFFER") in ("true", "True")
+LIKE_BUFFER_FLUSH_INTERVAL = 0.3  # 초 단위, 0이면 백그라운드 반영을 하지 않음
+
+# 알림 생성/취소를 요청 안에서 처리하지 않고 outbox에 넣은 뒤 process_notice_events로 처리
+NOTICE_OUTBOX_ENABLED = os.getenv("NOTICE_OUTBOX") in ("true", "True")
+
+# 알림 스트림(/api/v1/notices/stream/)에서 사용할 pub/sub hub
+# DatabaseHub: 다른 프로세스에서 만든 알림도 전달, InMemoryHub: 같은 프로세스 안에서만 전달
+NOTICE_HUB = os.getenv("NOTICE_HUB", "notice.hub.DatabaseHub")
+# DatabaseHub에서 스트림을 처리하는 프로세스가 새 이벤트를 읽는 주기 (초 단위)
+NOTICE_HUB_POLL_INTERVAL = float(os.getenv("NOTICE_HUB_POLL_INTERVAL", 0.5))
+# DatabaseHub에서 이벤트를 보관하는 시간 (초 단위, 재연결할 때 놓친 이벤트를 전달)
+NOTICE_HUB_RETENTION = int(os.getenv("NOTICE_HUB_RETENTION", 300))
+
+# 공통 친구 계산용 친구 그래프를 프로세스마다 보관하는 시간 (초 단위, 다른 프로세스의 변경이 반영되는 주기)
+FRIEND_GRAPH_TTL = float(os.getenv("FRIEND_GRAPH_TTL", 60))
+
+# 유저 검색 자동완성 결과를 프로세스마다 보관하는 시간 (초 단위)
+AUTOCOMPLETE_CACHE_TTL = float(os.getenv("AUTOCOMPLETE_CACHE_TTL", 10))
+
 SITE_ID = 1
 ALLOWED_HOSTS = ["*"]
 
@@ -223,9 +244,37 @@ STATICFILES_DIRS = [
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# 업로드 크기 제한 (bytes), 넘으면 다 받기 전에 413으로 중단
+MAX_UPLOAD_FILE_SIZE = int(os.getenv("MAX_UPLOAD_FILE_SIZE", 512 * 1024 * 1024))
+MAX_UPLOAD_REQUEST_SIZE = int(os.getenv("MAX_UPLOAD_REQUEST_SIZE", 1024 * 1024 * 1024))
+
+# 이보다 큰 파일은 메모리가 아니라 임시 파일에 받아두기 (bytes)
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5MB
+# 파일이 아닌 요청 본문(form 값, JSON)의 최대 크기
+DATA_UPLOAD_MAX_MEMORY_SIZE = 2621440
+FILE_UPLOAD_TEMP_DIR = os.getenv("FILE_UPLOAD_TEMP_DIR")
+FILE_UPLOAD_HANDLERS = [
+    "config.uploadhandlers.UploadSizeLimitHandler",
+    "django.core.files.uploadhandler.MemoryFileUploadHandler",
+    "django.core.files.uploadhandler.TemporaryFileUploadHandler",
+]
+
 # AWS S3
-DATA_UPLOAD_MAX_MEMORY_SIZE = 1024000000  # value in bytes 1GB here
-FILE_UPLOAD_MAX_MEMORY_SIZE = 1024000000
+# 임시 파일에서 S3로 chunk 단위로 보내는 크기(bytes, 최소 5MB)와 동시에 보내는 chunk 수
+AWS_S3_UPLOAD_CHUNK_SIZE = int(os.getenv("AWS_S3_UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024))
+AWS_S3_UPLOAD_CONCURRENCY = int(os.getenv("AWS_S3_UPLOAD_CONCURRENCY", 4))
+# 여러 파일이 있는 게시글의 파일을 storage에 동시에 올리는 스레드 수 (프로세스마다)
+MEDIA_UPLOAD_WORKERS = int(os.getenv("MEDIA_UPLOAD_WORKERS", 8))
+# 참조하는 곳이 없어진 파일(Blob)을 삭제하기 전에 기다리는 시간 (초 단위, 다시 올리는 중인 파일을 지우지 않도록)
+BLOB_GRACE_PERIOD = int(os.getenv("BLOB_GRACE_PERIOD", 3600))
+# 클라이언트가 storage에 직접 올리는 업로드 URL의 유효 시간 (초 단위, BLOB_GRACE_PERIOD보다 짧게)
+UPLOAD_URL_EXPIRES = int(os.getenv("UPLOAD_URL_EXPIRES", 600))
+# 한번에 발급받을 수 있는 업로드 URL 수
+MAX_UPLOAD_URLS = int(os.getenv("MAX_UPLOAD_URLS", 20))
+# S3 대신 서버의 로컬 업로드 URL로 받기 (개발, 테스트용)
+LOCAL_UPLOAD_URLS = os.getenv("LOCAL_UPLOAD_URLS") in ("true", "True")
+# 업로드된 이미지의 축소본을 만드는 백그라운드 스레드 수, 0이면 요청을 처리하던 스레드에서 커밋 직후 만들기
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", 2))
 
 DEFAULT_FILE_STORAGE = "config.storage.S3DefaultStorage"
 STATICFILES_STORAGE = "config.storage.S3StaticStorage"
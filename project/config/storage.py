@@ -1,3 +1,7 @@
+import os
+
+from boto3.s3.transfer import TransferConfig
+from django.conf import settings
 from storages.backends.s3boto3 import S3Boto3Storage
 
 __all__ = (
@@ -10,6 +14,48 @@ class S3DefaultStorage(S3Boto3Storage):
     default_acl = "private"
     location = "media"
 
+    def _save(self, name, content):
+        # 업로드된 파일을 chunk 단위로 읽어 multipart upload
+        # 한번에 메모리에 올리는 크기는 파일 크기와 상관없이 chunk 크기 * 동시 전송 수까지
+        cleaned_name = self._clean_name(name)
+        name = self._normalize_name(cleaned_name)
+        params = self._get_write_parameters(name, content)
+
+        if not hasattr(content, "seekable") or content.seekable():
+            content.seek(0, os.SEEK_SET)
+        if (
+            self.gzip
+            and params["ContentType"] in self.gzip_content_types
+            and "ContentEncoding" not in params
+        ):
+            content = self._compress_content(content)
+            params["ContentEncoding"] = "gzip"
+
+        self.bucket.Object(name).upload_fileobj(
+            content,
+            ExtraArgs=params,
+            Config=TransferConfig(
+                multipart_threshold=settings.AWS_S3_UPLOAD_CHUNK_SIZE,
+                multipart_chunksize=settings.AWS_S3_UPLOAD_CHUNK_SIZE,
+                max_concurrency=settings.AWS_S3_UPLOAD_CONCURRENCY,
+            ),
+        )
+        return cleaned_name
+
+    def presigned_post(self, name, max_size, expires):
+        # 클라이언트가 서버를 거치지 않고 name에 max_size bytes까지 올릴 수 있는 form의 url, fields
+        key = self._normalize_name(self._clean_name(name))
+        return self.bucket.meta.client.generate_presigned_post(
+            self.bucket_name,
+            key,
+            Fields={"acl": self.default_acl},
+            Conditions=[
+                {"acl": self.default_acl},
+                ["content-length-range", 0, max_size],
+            ],
+            ExpiresIn=expires,
+        )
+
 
 # for static
 class S3StaticStorage(S3Boto3Storage):
@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+__all__ = (
+    "UploadTooLarge",
+    "UploadSizeLimitHandler",
+)
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "업로드할 수 있는 크기를 넘었습니다."
+    default_code = "upload_too_large"
+
+
+def megabytes(size):
+    return f"{size // (1024 * 1024)}MB"
+
+
+class UploadSizeLimitHandler(FileUploadHandler):
+    # 파일을 다 받기 전에 크기 제한을 확인해서 넘으면 바로 중단
+    # FILE_UPLOAD_HANDLERS의 첫번째에 두고, 받은 chunk는 그대로 다음 handler(메모리/임시 파일)로 넘기기
+
+    def handle_raw_input(
+        self, input_data, META, content_length, boundary, encoding=None
+    ):
+        # Content-Length로 요청 전체 크기를 먼저 확인
+        if content_length > settings.MAX_UPLOAD_REQUEST_SIZE:
+            raise UploadTooLarge(
+                f"한번에 {megabytes(settings.MAX_UPLOAD_REQUEST_SIZE)}까지 업로드할 수 있습니다."
+            )
+        self.request_size = 0
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file_size = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        # Content-Length가 없거나 맞지 않는 요청도 받은 만큼 세어서 확인
+        self.file_size += len(raw_data)
+        self.request_size += len(raw_data)
+        if self.file_size > settings.MAX_UPLOAD_FILE_SIZE:
+            raise UploadTooLarge(
+                f"파일은 {megabytes(settings.MAX_UPLOAD_FILE_SIZE)}까지 업로드할 수 있습니다."
+            )
+        if self.request_size > settings.MAX_UPLOAD_REQUEST_SIZE:
+            raise UploadTooLarge(
+                f"한번에 {megabytes(settings.MAX_UPLOAD_REQUEST_SIZE)}까지 업로드할 수 있습니다."
+            )
+        return raw_data
+
+    def file_complete(self, file_size):
+        # 파일은 다음 handler가 만들기
+        return None
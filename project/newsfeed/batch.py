@@ -0,0 +1,154 @@
+from collections import defaultdict
+
+from django.db.models import F, OuterRef, Q, Subquery
+
+from user.models import User
+from .models import Post, Comment
+from .visibility import Visibility
+
+
+class PostBatch:
+    # 한 페이지의 게시글(과 subposts, 공유된 게시글)을 렌더링하는데 필요한 데이터를
+    # 게시글 개수와 상관없이 고정된 개수의 쿼리로 한번에 불러오기
+
+    def __init__(self, posts, user=None, visibility=None):
+        self.user = user
+        if visibility is None and user is not None:
+            visibility = Visibility(user)
+        self.visibility = visibility
+        self.posts = {post.id: post for post in posts}
+
+        # 공유된 게시글
+        shared_ids = {
+            post.shared_post_id
+            for post in posts
+            if post.is_sharing and post.shared_post_id
+        }
+        missing_ids = shared_ids - self.posts.keys()
+        if missing_ids:
+            for post in Post.objects.filter(id__in=missing_ids).select_related(
+                "author"
+            ):
+                self.posts[post.id] = post
+
+        # subposts
+        self.subposts = defaultdict(list)
+        for subpost in (
+            Post.objects.filter(mainpost__in=list(self.posts))
+            .select_related("author")
+            .order_by("id")
+        ):
+            self.subposts[subpost.mainpost_id].append(subpost)
+            self.posts.setdefault(subpost.id, subpost)
+
+        # 작성자
+        missing = [
+            post for post in self.posts.values() if not Post.author.is_cached(post)
+        ]
+        if missing:
+            authors = User.objects.in_bulk({post.author_id for post in missing})
+            for post in missing:
+                post.author = authors[post.author_id]
+
+        post_ids = list(self.posts)
+
+        # 태그된 유저
+        self.tagged_users = defaultdict(list)
+        for tag in (
+            Post.tagged_users.through.objects.filter(post_id__in=post_ids)
+            .select_related("user")
+            .order_by("id")
+        ):
+            self.tagged_users[tag.post_id].append(tag.user)
+
+        # 로그인된 유저의 좋아요, 알림 끄기 여부와 공유된 게시글 작성자와의 친구 여부
+        self.liked = set()
+        self.notice_off = set()
+        if user is not None:
+            self.liked = set(
+                Post.likeusers.through.objects.filter(
+                    post_id__in=post_ids, user_id=user.id
+                ).values_list("post_id", flat=True)
+            )
+            self.notice_off = set(
+                Post.notice_off_users.through.objects.filter(
+                    post_id__in=post_ids, user_id=user.id
+                ).values_list("post_id", flat=True)
+            )
+            self.visibility.prefetch(
+                self.posts[post_id].author_id
+                for post_id in shared_ids
+                if post_id in self.posts
+            )
+
+    def covers(self, post):
+        return post.id in self.posts
+
+
+class CommentBatch:
+    # 한 페이지의 댓글과 각 댓글의 답글 미리보기를 렌더링하는데 필요한 데이터를 한번에 불러오기
+    # 답글 미리보기는 답글이 있는 댓글마다 preview_size개만 불러오므로 스레드 크기와 상관없음
+    # 나머지 답글은 newsfeed/<post_id>/<comment_id>/children/에서
+
+    preview_size = 3
+
+    def __init__(self, comments, user=None):
+        self.user = user
+        self.comments = {comment.id: comment for comment in comments}
+
+        # 답글 미리보기 (먼저 작성된 답글부터), 페이지의 모든 댓글의 미리보기를 한번에
+        # (root, path) 인덱스로 스레드를 읽고, 댓글마다 preview_size번째 답글의 id까지만
+        self.children = defaultdict(list)
+        parents = [comment for comment in comments if comment.children_count]
+        if parents:
+            last_preview = (
+                Comment.objects.filter(parent=OuterRef("parent"))
+                .order_by("id")
+                .values("id")[self.preview_size - 1 : self.preview_size]
+            )
+            for child in (
+                Comment.objects.filter(
+                    root__in={comment.root_id for comment in parents},
+                    parent__in=[comment.id for comment in parents],
+                )
+                .annotate(last_preview=Subquery(last_preview))
+                .filter(Q(last_preview__isnull=True) | Q(id__lte=F("last_preview")))
+                .select_related("author")
+                .order_by("root", "path")
+            ):
+                self.children[child.parent_id].append(child)
+                self.comments.setdefault(child.id, child)
+
+        # 작성자
+        missing = [
+            comment
+            for comment in self.comments.values()
+            if not Comment.author.is_cached(comment)
+        ]
+        if missing:
+            authors = User.objects.in_bulk({comment.author_id for comment in missing})
+            for comment in missing:
+                comment.author = authors[comment.author_id]
+
+        comment_ids = list(self.comments)
+
+        # 태그된 유저
+        self.tagged_users = defaultdict(list)
+        for tag in (
+            Comment.tagged_users.through.objects.filter(comment_id__in=comment_ids)
+            .select_related("user")
+            .order_by("id")
+        ):
+            self.tagged_users[tag.comment_id].append(tag.user)
+
+        # 로그인된 유저의 좋아요 여부
+        self.liked = set()
+        if user is not None:
+            self.liked = set(
+                Comment.likeusers.through.objects.filter(
+                    comment_id__in=comment_ids, user_id=user.id
+                ).values_list("comment_id", flat=True)
+            )
+
+    def covers(self, comment):
+        return comment.id in self.comments
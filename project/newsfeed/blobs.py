@@ -0,0 +1,150 @@
+import hashlib
+import logging
+import os
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from config.images import variant_names
+from user.models import User
+from .models import Blob, Comment, Post
+
+logger = logging.getLogger(__name__)
+
+# Blob을 참조하는 파일 필드
+FILE_FIELDS = {
+    Post: ("file",),
+    Comment: ("file",),
+    User: ("profile_image", "cover_image"),
+}
+# 파일 필드의 max_length
+MAX_NAME_LENGTH = 100
+
+
+def content_hash(file):
+    digest = hashlib.blake2b(digest_size=20)
+    for chunk in file.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def blob_name(storage, digest, filename):
+    # blobs/<해시>/<처음 올린 파일 이름>, 파일 필드 길이에 맞게 파일 이름을 자르기
+    directory = f"blobs/{digest}/"
+    root, extension = os.path.splitext(storage.get_valid_name(filename))
+    extension = extension[:10]
+    root = root[: MAX_NAME_LENGTH - len(directory) - len(extension)] or "file"
+    return directory + root + extension
+
+
+def reserve_blobs(storage, files):
+    # files마다 같은 내용의 Blob 이름을 정하고 touched를 갱신해서 올리는 동안 sweep에서 지워지지 않도록
+    # 이미 같은 내용이 있으면 그 이름을 사용
+    digests = [content_hash(file) for file in files]
+    missing = dict(zip(digests, files))
+    names = {}
+    while missing:
+        Blob.objects.bulk_create(
+            [
+                Blob(hash=digest, name=blob_name(storage, digest, file.name))
+                for digest, file in missing.items()
+            ],
+            ignore_conflicts=True,
+        )
+        Blob.objects.filter(hash__in=missing).update(touched=timezone.now())
+        names.update(Blob.objects.filter(hash__in=missing).values_list("hash", "name"))
+        # 삽입과 조회 사이에 sweep이 지운 Blob은 다시 만들기
+        missing = {
+            digest: file for digest, file in missing.items() if digest not in names
+        }
+    return [names[digest] for digest in digests]
+
+
+def upload_blob(storage, name, file):
+    # 같은 내용이 아직 저장되지 않았을 때만 올리기
+    if storage.exists(name):
+        return
+    saved = storage.save(name, file, max_length=MAX_NAME_LENGTH)
+    if saved != name:
+        # 동시에 같은 내용을 올려서 다른 이름으로 저장된 경우
+        storage.delete(saved)
+
+
+def save_blob(storage, file):
+    name = reserve_blobs(storage, [file])[0]
+    upload_blob(storage, name, file)
+    return name
+
+
+def add_refs(names, delta):
+    for name, count in Counter(name for name in names if name).items():
+        Blob.objects.filter(name=name).update(refcount=F("refcount") + delta * count)
+
+
+def set_blob(instance, field_name, name):
+    # instance의 파일 필드를 name으로 바꾸고 참조 수 갱신
+    # instance 저장은 호출한 쪽에서 같은 트랜잭션 안에서
+    # 불러온 뒤에 다른 요청이 바꿨을 수 있으므로 이전 이름은 row lock을 잡고 다시 읽기
+    old = (
+        type(instance)
+        .objects.select_for_update()
+        .filter(pk=instance.pk)
+        .values_list(field_name, flat=True)
+        .first()
+    )
+    setattr(instance, field_name, name)
+    if old != name:
+        add_refs([name], 1)
+        add_refs([old], -1)
+
+
+def release_blobs(instance):
+    # 삭제된 instance가 쓰던 파일의 참조 수 줄이기
+    add_refs(
+        [
+            getattr(instance, field_name).name
+            for field_name in FILE_FIELDS[type(instance)]
+        ],
+        -1,
+    )
+
+
+def sweep(storage=None, batch_size=100):
+    # 참조하는 곳이 없고 BLOB_GRACE_PERIOD 동안 다시 사용되지 않은 파일을 축소본과 함께 삭제, 삭제한 수 반환
+    storage = storage or Post._meta.get_field("file").storage
+    expired_before = timezone.now() - timedelta(seconds=settings.BLOB_GRACE_PERIOD)
+    deleted = 0
+    last_id = 0
+    while True:
+        blob_ids = list(
+            Blob.objects.filter(
+                id__gt=last_id, refcount__lte=0, touched__lt=expired_before
+            )
+            .order_by("id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not blob_ids:
+            return deleted
+        last_id = blob_ids[-1]
+        for blob_id in blob_ids:
+            try:
+                with transaction.atomic():
+                    # 그 사이에 다시 사용됐으면 건너뛰기, 파일을 지우는 동안 같은 내용을 올리는 요청은 대기
+                    blob = (
+                        Blob.objects.select_for_update()
+                        .filter(id=blob_id, refcount__lte=0, touched__lt=expired_before)
+                        .first()
+                    )
+                    if blob is None:
+                        continue
+                    for name in (blob.name, *variant_names(blob.name)):
+                        storage.delete(name)
+                    blob.delete()
+            except Exception:
+                logger.exception("blob %s sweep failed", blob_id)
+                continue
+            deleted += 1
@@ -0,0 +1,166 @@
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+
+class LikeBuffer:
+    # 인기 게시글의 좋아요 요청이 같은 Post/Notice row lock에 몰리지 않도록
+    # 좋아요/취소를 프로세스 로컬 로그에 쌓아두고 백그라운드 스레드가 주기적으로 DB에 반영
+    # pending[(post_id, user_id)] = [DB에 반영된 상태, 최종 상태]
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.pending = {}
+        self.flushing = {}
+        self.deltas = defaultdict(int)
+        self.flusher = None
+
+    def get_state(self, key):
+        return self.pending.get(key) or self.flushing.get(key)
+
+    def is_liked(self, post_id, user_id):
+        # DB에 아직 반영되지 않은 좋아요 상태, 없으면 None
+        with self.lock:
+            state = self.get_state((post_id, user_id))
+        return state[1] if state else None
+
+    def delta(self, post_id):
+        # DB의 likes에 아직 반영되지 않은 좋아요 수
+        with self.lock:
+            return self.deltas.get(post_id, 0)
+
+    def toggle(self, post, user):
+        key = (post.id, user.id)
+        stored = None
+
+        while True:
+            with self.lock:
+                state = self.get_state(key)
+                if state or stored is not None:
+                    liked = state[1] if state else stored
+                    self.pending.setdefault(key, [liked, liked])[1] = not liked
+                    self.deltas[post.id] += -1 if liked else 1
+                    break
+
+            # DB 조회는 lock 밖에서
+            stored = post.likeusers.filter(id=user.id).exists()
+
+        self.start()
+        return not liked
+
+    def start(self):
+        interval = settings.LIKE_BUFFER_FLUSH_INTERVAL
+        if not interval or self.flusher:
+            return
+        with self.lock:
+            if self.flusher:
+                return
+            self.flusher = threading.Thread(
+                target=self.run, args=(interval,), name="like-buffer", daemon=True
+            )
+            self.flusher.start()
+
+    def run(self, interval):
+        while True:
+            time.sleep(interval)
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                # 반영에 실패한 좋아요는 다음 주기에 다시 시도
+                logger.exception("like buffer flush failed")
+
+    def close(self):
+        # 프로세스 종료시 flusher(daemon 스레드)가 반영하지 못한 좋아요를 반영
+        with self.lock:
+            if not self.pending and not self.flushing:
+                return
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("like buffer flush at exit failed")
+
+    def flush(self):
+        with self.flush_lock:
+            with self.lock:
+                # 이전에 실패한 반영이 있으면 그 이후의 요청과 합쳐서 다시 시도
+                for key, state in self.flushing.items():
+                    self.pending.setdefault(key, list(state))[0] = state[0]
+                self.flushing, self.pending = self.pending, {}
+
+            # 좋아요 후 취소처럼 최종 상태가 바뀌지 않은 요청은 DB 작업 없이 상쇄
+            changed = {
+                key: state[1]
+                for key, state in self.flushing.items()
+                if state[0] != state[1]
+            }
+            if changed:
+                self.apply(changed)
+
+            with self.lock:
+                for (post_id, _), state in self.flushing.items():
+                    self.deltas[post_id] -= state[1] - state[0]
+                    if not self.deltas[post_id]:
+                        del self.deltas[post_id]
+                self.flushing = {}
+
+    @transaction.atomic
+    def apply(self, changed):
+        # 순환 import 방지
+        from notice.views import ApplyPostLikeNotices
+
+        through = Post.likeusers.through
+        post_ids = {post_id for post_id, _ in changed}
+        user_ids = {user_id for _, user_id in changed}
+
+        existing = {
+            (post_id, user_id): through_id
+            for through_id, post_id, user_id in through.objects.filter(
+                post_id__in=post_ids, user_id__in=user_ids
+            ).values_list("id", "post_id", "user_id")
+        }
+        liked = [key for key, state in changed.items() if state and key not in existing]
+        unliked = [
+            key for key, state in changed.items() if not state and key in existing
+        ]
+
+        through.objects.bulk_create(
+            [through(post_id=post_id, user_id=user_id) for post_id, user_id in liked],
+            ignore_conflicts=True,
+        )
+        through.objects.filter(id__in=[existing[key] for key in unliked]).delete()
+
+        deltas = defaultdict(int)
+        for post_id, _ in liked:
+            deltas[post_id] += 1
+        for post_id, _ in unliked:
+            deltas[post_id] -= 1
+        # 바뀐 개수가 같은 게시글끼리 한번의 UPDATE
+        post_ids_by_delta = defaultdict(list)
+        for post_id, delta in deltas.items():
+            if delta:
+                post_ids_by_delta[delta].append(post_id)
+        # likes가 likeusers와 어긋나 있어도 음수가 되지 않도록
+        for delta, ids in post_ids_by_delta.items():
+            Post.objects.filter(id__in=ids).update(
+                likes=Greatest(F("likes") + delta, 0)
+            )
+
+        # 알림은 작성자마다 한번씩 보내지 않고 모아서 반영
+        ApplyPostLikeNotices(liked, unliked)
+
+
+like_buffer = LikeBuffer()
+atexit.register(like_buffer.close)
@@ -0,0 +1,100 @@
+import statistics
+import tempfile
+import time
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from newsfeed.media import FILE_FIELD, upload_media
+
+
+class SlowStorage(FileSystemStorage):
+    # S3 대신 요청마다 latency만큼 기다리는 로컬 storage
+
+    def __init__(self, latency, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = latency
+
+    def _save(self, name, content):
+        time.sleep(self.latency)
+        return super()._save(name, content)
+
+    def exists(self, name):
+        time.sleep(self.latency)
+        return super().exists(name)
+
+    def delete(self, name):
+        time.sleep(self.latency)
+        super().delete(name)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "latency가 있는 로컬 storage로 게시글 파일을 순서대로 올릴 때와 동시에 올릴 때의 시간 비교하기"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--files", type=int, default=10)
+        parser.add_argument("--size", type=int, default=1024 * 1024, help="bytes")
+        parser.add_argument("--latency", type=float, default=50, help="ms")
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        # 만든 Blob은 롤백
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        with tempfile.TemporaryDirectory() as location:
+            storage = SlowStorage(options["latency"] / 1000, location=location)
+
+            def files():
+                # 파일마다 다른 내용
+                return [
+                    ContentFile(
+                        i.to_bytes(4, "big") * (options["size"] // 4), name=f"{i}.jpg"
+                    )
+                    for i in range(options["files"])
+                ]
+
+            def serial():
+                # 이전: 트랜잭션 안에서 파일마다 subpost.file.save
+                return [
+                    storage.save(
+                        f"benchmark/{file.name}",
+                        file,
+                        max_length=FILE_FIELD.max_length,
+                    )
+                    for file in files()
+                ]
+
+            def clear(names):
+                for name in names:
+                    storage.delete(name)
+
+            for label, upload, cleanup in (
+                ("serial", serial, clear),
+                ("parallel", lambda: upload_media(files(), storage), clear),
+                # 같은 파일을 다시 올리면 존재 여부만 확인
+                ("parallel, duplicate", lambda: upload_media(files(), storage), None),
+            ):
+                latencies = []
+                for _ in range(options["repeat"]):
+                    started = time.perf_counter()
+                    names = upload()
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    if cleanup:
+                        cleanup(names)
+                self.stdout.write(
+                    f"{label}: 파일 {options['files']}개, "
+                    f"p50 {statistics.median(latencies):.1f}ms, "
+                    f"max {max(latencies):.1f}ms"
+                )
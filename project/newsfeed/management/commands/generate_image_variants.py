@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from config.images import process
+from newsfeed.models import Comment, Post
+from user.models import User
+
+TARGETS = (
+    (Post, "file"),
+    (Comment, "file"),
+    (User, "profile_image"),
+    (User, "cover_image"),
+)
+
+
+class Command(BaseCommand):
+    help = "축소본이 없는 이미지(이 기능 이전에 올라온 이미지 등)의 축소본 만들기"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+
+    def handle(self, *args, **options):
+        for model, field_name in TARGETS:
+            count = 0
+            last_pk = 0
+            while True:
+                rows = list(
+                    model.objects.filter(
+                        pk__gt=last_pk, **{f"{field_name}_meta__isnull": True}
+                    )
+                    .exclude(**{field_name: ""})
+                    .order_by("pk")
+                    .values_list("pk", field_name)[: options["batch_size"]]
+                )
+                if not rows:
+                    break
+                for pk, name in rows:
+                    process(model, pk, field_name, name)
+                last_pk = rows[-1][0]
+                count += len(rows)
+            self.stdout.write(f"{model.__name__}.{field_name}: {count}개")
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from newsfeed.models import Post, Comment
+
+
+class Command(BaseCommand):
+    help = "Post의 comment_count, share_count를 실제 댓글 수, 공유 횟수로 다시 계산해서 복구"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        last_id = 0
+        repaired = 0
+
+        while True:
+            posts = list(
+                Post.objects.filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", "comment_count", "share_count")[:batch_size]
+            )
+            if not posts:
+                break
+            last_id = posts[-1][0]
+            post_ids = [post[0] for post in posts]
+
+            comment_counts = dict(
+                Comment.objects.filter(post__in=post_ids)
+                .values("post")
+                .annotate(count=Count("id"))
+                .values_list("post", "count")
+            )
+            share_counts = dict(
+                Post.objects.filter(shared_post__in=post_ids)
+                .values("shared_post")
+                .annotate(count=Count("id"))
+                .values_list("shared_post", "count")
+            )
+
+            for post_id, comment_count, share_count in posts:
+                actual_comments = comment_counts.get(post_id, 0)
+                actual_shares = share_counts.get(post_id, 0)
+                if (comment_count, share_count) == (actual_comments, actual_shares):
+                    continue
+
+                # 계산하는 동안 값이 바뀐 게시글은 건너뛰고 다음 실행 때 복구
+                repaired += Post.objects.filter(
+                    id=post_id, comment_count=comment_count, share_count=share_count
+                ).update(comment_count=actual_comments, share_count=actual_shares)
+
+        self.stdout.write(f"{repaired}개의 게시글을 복구했습니다.")
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from newsfeed.blobs import sweep
+
+
+class Command(BaseCommand):
+    help = "참조하는 게시글/댓글/프로필이 없는 파일(Blob)을 축소본과 함께 삭제하기"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--loop", action="store_true", help="종료하지 않고 주기적으로 삭제하기")
+        parser.add_argument("--interval", type=float, default=3600, help="삭제 주기(초)")
+
+    def handle(self, *args, **options):
+        deleted = 0
+        while True:
+            deleted += sweep(batch_size=options["batch_size"])
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+            close_old_connections()
+
+        self.stdout.write(f"{deleted}개의 파일을 삭제했습니다.")
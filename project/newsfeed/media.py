@@ -0,0 +1,31 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+
+from .blobs import reserve_blobs, upload_blob
+from .models import Post
+
+FILE_FIELD = Post._meta.get_field("file")
+
+# 프로세스 전체에서 storage에 동시에 올리는 파일 수를 MEDIA_UPLOAD_WORKERS개로 제한
+upload_pool = ThreadPoolExecutor(
+    max_workers=settings.MEDIA_UPLOAD_WORKERS, thread_name_prefix="media-upload"
+)
+
+
+def upload_media(files, storage=None):
+    # DB 트랜잭션을 열기 전에 files를 storage에 동시에 올리고 저장된 이름(Blob) 목록 반환
+    # 트랜잭션이 롤백되거나 일부만 올라가서 참조하는 곳이 없는 파일은 blobs.sweep에서 삭제
+    storage = storage or FILE_FIELD.storage
+    if not files:
+        return []
+    names = reserve_blobs(storage, files)
+    # 같은 파일이 여러번 있으면 한번만
+    futures = [
+        upload_pool.submit(upload_blob, storage, name, file)
+        for name, file in dict(zip(names, files)).items()
+    ]
+    wait(futures)
+    for future in futures:
+        future.result()
+    return names
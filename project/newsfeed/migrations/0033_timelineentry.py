@@ -0,0 +1,82 @@
+# Generated by Django 3.2.6 on 2026-10-18 09:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_timeline(apps, schema_editor):
+    Post = apps.get_model("newsfeed", "Post")
+    User = apps.get_model("user", "User")
+    TimelineEntry = apps.get_model("newsfeed", "TimelineEntry")
+
+    entries = []
+    for post in Post.objects.filter(mainpost=None).iterator():
+        entries.append(
+            TimelineEntry(user_id=post.author_id, post_id=post.id, created=post.created)
+        )
+        if post.scope > 1:
+            friends = User.objects.get(id=post.author_id).friends.values_list(
+                "id", flat=True
+            )
+            entries += [
+                TimelineEntry(user_id=friend, post_id=post.id, created=post.created)
+                for friend in friends
+            ]
+        if len(entries) >= 1000:
+            TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+            entries = []
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("newsfeed", "0032_auto_20220120_2355"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TimelineEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created", models.DateTimeField()),
+                (
+                    "post",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="timeline_entries",
+                        to="newsfeed.post",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="timeline",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="timelineentry",
+            index=models.Index(
+                fields=["user", "-created"], name="newsfeed_ti_user_id_6c8930_idx"
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="timelineentry",
+            unique_together={("user", "post")},
+        ),
+        migrations.RunPython(backfill_timeline, migrations.RunPython.noop),
+    ]
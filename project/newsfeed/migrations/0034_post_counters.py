@@ -0,0 +1,47 @@
+# Generated by Django 3.2.6 on 2026-10-18 09:19
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_counters(apps, schema_editor):
+    Post = apps.get_model("newsfeed", "Post")
+    Comment = apps.get_model("newsfeed", "Comment")
+
+    comment_counts = (
+        Comment.objects.values("post")
+        .annotate(count=Count("id"))
+        .values_list("post", "count")
+    )
+    for post_id, count in comment_counts:
+        Post.objects.filter(id=post_id).update(comment_count=count)
+
+    share_counts = (
+        Post.objects.exclude(shared_post=None)
+        .values("shared_post")
+        .annotate(count=Count("id"))
+        .values_list("shared_post", "count")
+    )
+    for post_id, count in share_counts:
+        Post.objects.filter(id=post_id).update(share_count=count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("newsfeed", "0033_timelineentry"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="comment_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="share_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 3.2.6 on 2026-10-18 09:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_comment_path(apps, schema_editor):
+    Comment = apps.get_model("newsfeed", "Comment")
+
+    # 부모 댓글의 path가 먼저 채워지도록 depth 순서대로
+    paths = {}
+    for comment in Comment.objects.order_by("depth", "id").iterator():
+        path = f"{comment.id:010d}/"
+        if comment.parent_id:
+            root_id, parent_path = paths[comment.parent_id]
+            path = parent_path + path
+        else:
+            root_id = comment.id
+        paths[comment.id] = (root_id, path)
+        Comment.objects.filter(id=comment.id).update(root=root_id, path=path)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("newsfeed", "0034_post_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="comment",
+            name="path",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="comment",
+            name="root",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="descendants",
+                to="newsfeed.comment",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["root", "path"], name="newsfeed_co_root_id_d4a3cc_idx"
+            ),
+        ),
+        migrations.RunPython(backfill_comment_path, migrations.RunPython.noop),
+    ]
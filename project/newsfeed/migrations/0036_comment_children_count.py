@@ -0,0 +1,33 @@
+# Generated by Django 3.2.6 on 2026-10-18 09:59
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_children_count(apps, schema_editor):
+    Comment = apps.get_model("newsfeed", "Comment")
+
+    counts = (
+        Comment.objects.exclude(parent=None)
+        .values("parent")
+        .annotate(count=Count("id"))
+        .values_list("parent", "count")
+    )
+    for comment_id, count in counts:
+        Comment.objects.filter(id=comment_id).update(children_count=count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("newsfeed", "0035_comment_path"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="comment",
+            name="children_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_children_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.6 on 2026-10-18 10:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("newsfeed", "0036_comment_children_count"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["post", "depth", "id"], name="newsfeed_co_post_id_1aedec_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["author", "mainpost", "-created", "scope"],
+                name="newsfeed_po_author__495e15_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.2.6 on 2026-10-18 11:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("newsfeed", "0038_image_meta"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Blob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("hash", models.CharField(max_length=40, unique=True)),
+                ("name", models.CharField(max_length=100, unique=True)),
+                ("refcount", models.IntegerField(default=0)),
+                ("touched", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="blob",
+            index=models.Index(
+                fields=["refcount", "touched"], name="newsfeed_bl_refcoun_b9fca3_idx"
+            ),
+        ),
+    ]
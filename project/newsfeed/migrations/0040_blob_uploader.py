@@ -0,0 +1,27 @@
+# Generated by Django 3.2.6 on 2026-10-18 11:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("newsfeed", "0039_blob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="blob",
+            name="uploader",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+    ]
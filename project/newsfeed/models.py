@@ -34,6 +34,8 @@ class Post(NewsfeedObject):
         upload_to=get_directory_path,
         blank=True,
     )
+    # 이미지 크기, blurhash와 축소본 이름 (config.images.make_variants)
+    file_meta = models.JSONField(null=True, blank=True)
 
     shared_post = models.ForeignKey(
         "self",
@@ -51,6 +53,17 @@ class Post(NewsfeedObject):
 
     tagged_users = models.ManyToManyField(User, blank=True, related_name="tagged_posts")
 
+    # 피드 렌더링시 매번 count 하지 않도록 저장해두는 값 (repair_post_counters로 복구 가능)
+    comment_count = models.PositiveIntegerField(default=0)
+    share_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # 유저 프로필 피드: author, mainpost=None으로 거르고 scope를 확인한 뒤 -created 순서
+            # scope는 범위 조건이라 정렬에 쓰이도록 created 뒤에 두기
+            models.Index(fields=["author", "mainpost", "-created", "scope"]),
+        ]
+
     def get_user_url(self):
         # 게시글에서 유저를 누르면 유저 프로필로 갈 수 있게 하기 위함
         return f"/api/v1/user/{self.author}/"
@@ -67,10 +80,61 @@ class Comment(NewsfeedObject):
     depth = models.PositiveIntegerField(default=0)
 
     file = models.FileField(upload_to=comment_directory_path, blank=True)
+    file_meta = models.JSONField(null=True, blank=True)
 
     tagged_users = models.ManyToManyField(
         User, blank=True, related_name="tagged_comments"
     )
 
+    # 댓글 트리를 한번의 쿼리로 불러오기 위한 materialized path
+    # root: 최상위 댓글(최상위 댓글은 자기 자신), path: 최상위 댓글부터의 id를 이어붙인 값
+    root = models.ForeignKey(
+        "self", on_delete=CASCADE, null=True, blank=True, related_name="descendants"
+    )
+    path = models.CharField(max_length=255, blank=True)
+    children_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["root", "path"]),
+            # 게시글의 최상위 댓글 목록 (post, depth=0, -id 순서)
+            models.Index(fields=["post", "depth", "id"]),
+        ]
+
     def get_user_url(self):
         return f"/api/v1/user/{self.author}/"
+
+    def build_path(self):
+        # id 순서와 문자열 순서가 같도록 0으로 채우기
+        path = f"{self.id:010d}/"
+        if self.parent_id:
+            return self.parent.root_id, self.parent.path + path
+        return self.id, path
+
+
+class TimelineEntry(models.Model):
+    # 홈 피드용 fan-out-on-write 테이블: 피드를 볼 유저(user)마다 볼 수 있는 mainpost를 미리 기록
+    user = models.ForeignKey(User, on_delete=CASCADE, related_name="timeline")
+    post = models.ForeignKey(Post, on_delete=CASCADE, related_name="timeline_entries")
+    created = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("user", "post")
+        indexes = [models.Index(fields=["user", "-created"])]
+
+
+class Blob(models.Model):
+    # 내용의 해시(BLAKE2)로 한번만 저장하는 파일, 같은 파일을 다시 올리면 저장된 파일(name)을 같이 사용
+    # refcount: 이 파일을 쓰는 게시글/댓글/프로필 파일 필드 수, 0이고 touched가 오래되면 sweep에서 삭제
+    hash = models.CharField(max_length=40, unique=True)
+    name = models.CharField(max_length=100, unique=True)
+    refcount = models.IntegerField(default=0)
+    # 마지막으로 올리거나 다시 사용한 시간
+    touched = models.DateTimeField(auto_now=True)
+    # 클라이언트가 storage에 직접 올리도록 발급한 파일이면 발급받은 유저, 그 유저만 게시글/댓글에 사용 가능
+    uploader = models.ForeignKey(
+        User, null=True, blank=True, on_delete=models.SET_NULL, related_name="+"
+    )
+
+    class Meta:
+        indexes = [models.Index(fields=["refcount", "touched"])]
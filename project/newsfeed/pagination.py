@@ -5,3 +5,10 @@ class NoticePagination(CursorPagination):
     page_size = 10
     ordering = "-created"
     cursor_query_param = "c"
+
+
+class CommentChildrenPagination(CursorPagination):
+    # 답글을 작성 순서대로 id 기준 keyset pagination
+    page_size = 10
+    ordering = "id"
+    cursor_query_param = "c"
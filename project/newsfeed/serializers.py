@@ -1,15 +1,94 @@
+from django.conf import settings
 from django.shortcuts import get_object_or_404
 from drf_yasg.utils import swagger_serializer_method
+from django.db import models
+from django.db.models import F
 from rest_framework import serializers
 from rest_framework_jwt.settings import api_settings
 from .models import Post, Comment
-from user.serializers import UserSerializer
+from user.serializers import ImageVariantsField, UserSerializer
 from user.models import User
 from .utils import format_time
+from .batch import PostBatch, CommentBatch
+from .visibility import get_visibility
+from .likebuffer import like_buffer
 from pytz import timezone
 
 
-class PostSerializer(serializers.ModelSerializer):
+def post_batch(posts, context):
+    request = context.get("request")
+    if request is None:
+        return PostBatch(posts)
+    return PostBatch(posts, request.user, get_visibility(request))
+
+
+def with_post_batch(posts, context):
+    # posts를 모두 포함하는 PostBatch가 context에 없으면 새로 만들어 추가한 context
+    batch = context.get("batch")
+    if batch is not None and all(batch.covers(post) for post in posts):
+        return context
+    return {**context, "batch": post_batch(posts, context)}
+
+
+class PostBatchListSerializer(serializers.ListSerializer):
+    # 렌더링할 게시글 목록이 정해지면 PostBatch를 한번 만들어 context로 child에 전달
+    def __init__(self, instance=None, *args, **kwargs):
+        if instance is not None:
+            instance = list(
+                instance.all() if isinstance(instance, models.Manager) else instance
+            )
+            kwargs["context"] = with_post_batch(instance, kwargs.get("context", {}))
+        super().__init__(instance, *args, **kwargs)
+
+
+class PostBatchMixin:
+    # 게시글 렌더링에 필요한 데이터는 PostBatch에서 가져오기
+    # 게시글 하나를 렌더링할 때는 여기서, 목록은 PostBatchListSerializer에서 batch를 만들고
+    # subposts, 공유된 게시글은 같은 batch를 context로 전달받음
+
+    def __init__(self, instance=None, *args, **kwargs):
+        if isinstance(instance, Post):
+            kwargs["context"] = with_post_batch([instance], kwargs.get("context", {}))
+        super().__init__(instance, *args, **kwargs)
+
+    def to_representation(self, post):
+        data = super().to_representation(post)
+        if "likes" in data:
+            data["likes"] += like_buffer.delta(post.id)
+        return data
+
+    @property
+    def batch(self):
+        return self.context["batch"]
+
+    def get_posted_at(self, post):
+        return format_time(post.created)
+
+    def get_author(self, post):
+        return UserSerializer(post.author).data
+
+    def get_is_liked(self, post):
+        if not self.batch.user:
+            return None
+        buffered = like_buffer.is_liked(post.id, self.batch.user.id)
+        if buffered is not None:
+            return buffered
+        return post.id in self.batch.liked
+
+    def get_comments(self, post):
+        return post.comment_count
+
+    def get_shared_counts(self, post):
+        return post.share_count
+
+    def get_is_noticed(self, post):
+        return post.id not in self.batch.notice_off
+
+    def get_tagged_users(self, post):
+        return TagUserSerializer(self.batch.tagged_users[post.id], many=True).data
+
+
+class PostSerializer(PostBatchMixin, serializers.ModelSerializer):
 
     subposts = serializers.SerializerMethodField()
     is_liked = serializers.SerializerMethodField()
@@ -24,6 +103,7 @@ class PostSerializer(serializers.ModelSerializer):
     class Meta:
 
         model = Post
+        list_serializer_class = PostBatchListSerializer
 
         fields = (
             "id",
@@ -64,6 +144,9 @@ class PostSerializer(serializers.ModelSerializer):
             post.shared_post = shared_post
             post.is_sharing = True
             post.save()
+            Post.objects.filter(id=shared_post.id).update(
+                share_count=F("share_count") + 1
+            )
 
         return post
 
@@ -82,67 +165,31 @@ class PostSerializer(serializers.ModelSerializer):
 
         return data
 
-    def get_posted_at(self, post):
-        return format_time(post.created)
-
     def get_subposts(self, post):
 
-        return SubPostSerializer(post.subposts, many=True, context=self.context).data
-
-    def get_author(self, post):
-        return UserSerializer(post.author).data
-
-    def get_is_liked(self, post):
-        request = self.context.get("request")
-        if not request:
-            return None
-
-        if post.likeusers.filter(pk=request.user.id).exists():
-            return True
-
-        return False
-
-    def get_comments(self, post):
-        return post.comments.count()
+        return SubPostSerializer(
+            self.batch.subposts[post.id], many=True, context=self.context
+        ).data
 
     def get_shared_post(self, post):
 
         if not post.is_sharing:
             return None
 
-        shared_post = post.shared_post
+        shared_post = self.batch.posts.get(post.shared_post_id)
 
         if not shared_post:
             return None
 
-        user = self.context["request"].user
-        if user == shared_post.author:
-            pass
-        elif user in shared_post.author.friends.all():
-            if shared_post.scope == 1:
-                return None
-        else:
-            if shared_post.scope != 3:
-                return None
+        if not self.batch.visibility.can_view(shared_post):
+            return None
 
         return SharedPostSerializer(shared_post, context=self.context).data
 
-    def get_shared_counts(self, post):
-        return post.sharing_posts.count()
-
-    def get_is_noticed(self, post):
-        user = self.context["request"].user
-        if post.notice_off_users.filter(id=user.id).exists():
-            return False
-        else:
-            return True
-
-    def get_tagged_users(self, post):
-        return TagUserSerializer(post.tagged_users, many=True).data
 
+class SubPostSerializer(PostBatchMixin, serializers.ModelSerializer):
 
-class SubPostSerializer(serializers.ModelSerializer):
-
+    file_variants = ImageVariantsField(source="file_meta")
     posted_at = serializers.SerializerMethodField()
     comments = serializers.SerializerMethodField()
     is_liked = serializers.SerializerMethodField()
@@ -157,6 +204,7 @@ class SubPostSerializer(serializers.ModelSerializer):
             "content",
             "mainpost",
             "file",
+            "file_variants",
             "likes",
             "posted_at",
             "comments",
@@ -167,37 +215,9 @@ class SubPostSerializer(serializers.ModelSerializer):
             "tagged_users",
         )
 
-    def get_posted_at(self, post):
-        return format_time(post.created)
-
-    def get_comments(self, post):
-        return post.comments.count()
-
-    def get_shared_counts(self, post):
-        return post.sharing_posts.count()
-
-    def get_is_liked(self, post):
-        request = self.context.get("request")
-        if not request:
-            return None
-
-        if post.likeusers.filter(pk=request.user.id).exists():
-            return True
-
-        return False
-
-    def get_is_noticed(self, post):
-        user = self.context["request"].user
-        if post.notice_off_users.filter(id=user.id).exists():
-            return False
-        else:
-            return True
-
-    def get_tagged_users(self, post):
-        return TagUserSerializer(post.tagged_users, many=True).data
-
 
-class SharedPostSerializer(serializers.ModelSerializer):
+class SharedPostSerializer(PostBatchMixin, serializers.ModelSerializer):
+    file_variants = ImageVariantsField(source="file_meta")
     subposts = serializers.SerializerMethodField()
     author = serializers.SerializerMethodField()
     shared_counts = serializers.SerializerMethodField()
@@ -216,6 +236,7 @@ class SharedPostSerializer(serializers.ModelSerializer):
             "author",
             "content",
             "file",
+            "file_variants",
             "posted_at",
             "mainpost",
             "subposts",
@@ -228,47 +249,15 @@ class SharedPostSerializer(serializers.ModelSerializer):
             "is_noticed",
         )
 
-    def get_posted_at(self, post):
-        return format_time(post.created)
-
     def get_subposts(self, post):
 
-        if not post.mainpost:
+        if not post.mainpost_id:
             return SharedPostSerializer(
-                post.subposts, many=True, context=self.context
+                self.batch.subposts[post.id], many=True, context=self.context
             ).data
         else:
             return None
 
-    def get_author(self, post):
-        return UserSerializer(post.author).data
-
-    def get_tagged_users(self, post):
-        return TagUserSerializer(post.tagged_users, many=True).data
-
-    def get_shared_counts(self, post):
-        return post.sharing_posts.count()
-
-    def get_is_liked(self, post):
-        request = self.context.get("request")
-        if not request:
-            return None
-
-        if post.likeusers.filter(pk=request.user.id).exists():
-            return True
-
-        return False
-
-    def get_comments(self, post):
-        return post.comments.count()
-
-    def get_is_noticed(self, post):
-        user = self.context["request"].user
-        if post.notice_off_users.filter(id=user.id).exists():
-            return False
-        else:
-            return True
-
 
 class PostLikeSerializer(serializers.ModelSerializer):
     likeusers = serializers.SerializerMethodField()
@@ -344,6 +333,7 @@ class CommentCreateSerializer(serializers.ModelSerializer):
 
 
 class CommentSerializer(serializers.ModelSerializer):
+    file_variants = ImageVariantsField(source="file_meta")
     is_liked = serializers.SerializerMethodField()
     author = serializers.SerializerMethodField()
     tagged_users = serializers.SerializerMethodField()
@@ -358,6 +348,7 @@ class CommentSerializer(serializers.ModelSerializer):
             "author",
             "content",
             "file",
+            "file_variants",
             "parent",
             "depth",
             "created",
@@ -383,7 +374,31 @@ class CommentSerializer(serializers.ModelSerializer):
         return TagUserSerializer(post.tagged_users, many=True).data
 
 
+def with_comment_batch(comments, context):
+    # comments를 모두 포함하는 CommentBatch가 context에 없으면 새로 만들어 추가한 context
+    batch = context.get("comment_batch")
+    if batch is not None and all(batch.covers(comment) for comment in comments):
+        return context
+    request = context.get("request")
+    return {
+        **context,
+        "comment_batch": CommentBatch(comments, request.user if request else None),
+    }
+
+
+class CommentBatchListSerializer(serializers.ListSerializer):
+    # 렌더링할 댓글 목록이 정해지면 CommentBatch를 한번 만들어 context로 child에 전달
+    def __init__(self, instance=None, *args, **kwargs):
+        if instance is not None:
+            instance = list(
+                instance.all() if isinstance(instance, models.Manager) else instance
+            )
+            kwargs["context"] = with_comment_batch(instance, kwargs.get("context", {}))
+        super().__init__(instance, *args, **kwargs)
+
+
 class CommentListSerializer(serializers.ModelSerializer):
+    file_variants = ImageVariantsField(source="file_meta")
     author = serializers.SerializerMethodField()
     posted_at = serializers.SerializerMethodField()
     children_count = serializers.SerializerMethodField()
@@ -398,6 +413,7 @@ class CommentListSerializer(serializers.ModelSerializer):
             "author",
             "content",
             "file",
+            "file_variants",
             "depth",
             "likes",
             "posted_at",
@@ -407,6 +423,19 @@ class CommentListSerializer(serializers.ModelSerializer):
             "is_liked",
             "tagged_users",
         )
+        list_serializer_class = CommentBatchListSerializer
+
+    def __init__(self, instance=None, *args, **kwargs):
+        # 답글, 좋아요 여부, 태그된 유저는 CommentBatch에서 가져오기
+        if isinstance(instance, Comment):
+            kwargs["context"] = with_comment_batch(
+                [instance], kwargs.get("context", {})
+            )
+        super().__init__(instance, *args, **kwargs)
+
+    @property
+    def batch(self):
+        return self.context["comment_batch"]
 
     @swagger_serializer_method(serializer_or_field=UserSerializer)
     def get_author(self, comment):
@@ -416,27 +445,20 @@ class CommentListSerializer(serializers.ModelSerializer):
         return format_time(comment.created)
 
     def get_children_count(self, comment):
-        return comment.children.count()
+        return comment.children_count
 
     def get_children(self, comment):
-        children = comment.children.order_by("created")
-        # child comment 3개만 노출시키기
-        # if children.count() > 2:
-        #     children = children[children.count()-4:]
+        # 답글 미리보기, 미리보기에 포함된 답글의 답글은 children_count만
+        children = self.batch.children.get(comment.id, [])
         return CommentListSerializer(children, many=True, context=self.context).data
 
     def get_is_liked(self, comment):
-        request = self.context.get("request")
-        if not request:
+        if not self.batch.user:
             return None
+        return comment.id in self.batch.liked
 
-        if comment.likeusers.filter(pk=request.user.id).exists():
-            return True
-
-        return False
-
-    def get_tagged_users(self, post):
-        return TagUserSerializer(post.tagged_users, many=True).data
+    def get_tagged_users(self, comment):
+        return TagUserSerializer(self.batch.tagged_users[comment.id], many=True).data
 
 
 class TagUserSerializer(serializers.ModelSerializer):
@@ -446,3 +468,19 @@ class TagUserSerializer(serializers.ModelSerializer):
             "id",
             "username",
         )
+
+
+class UploadFileSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=255, help_text="올릴 파일 이름")
+    size = serializers.IntegerField(min_value=0, help_text="올릴 파일 크기 (bytes)")
+
+
+class UploadRequestSerializer(serializers.Serializer):
+    files = UploadFileSerializer(many=True, allow_empty=False)
+
+    def validate_files(self, files):
+        if len(files) > settings.MAX_UPLOAD_URLS:
+            raise serializers.ValidationError(
+                f"한번에 {settings.MAX_UPLOAD_URLS}개까지 발급받을 수 있습니다."
+            )
+        return files
@@ -0,0 +1,61 @@
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from user.models import User
+from .models import Post, Comment
+from .timeline import fan_out_post, backfill_friendship, trim_friendship
+from .blobs import release_blobs
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, update_fields=None, **kwargs):
+    # 공개범위가 바뀌지 않는 저장은 타임라인에 영향이 없음
+    if not created and update_fields and "scope" not in update_fields:
+        return
+    fan_out_post(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if not created or instance.path:
+        return
+    instance.root_id, instance.path = instance.build_path()
+    Comment.objects.filter(id=instance.id).update(
+        root=instance.root_id, path=instance.path
+    )
+    if instance.parent_id:
+        Comment.objects.filter(id=instance.parent_id).update(
+            children_count=F("children_count") + 1
+        )
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.parent_id:
+        Comment.objects.filter(id=instance.parent_id, children_count__gt=0).update(
+            children_count=F("children_count") - 1
+        )
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=User)
+def file_owner_deleted(sender, instance, **kwargs):
+    # 같이 쓰는 파일(Blob)은 참조하는 곳이 모두 없어진 뒤에 sweep에서 삭제
+    release_blobs(instance)
+
+
+@receiver(m2m_changed, sender=User.friends.through)
+def friends_changed(sender, instance, action, pk_set, **kwargs):
+    if action == "post_add":
+        for friend_id in pk_set:
+            backfill_friendship(instance.id, friend_id)
+
+    elif action == "post_remove":
+        for friend_id in pk_set:
+            trim_friendship(instance.id, friend_id)
+
+    elif action == "pre_clear":
+        for friend_id in instance.friends.values_list("id", flat=True):
+            trim_friendship(instance.id, friend_id)
@@ -16,6 +16,11 @@ class PostCreateSwaggerSerializer(serializers.Serializer):
         required=False,
         help_text='각 subpost에 대한 정보를 담은 array\n`[{"content": (해당 subpost의 content), "tagged_users": [해당 subpost에 tag된 user들의 id]}]`',
     )
+    keys = serializers.ListField(
+        child=serializers.CharField(),
+        required=False,
+        help_text="file 대신 업로드 URL(newsfeed/uploads/)로 올린 파일들의 key\nsubposts와 같은 순서",
+    )
 
 
 class PostUpdateSwaggerSerializer(serializers.Serializer):
@@ -37,6 +42,12 @@ class PostUpdateSwaggerSerializer(serializers.Serializer):
         help_text='수정하려는 각 subpost의 정보를 담은 array\n`[{"id": (수정할 subpost의 id), "content": (해당 subpost의 content), "tagged_users": [해당 subpost에 tag된 user들의 id]}]`\n포함된 각 subpost에 대하여 content 혹은 tagged_users의 수정 사항이 없을 시 이전 내용과 그대로',
     )
 
+    keys = serializers.ListField(
+        child=serializers.CharField(),
+        required=False,
+        help_text="files 대신 업로드 URL(newsfeed/uploads/)로 올린 파일들의 key\nnew_subposts와 같은 순서",
+    )
+
     new_subposts = serializers.ListField(
         child=serializers.IntegerField(),
         required=False,
@@ -52,6 +63,9 @@ class PostUpdateSwaggerSerializer(serializers.Serializer):
 
 class CommentCreateSwaggerSerializer(serializers.Serializer):
     content = serializers.CharField(required=True)
+    key = serializers.CharField(
+        required=False, help_text="file 대신 업로드 URL(newsfeed/uploads/)로 올린 파일의 key"
+    )
     parent = serializers.IntegerField(
         required=False, help_text="부모 댓글의 id. Depth가 0인 경우 해당 필드를 비워두세요."
     )
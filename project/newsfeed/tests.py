@@ -1,14 +1,39 @@
-from django.test import TestCase
+from io import StringIO
+from django.core.management import call_command
+from unittest.mock import patch
+from django.db import OperationalError, connection, transaction
+from django.test import (
+    Client,
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
 from django.test.client import encode_multipart
 from factory.django import DjangoModelFactory
 from faker import Faker
 from user.models import User
-from newsfeed.models import Post, Comment
+from newsfeed.batch import PostBatch
+from newsfeed.models import Blob, Post, Comment
+from newsfeed.serializers import PostSerializer
+from newsfeed.likebuffer import like_buffer
+from newsfeed.visibility import Visibility
 from rest_framework import status
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from django.core.files.storage import FileSystemStorage
 from django.core.files.uploadedfile import SimpleUploadedFile
+from newsfeed.blobs import reserve_blobs, save_blob, set_blob, sweep
+from newsfeed.media import FILE_FIELD, upload_media
+from newsfeed.utils import DEADLOCK_ERROR_CODE, toggle_like
+from config.images import blurhash, encode83, make_variants
+from PIL import Image
 import os
+import tempfile
+import threading
 from pathlib import Path
-from user.serializers import jwt_token_of
+from user.serializers import UserSerializer, jwt_token_of
 from user.tests import UserFactory
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -1551,18 +1576,31 @@ class CommentTestCase(TestCase):
         self.assertEqual(data["results"][-1]["content"], "depth 0")
         self.assertEqual(data["results"][-1]["children"][0]["content"], "depth 1")
         self.assertTrue(data["results"][-1]["children"][0]["is_liked"])
-        self.assertEqual(
-            data["results"][-1]["children"][0]["children"][0]["content"], "depth 2"
-        )
+
+        # 미리보기에 포함된 답글의 답글은 개수만
+        self.assertEqual(data["results"][-1]["children"][0]["children_count"], 6)
+        self.assertEqual(data["results"][-1]["children"][0]["children"], [])
 
         # 부모자식 관계 확인
         self.assertEqual(
             data["results"][-1]["children"][0]["parent"], data["results"][-1]["id"]
         )
 
-        # child comment 개수 확인
+        # child comment 개수 확인, 답글은 3개까지만 미리보기
         self.assertEqual(data["results"][-1]["children_count"], 6)
-        self.assertEqual(len(data["results"][-1]["children"]), 6)
+        self.assertEqual(len(data["results"][-1]["children"]), 3)
+
+        # 나머지 답글은 children에서
+        response = self.client.get(
+            f"/api/v1/newsfeed/{self.my_post.id}/{self.depth_one.id}/children/",
+            content_type="application/json",
+            HTTP_AUTHORIZATION=user_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        children = response.json()["results"]
+        self.assertEqual(len(children), 6)
+        self.assertEqual(children[0]["content"], "depth 2")
+        self.assertEqual(children[0]["parent"], self.depth_one.id)
 
         # 페이지네이션 확인
         self.assertEqual(len(data["results"]), 20)
@@ -1777,3 +1815,1114 @@ class CommentTestCase(TestCase):
         )
 
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+
+class TimelineTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_user = UserFactory.create(
+            email="test0@test.com",
+            password="password",
+            first_name="test",
+            last_name="user",
+            birth="1997-02-03",
+            gender="M",
+            phone_number="01000000000",
+        )
+
+        cls.test_friend = UserFactory.create(
+            email="test1@test.com",
+            password="password",
+            first_name="test",
+            last_name="friend",
+            birth="1997-02-03",
+            gender="M",
+            phone_number="01011111111",
+        )
+        cls.user_token = "JWT " + jwt_token_of(cls.test_user)
+        cls.friend_token = "JWT " + jwt_token_of(cls.test_friend)
+        cls.content_type = "multipart/form-data; boundary=BoUnDaRyStRiNg"
+
+    def get_feed_ids(self, token):
+        response = self.client.get(
+            "/api/v1/newsfeed/",
+            content_type="application/json",
+            HTTP_AUTHORIZATION=token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post["id"] for post in response.json()["results"]]
+
+    def test_timeline(self):
+        # 친구가 되기 전에 작성된 게시글
+        old_post = PostFactory.create(author=self.test_friend, content="예전 게시글")
+        self.assertEqual(self.get_feed_ids(self.user_token), [])
+
+        # 친구가 되면 기존 게시글이 타임라인에 채워짐
+        self.test_user.friends.add(self.test_friend)
+        self.assertEqual(self.get_feed_ids(self.user_token), [old_post.id])
+
+        # 새 게시글 작성시 친구의 타임라인에 추가
+        response = self.client.post(
+            "/api/v1/newsfeed/",
+            data=encode_multipart("BoUnDaRyStRiNg", {"content": "새 게시글"}),
+            content_type=self.content_type,
+            HTTP_AUTHORIZATION=self.friend_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        new_post_id = response.json()["id"]
+        self.assertEqual(self.get_feed_ids(self.user_token), [new_post_id, old_post.id])
+        self.assertEqual(
+            self.get_feed_ids(self.friend_token), [new_post_id, old_post.id]
+        )
+
+        # 나만 보기로 변경하면 친구의 타임라인에서 제거
+        response = self.client.put(
+            f"/api/v1/newsfeed/{new_post_id}/",
+            data=encode_multipart("BoUnDaRyStRiNg", {"content": "새 게시글", "scope": 1}),
+            content_type=self.content_type,
+            HTTP_AUTHORIZATION=self.friend_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get_feed_ids(self.user_token), [old_post.id])
+        self.assertEqual(
+            self.get_feed_ids(self.friend_token), [new_post_id, old_post.id]
+        )
+
+        # 게시글 삭제시 타임라인에서 제거
+        response = self.client.delete(
+            f"/api/v1/newsfeed/{old_post.id}/",
+            HTTP_AUTHORIZATION=self.friend_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.get_feed_ids(self.user_token), [])
+
+        # 친구 삭제시 타임라인에서 서로의 게시글 제거
+        my_post = PostFactory.create(author=self.test_user, content="내 게시글")
+        self.assertIn(my_post.id, self.get_feed_ids(self.friend_token))
+        response = self.client.delete(
+            "/api/v1/friend/",
+            data={"friend": self.test_friend.id},
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.user_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.get_feed_ids(self.friend_token), [new_post_id])
+        self.assertEqual(self.get_feed_ids(self.user_token), [my_post.id])
+
+
+class FeedQueryCountTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_user = UserFactory.create(
+            email="test0@test.com",
+            password="password",
+            first_name="test",
+            last_name="user",
+            birth="1997-02-03",
+            gender="M",
+            phone_number="01000000000",
+        )
+        cls.friends = UserFactory.create_batch(3)
+        for friend in cls.friends:
+            cls.test_user.friends.add(friend)
+        cls.user_token = "JWT " + jwt_token_of(cls.test_user)
+
+    def create_posts(self, count):
+        for i in range(count):
+            author = self.friends[i % len(self.friends)]
+            post = PostFactory.create(author=author)
+            post.tagged_users.add(self.test_user, *self.friends)
+            post.likeusers.add(self.test_user)
+            for j in range(2):
+                subpost = Post.objects.create(
+                    author=author, mainpost=post, content=f"subpost {j}"
+                )
+                subpost.tagged_users.add(self.test_user)
+            Comment.objects.create(post=post, author=self.test_user, content="댓글")
+            Post.objects.create(
+                author=author,
+                content="공유",
+                shared_post=post,
+                is_sharing=True,
+            )
+
+    def count_feed_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                "/api/v1/newsfeed/",
+                content_type="application/json",
+                HTTP_AUTHORIZATION=self.user_token,
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(response.json()["results"]), len(context)
+
+    def test_feed_query_count(self):
+        self.create_posts(1)
+        page_size, small_page_queries = self.count_feed_queries()
+        self.assertEqual(page_size, 2)
+
+        self.create_posts(19)
+        page_size, full_page_queries = self.count_feed_queries()
+        self.assertEqual(page_size, 20)
+
+        self.assertEqual(small_page_queries, full_page_queries)
+
+    def test_single_post_batch(self):
+        # 게시글 하나를 렌더링할 때도 처음 만든 batch 하나로 subposts, 공유된 게시글까지
+        self.create_posts(1)
+        post = Post.objects.get(is_sharing=True)
+        request = RequestFactory().get("/")
+        request.user = self.test_user
+        with patch("newsfeed.serializers.PostBatch", wraps=PostBatch) as batch:
+            data = PostSerializer(post, context={"request": request}).data
+        self.assertEqual(batch.call_count, 1)
+        self.assertTrue(data["shared_post"]["is_liked"])
+        self.assertEqual(len(data["shared_post"]["subposts"]), 2)
+
+
+class PostCounterTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_user = UserFactory.create(
+            email="test0@test.com",
+            password="password",
+            first_name="test",
+            last_name="user",
+            birth="1997-02-03",
+            gender="M",
+            phone_number="01000000000",
+        )
+        cls.user_token = "JWT " + jwt_token_of(cls.test_user)
+        cls.content_type = "multipart/form-data; boundary=BoUnDaRyStRiNg"
+
+    def create_comment(self, post, **data):
+        response = self.client.post(
+            f"/api/v1/newsfeed/{post.id}/comment/",
+            data=encode_multipart("BoUnDaRyStRiNg", {"content": "댓글", **data}),
+            content_type=self.content_type,
+            HTTP_AUTHORIZATION=self.user_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.json()["id"]
+
+    def test_post_counters(self):
+        post = PostFactory.create(author=self.test_user)
+
+        # 댓글과 대댓글 작성
+        parent = self.create_comment(post)
+        self.create_comment(post, parent=parent)
+        self.create_comment(post)
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 3)
+
+        # 대댓글이 달린 댓글 삭제
+        response = self.client.delete(
+            f"/api/v1/newsfeed/{post.id}/{parent}/",
+            HTTP_AUTHORIZATION=self.user_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+
+        # 공유 후 공유한 게시글 삭제
+        response = self.client.post(
+            "/api/v1/newsfeed/",
+            data=encode_multipart(
+                "BoUnDaRyStRiNg", {"content": "공유", "shared_post": post.id}
+            ),
+            content_type=self.content_type,
+            HTTP_AUTHORIZATION=self.user_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        sharing_post_id = response.json()["id"]
+        post.refresh_from_db()
+        self.assertEqual(post.share_count, 1)
+
+        response = self.client.delete(
+            f"/api/v1/newsfeed/{sharing_post_id}/",
+            HTTP_AUTHORIZATION=self.user_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        post.refresh_from_db()
+        self.assertEqual(post.share_count, 0)
+
+        # 어긋난 값은 repair_post_counters로 복구
+        Post.objects.filter(id=post.id).update(comment_count=10, share_count=5)
+        call_command("repair_post_counters", stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(post.share_count, 0)
+
+
+class LikeConcurrencyTestCase(TransactionTestCase):
+    def setUp(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("in-memory sqlite는 여러 스레드의 동시 쓰기를 지원하지 않음")
+
+        self.author = UserFactory.create(email="author@test.com")
+        self.users = UserFactory.create_batch(16)
+        self.post = PostFactory.create(author=self.author, likes=0)
+        self.comment = Comment.objects.create(
+            post=self.post, author=self.author, content="댓글"
+        )
+
+    def like_concurrently(self, url, tokens):
+        barrier = threading.Barrier(len(tokens))
+        status_codes = []
+
+        def like(token):
+            try:
+                barrier.wait()
+                response = Client().put(
+                    url, content_type="application/json", HTTP_AUTHORIZATION=token
+                )
+                status_codes.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=like, args=(token,)) for token in tokens]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(status_codes, [status.HTTP_200_OK] * len(tokens))
+
+    def test_concurrent_likes(self):
+        tokens = ["JWT " + jwt_token_of(user) for user in self.users]
+
+        # 모든 유저가 동시에 좋아요
+        self.like_concurrently(f"/api/v1/newsfeed/{self.post.id}/like/", tokens)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes, len(self.users))
+        self.assertEqual(self.post.likes, self.post.likeusers.count())
+
+        # 절반은 좋아요 취소, 나머지는 다시 좋아요(취소) 요청을 동시에
+        self.like_concurrently(
+            f"/api/v1/newsfeed/{self.post.id}/like/", tokens[: len(tokens) // 2]
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes, len(self.users) // 2)
+        self.assertEqual(self.post.likes, self.post.likeusers.count())
+
+        # 같은 유저가 좋아요/취소를 동시에 여러번 보내도 교착 없이 일치
+        self.like_concurrently(f"/api/v1/newsfeed/{self.post.id}/like/", tokens * 3)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes, self.post.likeusers.count())
+
+        # 댓글 좋아요
+        self.like_concurrently(
+            f"/api/v1/newsfeed/{self.post.id}/{self.comment.id}/like/", tokens
+        )
+        self.comment.refresh_from_db()
+        self.assertEqual(self.comment.likes, len(self.users))
+        self.assertEqual(self.comment.likes, self.comment.likeusers.count())
+
+    def test_deadlock_retry(self):
+        # 교착 상태로 취소되면 다시 시도, 바깥 트랜잭션 안에서는 그대로 raise
+        deadlock = OperationalError(DEADLOCK_ERROR_CODE, "Deadlock found")
+        with patch("newsfeed.utils.apply_like", side_effect=[deadlock, True]) as apply:
+            self.assertTrue(toggle_like(self.post, self.users[0]))
+        self.assertEqual(apply.call_count, 2)
+
+        with patch("newsfeed.utils.apply_like", side_effect=[deadlock, True]):
+            with self.assertRaises(OperationalError), transaction.atomic():
+                toggle_like(self.post, self.users[0])
+
+
+@override_settings(LIKE_BUFFER_ENABLED=True, LIKE_BUFFER_FLUSH_INTERVAL=0)
+class LikeBufferTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = UserFactory.create(email="author@test.com")
+        cls.users = UserFactory.create_batch(3)
+        cls.post = PostFactory.create(author=cls.author, likes=0)
+
+    def like(self, user):
+        response = self.client.put(
+            f"/api/v1/newsfeed/{self.post.id}/like/",
+            content_type="application/json",
+            HTTP_AUTHORIZATION="JWT " + jwt_token_of(user),
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_buffered_like(self):
+        # 좋아요는 즉시 응답에 반영되지만 DB에는 아직 반영되지 않음
+        for user in self.users:
+            data = self.like(user)
+            self.assertTrue(data["is_liked"])
+        self.assertEqual(data["likes"], 3)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes, 0)
+
+        # 좋아요 후 취소는 상쇄됨
+        data = self.like(self.users[0])
+        self.assertFalse(data["is_liked"])
+        self.assertEqual(data["likes"], 2)
+
+        like_buffer.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes, 2)
+        self.assertEqual(
+            set(self.post.likeusers.values_list("id", flat=True)),
+            {self.users[1].id, self.users[2].id},
+        )
+        notice = self.author.notices.get(post=self.post, content="PostLike")
+        self.assertEqual(notice.senders.count(), 2)
+
+        # 반영 후에도 같은 결과
+        data = self.like(self.users[0])
+        self.assertTrue(data["is_liked"])
+        self.assertEqual(data["likes"], 3)
+        data = self.like(self.users[1])
+        self.assertFalse(data["is_liked"])
+        self.assertEqual(data["likes"], 2)
+
+        like_buffer.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes, 2)
+        self.assertEqual(self.post.likes, self.post.likeusers.count())
+        self.assertEqual(
+            set(notice.senders.values_list("user", flat=True)),
+            {self.users[0].id, self.users[2].id},
+        )
+        self.assertEqual(like_buffer.delta(self.post.id), 0)
+
+    def test_close(self):
+        # 종료시 남은 좋아요를 반영, likes가 어긋나 있어도 음수가 되지 않음
+        self.post.likeusers.add(self.users[0])
+        self.assertFalse(like_buffer.toggle(self.post, self.users[0]))
+        self.assertTrue(like_buffer.toggle(self.post, self.users[1]))
+        self.assertFalse(like_buffer.toggle(self.post, self.users[1]))
+        like_buffer.close()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes, 0)
+        self.assertFalse(self.post.likeusers.exists())
+        self.assertEqual(like_buffer.delta(self.post.id), 0)
+
+    def flush_queries(self, likes):
+        for user, post in likes:
+            self.assertIsNotNone(like_buffer.toggle(post, user))
+        with CaptureQueriesContext(connection) as context:
+            like_buffer.flush()
+        return [query["sql"] for query in context.captured_queries]
+
+    def test_flush_queries(self):
+        # 좋아요를 반영하는 쿼리 수는 게시글/유저 수와 상관없음
+        users = [*self.users, *UserFactory.create_batch(3)]
+        posts = [self.post, *PostFactory.create_batch(2, author=self.author, likes=0)]
+        queries = self.flush_queries([(users[0], posts[0])])
+        self.assertEqual(
+            len(
+                self.flush_queries(
+                    [(user, post) for user in users for post in posts[1:]]
+                )
+            ),
+            len(queries),
+        )
+        for post in posts:
+            post.refresh_from_db()
+        self.assertEqual([post.likes for post in posts], [1, 6, 6])
+        self.assertEqual(
+            [self.author.notices.get(post=post).senders.count() for post in posts],
+            [1, 6, 6],
+        )
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.unread_notice_count, 3)
+
+        # 취소는 한번의 DELETE, 보낸 유저가 남지 않은 알림은 삭제
+        queries = self.flush_queries(
+            [(users[0], posts[0])] + [(user, posts[1]) for user in users[1:]]
+        )
+        self.assertEqual(
+            len(
+                [
+                    query
+                    for query in queries
+                    if query.startswith('DELETE FROM "newsfeed_post_likeusers"')
+                ]
+            ),
+            1,
+        )
+        self.assertFalse(self.author.notices.filter(post=posts[0]).exists())
+        notice = self.author.notices.get(post=posts[1])
+        self.assertEqual(notice.latest_sender_id, users[0].id)
+        self.assertEqual(
+            list(notice.senders.values_list("user", flat=True)), [users[0].id]
+        )
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.unread_notice_count, 2)
+
+
+class CommentTreeTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_user = UserFactory.create(email="comment@test.com")
+        cls.friends = UserFactory.create_batch(3)
+        cls.user_token = "JWT " + jwt_token_of(cls.test_user)
+        cls.post = PostFactory.create(author=cls.test_user)
+
+    def create_thread(self, replies, root=None):
+        if root is None:
+            root = Comment.objects.create(
+                post=self.post, author=self.test_user, content="댓글", depth=0
+            )
+        for i in range(replies):
+            child = Comment.objects.create(
+                post=self.post,
+                author=self.friends[i % len(self.friends)],
+                content=f"답글 {i}",
+                parent=root,
+                depth=1,
+            )
+            child.likeusers.add(self.test_user)
+            grandchild = Comment.objects.create(
+                post=self.post,
+                author=self.test_user,
+                content=f"답글의 답글 {i}",
+                parent=child,
+                depth=2,
+            )
+            grandchild.tagged_users.add(*self.friends)
+        return root
+
+    def get_comments(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                f"/api/v1/newsfeed/{self.post.id}/comment/",
+                HTTP_AUTHORIZATION=self.user_token,
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()["results"], len(context)
+
+    def test_comment_path(self):
+        root = self.create_thread(1)
+        child = root.children.get()
+        grandchild = child.children.get()
+        self.assertEqual(root.root_id, root.id)
+        self.assertEqual(grandchild.root_id, root.id)
+        self.assertEqual(
+            grandchild.path, f"{root.id:010d}/{child.id:010d}/{grandchild.id:010d}/"
+        )
+
+    def test_comment_tree_queries(self):
+        root = self.create_thread(1)
+        _, small_thread_queries = self.get_comments()
+
+        # 스레드가 커지거나 답글이 있는 댓글이 많아져도 쿼리 개수와 응답 크기는 그대로
+        self.create_thread(10, root)
+        comments, large_thread_queries = self.get_comments()
+        self.assertEqual(small_thread_queries, large_thread_queries)
+        for replies in (0, 2, 5):
+            self.create_thread(replies)
+        threads, many_threads_queries = self.get_comments()
+        self.assertEqual(small_thread_queries, many_threads_queries)
+        self.assertEqual(
+            sorted(
+                (thread["children_count"], len(thread["children"]))
+                for thread in threads
+            ),
+            [(0, 0), (2, 2), (5, 3), (11, 3)],
+        )
+
+        thread = comments[-1]
+        root.refresh_from_db()
+        self.assertEqual(root.children_count, 11)
+        self.assertEqual(thread["children_count"], 11)
+        self.assertEqual(
+            [child["content"] for child in thread["children"]],
+            ["답글 0", "답글 0", "답글 1"],
+        )
+        child = thread["children"][0]
+        self.assertTrue(child["is_liked"])
+        self.assertEqual(child["children_count"], 1)
+        self.assertEqual(child["children"], [])
+
+    def test_comment_children(self):
+        root = self.create_thread(12)
+        url = f"/api/v1/newsfeed/{self.post.id}/{root.id}/children/"
+        response = self.client.get(url, HTTP_AUTHORIZATION=self.user_token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(len(data["results"]), 10)
+        self.assertEqual(data["results"][0]["content"], "답글 0")
+        grandchild = data["results"][0]["children"][0]
+        self.assertEqual(grandchild["content"], "답글의 답글 0")
+        self.assertEqual(len(grandchild["tagged_users"]), 3)
+        self.assertFalse(grandchild["is_liked"])
+
+        # 다음 페이지
+        response = self.client.get(data["next"], HTTP_AUTHORIZATION=self.user_token)
+        self.assertEqual(
+            [child["content"] for child in response.json()["results"]],
+            ["답글 10", "답글 11"],
+        )
+
+        # 답글 삭제
+        child = root.children.first()
+        response = self.client.delete(
+            f"/api/v1/newsfeed/{self.post.id}/{child.id}/",
+            HTTP_AUTHORIZATION="JWT " + jwt_token_of(child.author),
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        root.refresh_from_db()
+        self.assertEqual(root.children_count, 11)
+
+        # 다른 게시글의 댓글
+        response = self.client.get(
+            f"/api/v1/newsfeed/{self.post.id + 1}/{root.id}/children/",
+            HTTP_AUTHORIZATION=self.user_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class FeedIndexTestCase(TestCase):
+    # 자주 실행되는 게시글/댓글 쿼리의 인덱스가 있는지, SQLite에서는 EXPLAIN으로 쓰는지 확인
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_user = UserFactory.create()
+        cls.post = PostFactory.create(author=cls.test_user)
+
+    def assertUsesIndex(self, queryset, model, fields):
+        # 인덱스가 마이그레이션으로 만들어졌는지 확인
+        index = next(index for index in model._meta.indexes if index.fields == fields)
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, model._meta.db_table
+            )
+        self.assertTrue(constraints[index.name]["index"])
+        # 실행 계획은 DB와 데이터 양에 따라 달라지므로 SQLite에서만 확인
+        if connection.vendor == "sqlite":
+            self.assertIn(index.name, queryset.explain())
+
+    def test_user_newsfeed_index(self):
+        for scope in (0, 1, 2):
+            queryset = self.test_user.posts.filter(
+                mainpost=None, scope__gt=scope
+            ).order_by("-created")
+            self.assertUsesIndex(
+                queryset, Post, ["author", "mainpost", "-created", "scope"]
+            )
+
+    def test_comment_list_index(self):
+        queryset = Comment.objects.filter(post=self.post, depth=0).order_by("-id")
+        self.assertUsesIndex(queryset, Comment, ["post", "depth", "id"])
+
+
+class VisibilityTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_user = UserFactory.create()
+        cls.friend = UserFactory.create()
+        cls.stranger = UserFactory.create()
+        cls.test_user.friends.add(cls.friend)
+        # 작성자의 친구가 많아도 친구 여부 확인은 한번의 쿼리
+        cls.friend.friends.add(*UserFactory.create_batch(5))
+        cls.posts = {}
+        for author in (cls.test_user, cls.friend, cls.stranger):
+            for scope in (1, 2, 3):
+                cls.posts[author.id, scope] = Post.objects.create(
+                    author=author, content=f"scope {scope}", scope=scope
+                )
+
+    def expected(self, post):
+        if post.author_id == self.test_user.id:
+            return True
+        if post.author_id == self.friend.id:
+            return post.scope > 1
+        return post.scope == 3
+
+    def test_can_view(self):
+        visibility = Visibility(self.test_user)
+        with self.assertNumQueries(2):
+            for post in self.posts.values():
+                self.assertEqual(visibility.can_view(post), self.expected(post))
+
+        visibility = Visibility(self.test_user)
+        with self.assertNumQueries(1):
+            visibility.prefetch(post.author_id for post in self.posts.values())
+            for post in self.posts.values():
+                self.assertEqual(visibility.can_view(post), self.expected(post))
+
+    def test_filter(self):
+        visibility = Visibility(self.test_user)
+        self.assertEqual(
+            set(visibility.filter(Post.objects.all())),
+            {post for post in self.posts.values() if self.expected(post)},
+        )
+
+    def test_post_detail(self):
+        user_token = "JWT " + jwt_token_of(self.test_user)
+        for post in self.posts.values():
+            response = self.client.get(
+                f"/api/v1/newsfeed/{post.id}/",
+                content_type="application/json",
+                HTTP_AUTHORIZATION=user_token,
+            )
+            self.assertEqual(
+                response.status_code,
+                status.HTTP_200_OK
+                if self.expected(post)
+                else status.HTTP_404_NOT_FOUND,
+            )
+
+    def test_shared_posts(self):
+        # 여러 작성자의 게시글을 공유한 피드도 친구 여부는 한번에 확인
+        for post in self.posts.values():
+            Post.objects.create(
+                author=self.test_user,
+                content="공유",
+                shared_post=post,
+                is_sharing=True,
+                scope=3,
+            )
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                f"/api/v1/user/{self.test_user.id}/newsfeed/",
+                content_type="application/json",
+                HTTP_AUTHORIZATION="JWT " + jwt_token_of(self.test_user),
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        friendship_queries = [
+            query for query in context if "user_user_friends" in query["sql"]
+        ]
+        self.assertEqual(len(friendship_queries), 1)
+
+        shared = {
+            data["shared_post"]["id"] if data["shared_post"] else None
+            for data in response.json()["results"]
+            if data["is_sharing"]
+        }
+        visible = {post.id for post in self.posts.values() if self.expected(post)}
+        self.assertEqual(shared - {None}, visible)
+
+
+class UploadLimitTestCase(TestCase):
+    content_type = "multipart/form-data; boundary=BoUnDaRyStRiNg"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_user = UserFactory.create()
+
+    def upload(self, path="/api/v1/newsfeed/", **data):
+        test_image = SimpleUploadedFile(
+            name="testimage.jpg",
+            content=open(os.path.join(BASE_DIR, "testimage.jpg"), "rb").read(),
+            content_type="image/jpeg",
+        )
+        return self.client.post(
+            path,
+            data=encode_multipart(
+                "BoUnDaRyStRiNg",
+                {
+                    "content": "사진",
+                    "subposts": [{"content": "사진"}],
+                    "file": test_image,
+                    **data,
+                },
+            ),
+            content_type=self.content_type,
+            HTTP_AUTHORIZATION="JWT " + jwt_token_of(self.test_user),
+        )
+
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=1024)
+    def test_spool_to_disk(self):
+        # 메모리 제한보다 큰 파일은 임시 파일로 받아서 저장
+        response = self.upload()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        data = response.json()
+        self.assertIn("testimage.jpg", data["subposts"][0]["file"])
+
+        response = self.upload(f"/api/v1/newsfeed/{data['id']}/comment/")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn("testimage.jpg", response.json()["file"])
+
+    @override_settings(MAX_UPLOAD_FILE_SIZE=100 * 1024)
+    def test_file_too_large(self):
+        response = self.upload()
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(MAX_UPLOAD_REQUEST_SIZE=100 * 1024)
+    def test_request_too_large(self):
+        response = self.upload()
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertFalse(Post.objects.exists())
+
+
+class FailingStorage(FileSystemStorage):
+    def _save(self, name, content):
+        if name.endswith("fail.jpg"):
+            raise OSError("upload failed")
+        return super()._save(name, content)
+
+
+@override_settings(BLOB_GRACE_PERIOD=-1)
+class MediaUploadTestCase(TestCase):
+    content_type = "multipart/form-data; boundary=BoUnDaRyStRiNg"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_user = UserFactory.create()
+
+    def random_file(self, name, content=None):
+        return SimpleUploadedFile(name, content or os.urandom(1024), "image/jpeg")
+
+    def create_post(self, files, subposts=None):
+        return self.client.post(
+            "/api/v1/newsfeed/",
+            data=encode_multipart(
+                "BoUnDaRyStRiNg",
+                {
+                    "content": "사진",
+                    "subposts": subposts or [{"content": "사진"}] * len(files),
+                    "file": files,
+                },
+            ),
+            content_type=self.content_type,
+            HTTP_AUTHORIZATION="JWT " + jwt_token_of(self.test_user),
+        )
+
+    def test_cleanup_on_rollback(self):
+        storage = FILE_FIELD.storage
+        files = [self.random_file(f"{i}.jpg") for i in range(3)]
+        response = self.create_post(
+            files,
+            [{"content": "사진"}] * 2 + [{"content": "사진", "tagged_users": [0]}],
+        )
+        # 없는 유저를 태그해서 트랜잭션이 롤백되면 먼저 올린 파일은 참조하는 곳이 없으므로 sweep에서 삭제
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Post.objects.exists())
+        names = list(Blob.objects.values_list("name", flat=True))
+        self.assertEqual(len(names), 3)
+        self.assertTrue(all(storage.exists(name) for name in names))
+        stdout = StringIO()
+        call_command("sweep_blobs", "--batch-size", "2", stdout=stdout)
+        self.assertIn("3개의 파일을 삭제했습니다.", stdout.getvalue())
+        self.assertFalse(any(storage.exists(name) for name in names))
+        self.assertFalse(Blob.objects.exists())
+
+    def test_upload_failure(self):
+        with tempfile.TemporaryDirectory() as location:
+            storage = FailingStorage(location=location)
+            files = [
+                ContentFile(name.encode(), name=name)
+                for name in ("1.jpg", "2.jpg", "fail.jpg", "3.jpg")
+            ]
+            with self.assertRaises(OSError):
+                upload_media(files, storage)
+            # 일부만 올라간 파일도 sweep에서 삭제
+            names = list(Blob.objects.values_list("name", flat=True))
+            self.assertEqual(sweep(storage), 4)
+            self.assertFalse(any(storage.exists(name) for name in names))
+
+            names = upload_media(files[:2], storage)
+            self.assertEqual(
+                [name.split("/")[-1] for name in names], ["1.jpg", "2.jpg"]
+            )
+            self.assertTrue(all(storage.exists(name) for name in names))
+
+    def test_dedup(self):
+        storage = FILE_FIELD.storage
+        content = os.urandom(1024)
+        first = self.create_post([self.random_file("1.jpg", content)]).json()[
+            "subposts"
+        ][0]
+        # 다른 이름의 같은 파일은 다시 올리지 않고 같은 파일을 사용
+        second = self.create_post(
+            [self.random_file("2.jpg", content), self.random_file("3.jpg", content)]
+        ).json()["subposts"]
+        self.assertEqual(first["file"], second[0]["file"])
+        self.assertEqual(first["file"], second[1]["file"])
+        self.assertIn("1.jpg", first["file"])
+        blob = Blob.objects.get()
+        self.assertEqual(blob.refcount, 3)
+
+        response = self.client.post(
+            f"/api/v1/newsfeed/{first['mainpost']}/comment/",
+            data=encode_multipart(
+                "BoUnDaRyStRiNg",
+                {"content": "댓글", "file": self.random_file("4.jpg", content)},
+            ),
+            content_type=self.content_type,
+            HTTP_AUTHORIZATION="JWT " + jwt_token_of(self.test_user),
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        blob.refresh_from_db()
+        self.assertEqual(blob.refcount, 4)
+
+        # 참조하는 곳이 모두 없어져야 삭제
+        Post.objects.filter(id=first["mainpost"]).delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.refcount, 2)
+        self.assertEqual(sweep(), 0)
+        Post.objects.filter(id=second[0]["mainpost"]).delete()
+        self.assertEqual(Blob.objects.get().refcount, 0)
+        self.assertEqual(sweep(), 1)
+        self.assertFalse(storage.exists(blob.name))
+
+    def test_reserve_swept_blob(self):
+        # 삽입과 조회 사이에 sweep이 Blob을 지워도 다시 만들어서 이름 반환
+        content = os.urandom(1024)
+        save_blob(FILE_FIELD.storage, self.random_file("1.jpg", content))
+        now = timezone.now
+        calls = []
+
+        def sweep_then_now():
+            # 삽입(auto_now) 후 touched를 갱신하기 직전에 sweep
+            if len(calls) == 1:
+                Blob.objects.all().delete()
+            calls.append(now())
+            return calls[-1]
+
+        with patch("newsfeed.blobs.timezone.now", side_effect=sweep_then_now):
+            names = reserve_blobs(
+                FILE_FIELD.storage, [self.random_file("2.jpg", content)]
+            )
+        self.assertEqual(len(calls), 4)
+        self.assertEqual(names, [Blob.objects.get().name])
+
+    def test_set_blob_stale_instance(self):
+        # 불러온 뒤에 다른 요청이 파일을 바꿨으면 바뀐 파일의 참조 수를 줄이기
+        storage = FILE_FIELD.storage
+        response = self.create_post([self.random_file("1.jpg")])
+        subpost = Post.objects.get(id=response.json()["subposts"][0]["id"])
+        stale = Post.objects.get(id=subpost.id)
+        original = subpost.file.name
+        names = [save_blob(storage, self.random_file(f"{i}.jpg")) for i in (2, 3)]
+        for instance, name in ((subpost, names[0]), (stale, names[1])):
+            with transaction.atomic():
+                set_blob(instance, "file", name)
+                instance.save(update_fields=["file"])
+        self.assertEqual(
+            dict(Blob.objects.values_list("name", "refcount")),
+            {original: 0, names[0]: 0, names[1]: 1},
+        )
+
+    def test_benchmark(self):
+        stdout = StringIO()
+        call_command(
+            "benchmark_media_upload",
+            "--files",
+            "4",
+            "--latency",
+            "1",
+            "--repeat",
+            "1",
+            stdout=stdout,
+        )
+        self.assertIn("parallel", stdout.getvalue())
+
+
+@override_settings(LOCAL_UPLOAD_URLS=True, MAX_UPLOAD_FILE_SIZE=4096)
+class DirectUploadTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_user = UserFactory.create()
+        cls.other_user = UserFactory.create()
+
+    def issue(self, user, files):
+        return self.client.post(
+            "/api/v1/newsfeed/uploads/",
+            data={"files": files},
+            content_type="application/json",
+            HTTP_AUTHORIZATION="JWT " + jwt_token_of(user),
+        )
+
+    def upload(self, target, content):
+        # 클라이언트가 storage에 직접 올리는 요청 (인증 없이 서명된 fields만)
+        return Client().post(
+            target["url"],
+            data={**target["fields"], "file": SimpleUploadedFile("a.jpg", content)},
+        )
+
+    def create_post(self, user, keys):
+        return self.client.post(
+            "/api/v1/newsfeed/",
+            data={
+                "content": "사진",
+                "subposts": [{"content": f"사진 {i}"} for i in range(len(keys))],
+                "keys": keys,
+            },
+            content_type="application/json",
+            HTTP_AUTHORIZATION="JWT " + jwt_token_of(user),
+        )
+
+    def test_direct_upload(self):
+        response = self.issue(
+            self.test_user,
+            [{"name": "1.jpg", "size": 1024}, {"name": "2.jpg", "size": 1024}],
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        targets = response.json()
+        self.assertEqual(len(targets), 2)
+        keys = [target["key"] for target in targets]
+        self.assertTrue(keys[0].startswith("blobs/") and keys[0].endswith("/1.jpg"))
+
+        contents = [os.urandom(1024) for _ in targets]
+        for target, content in zip(targets, contents):
+            self.assertEqual(
+                self.upload(target, content).status_code, status.HTTP_204_NO_CONTENT
+            )
+
+        # 파일 없이 작은 JSON만 보내서 게시글 작성
+        response = self.create_post(self.test_user, keys)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        subposts = response.json()["subposts"]
+        self.assertEqual([subpost["content"] for subpost in subposts], ["사진 0", "사진 1"])
+        for subpost, key, content in zip(subposts, keys, contents):
+            self.assertIn(key, subpost["file"])
+            with FILE_FIELD.storage.open(key) as file:
+                self.assertEqual(file.read(), content)
+        self.assertEqual(
+            list(Blob.objects.filter(name__in=keys).values_list("refcount", flat=True)),
+            [1, 1],
+        )
+
+        response = self.client.post(
+            f"/api/v1/newsfeed/{response.json()['id']}/comment/",
+            data={"content": "댓글", "key": keys[0]},
+            content_type="application/json",
+            HTTP_AUTHORIZATION="JWT " + jwt_token_of(self.test_user),
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn(keys[0], response.json()["file"])
+        self.assertEqual(Blob.objects.get(name=keys[0]).refcount, 2)
+
+    def test_invalid_upload(self):
+        response = self.issue(self.test_user, [{"name": "big.jpg", "size": 4097}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with override_settings(MAX_UPLOAD_URLS=1):
+            response = self.issue(
+                self.test_user,
+                [{"name": "1.jpg", "size": 1}, {"name": "2.jpg", "size": 1}],
+            )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        target = self.issue(self.test_user, [{"name": "1.jpg", "size": 1}]).json()[0]
+        # 발급받을 때보다 큰 파일, 다른 key, 만료된 URL
+        response = self.upload(target, os.urandom(4097))
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        forged = {**target, "fields": {**target["fields"], "key": "blobs/other.jpg"}}
+        response = self.upload(forged, b"data")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        with override_settings(UPLOAD_URL_EXPIRES=-1):
+            response = self.upload(target, b"data")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        # 아직 올리지 않은 파일
+        response = self.create_post(self.test_user, [target["key"]])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.assertEqual(self.upload(target, b"data").status_code, 204)
+        # 다른 유저가 발급받은 파일
+        response = self.create_post(self.other_user, [target["key"]])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.create_post(self.test_user, [target["key"], "blobs/none.jpg"])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Post.objects.exists())
+
+        # 사용하지 않은 파일은 sweep에서 삭제
+        with override_settings(BLOB_GRACE_PERIOD=-1):
+            self.assertEqual(sweep(), 1)
+        self.assertFalse(FILE_FIELD.storage.exists(target["key"]))
+
+
+@override_settings(IMAGE_WORKERS=0)
+class ImageVariantsTestCase(TestCase):
+    content_type = "multipart/form-data; boundary=BoUnDaRyStRiNg"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_user = UserFactory.create()
+
+    def image(self, name="testimage.jpg"):
+        return SimpleUploadedFile(
+            name=name,
+            content=open(os.path.join(BASE_DIR, name), "rb").read(),
+            content_type="image/jpeg",
+        )
+
+    def test_post_variants(self):
+        user_token = "JWT " + jwt_token_of(self.test_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/v1/newsfeed/",
+                data=encode_multipart(
+                    "BoUnDaRyStRiNg",
+                    {
+                        "content": "사진",
+                        "subposts": [{"content": "사진"}, {"content": "파일"}],
+                        "file": [
+                            self.image(),
+                            SimpleUploadedFile("text.txt", b"text", "text/plain"),
+                        ],
+                    },
+                ),
+                content_type=self.content_type,
+                HTTP_AUTHORIZATION=user_token,
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.get(
+            f"/api/v1/newsfeed/{response.json()['id']}/",
+            HTTP_AUTHORIZATION=user_token,
+        )
+        image, text = response.json()["subposts"]
+        variants = image["file_variants"]
+        self.assertEqual((variants["width"], variants["height"]), (1920, 2880))
+        self.assertEqual(len(variants["blurhash"]), 28)
+        self.assertEqual(set(variants["urls"]), {"160", "480", "1080"})
+        self.assertTrue(variants["urls"]["160"].startswith("http://testserver/"))
+        subpost = Post.objects.get(id=image["id"])
+        with FILE_FIELD.storage.open(subpost.file_meta["variants"]["480"]) as file:
+            self.assertEqual(Image.open(file).size, (480, 720))
+
+        # 이미지가 아닌 파일
+        self.assertIsNone(text["file_variants"])
+        self.assertEqual(Post.objects.get(id=text["id"]).file_meta, {})
+
+    def test_skip_non_images(self):
+        # 이미지가 아닌 확장자는 storage에서 열지 않음
+        with patch.object(FILE_FIELD.storage, "open") as storage_open:
+            for name in ("video.mp4", "document.pdf", "file"):
+                self.assertIsNone(make_variants(FILE_FIELD.storage, name))
+        storage_open.assert_not_called()
+
+    def test_profile_image_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(
+                f"/api/v1/user/{self.test_user.id}/profile/",
+                data=encode_multipart(
+                    "BoUnDaRyStRiNg", {"profile_image": self.image("testimage2.jpg")}
+                ),
+                content_type=self.content_type,
+                HTTP_AUTHORIZATION="JWT " + jwt_token_of(self.test_user),
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.test_user.refresh_from_db()
+        self.assertIsNotNone(self.test_user.profile_image_meta)
+        data = UserSerializer(self.test_user).data
+        self.assertEqual(
+            data["profile_image_variants"]["width"],
+            self.test_user.profile_image_meta["width"],
+        )
+        self.assertIsNone(data["profile_image_variants"]["urls"].get("1080"))
+
+    def test_blurhash(self):
+        # 성분 4 * 3개, 첫 성분은 평균 색
+        hash = blurhash(Image.new("RGB", (64, 48), (255, 0, 0)))
+        self.assertEqual(len(hash), 28)
+        self.assertEqual(hash[0], "L")
+        self.assertEqual(hash[2:6], encode83(0xFF0000, 4))
+
+    def test_backfill(self):
+        post = PostFactory.create(author=self.test_user)
+        subpost = Post.objects.create(
+            author=self.test_user, mainpost=post, file=self.image()
+        )
+        stdout = StringIO()
+        call_command("generate_image_variants", stdout=stdout)
+        self.assertIn("Post.file: 1개", stdout.getvalue())
+        subpost.refresh_from_db()
+        self.assertEqual(subpost.file_meta["width"], 1920)
@@ -0,0 +1,52 @@
+from .models import Post, TimelineEntry
+
+
+# 친구에게 공개되는 게시글인지 여부 (scope: 1(자기 자신), 2(친구), 3(전체 공개))
+def is_visible_to_friends(post):
+    return post.scope > 1
+
+
+def fan_out_post(post):
+    # mainpost를 작성자와 (공개범위에 따라) 작성자의 친구들의 타임라인에 기록
+    if post.mainpost_id:
+        return
+
+    receivers = [post.author_id]
+    if is_visible_to_friends(post):
+        receivers += list(post.author.friends.values_list("id", flat=True))
+    else:
+        TimelineEntry.objects.filter(post=post).exclude(user=post.author_id).delete()
+
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=receiver, post=post, created=post.created)
+            for receiver in receivers
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def backfill_friendship(user_id, friend_id):
+    # 새로 친구가 된 두 유저의 타임라인에 서로의 기존 게시글을 채워넣기
+    posts = Post.objects.filter(
+        author__in=(user_id, friend_id), mainpost=None, scope__gt=1
+    ).values_list("id", "author_id", "created")
+
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(
+                user_id=friend_id if author_id == user_id else user_id,
+                post_id=post_id,
+                created=created,
+            )
+            for post_id, author_id, created in posts
+        ],
+        ignore_conflicts=True,
+        batch_size=1000,
+    )
+
+
+def trim_friendship(user_id, friend_id):
+    # 친구 관계가 끊긴 두 유저의 타임라인에서 서로의 게시글을 제거
+    TimelineEntry.objects.filter(user=user_id, post__author=friend_id).delete()
+    TimelineEntry.objects.filter(user=friend_id, post__author=user_id).delete()
@@ -0,0 +1,77 @@
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .blobs import blob_name
+from .media import FILE_FIELD, upload_pool
+from .models import Blob
+
+SIGNING_SALT = "newsfeed.uploads"
+
+
+def local_target(request, name, max_size):
+    # S3의 presigned POST처럼 서명된 fields와 함께 파일을 보내면 서버가 name에 저장 (LocalUploadView)
+    policy = signing.dumps({"key": name, "max_size": max_size}, salt=SIGNING_SALT)
+    return {
+        "url": request.build_absolute_uri(reverse("local_upload")),
+        "fields": {"key": name, "policy": policy},
+    }
+
+
+def load_policy(key, policy):
+    # 서명이 맞고 만료되지 않았으면 최대 크기 반환, 아니면 signing.BadSignature
+    data = signing.loads(policy, salt=SIGNING_SALT, max_age=settings.UPLOAD_URL_EXPIRES)
+    if data["key"] != key:
+        raise signing.BadSignature("key mismatch")
+    return data["max_size"]
+
+
+def issue_uploads(request, files, storage=None):
+    # files({"name", "size"})마다 클라이언트가 storage에 직접 올릴 key와 업로드 form(url, fields) 발급
+    # 발급한 key는 참조하는 곳이 없는 Blob이므로 게시글/댓글에 사용하지 않으면 sweep에서 삭제
+    storage = storage or FILE_FIELD.storage
+    max_size = settings.MAX_UPLOAD_FILE_SIZE
+    for file in files:
+        if file["size"] > max_size:
+            raise ValidationError(f"{file['name']}: 파일이 너무 큽니다.")
+
+    blobs = []
+    for file in files:
+        # 올리기 전에는 내용을 모르므로 임의의 값을 해시 자리에
+        digest = uuid.uuid4().hex
+        blobs.append(
+            Blob(
+                hash=digest,
+                name=blob_name(storage, digest, file["name"]),
+                uploader=request.user,
+            )
+        )
+    Blob.objects.bulk_create(blobs)
+
+    targets = []
+    for blob in blobs:
+        if settings.LOCAL_UPLOAD_URLS or not hasattr(storage, "presigned_post"):
+            target = local_target(request, blob.name, max_size)
+        else:
+            target = storage.presigned_post(
+                blob.name, max_size, settings.UPLOAD_URL_EXPIRES
+            )
+        targets.append({"key": blob.name, **target})
+    return targets
+
+
+def claim_uploads(user, keys, storage=None):
+    # 게시글/댓글에 사용할 key가 user가 발급받아서 올리기를 마친 파일인지 확인하고 key 목록 반환
+    # touched를 갱신해서 커밋 전에 sweep에서 지워지지 않도록
+    storage = storage or FILE_FIELD.storage
+    unique = set(keys)
+    claimed = Blob.objects.filter(name__in=unique, uploader=user).update(
+        touched=timezone.now()
+    )
+    if claimed != len(unique) or not all(upload_pool.map(storage.exists, unique)):
+        raise ValidationError("올리지 않은 파일입니다.")
+    return list(keys)
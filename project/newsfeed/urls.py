@@ -4,17 +4,26 @@ from .views import (
     PostUpdateView,
     PostLikeView,
     CommentListView,
+    CommentChildrenListView,
     CommentLikeView,
     CommentUpdateDeleteView,
+    UploadView,
+    LocalUploadView,
 )
 from notice.views import NoticeOnOffView
 
 urlpatterns = [
     path("newsfeed/", PostListView.as_view()),
+    path("newsfeed/uploads/", UploadView.as_view()),
+    path("newsfeed/uploads/local/", LocalUploadView.as_view(), name="local_upload"),
     path("newsfeed/<int:pk>/", PostUpdateView.as_view()),
     path("newsfeed/<int:post_id>/notice/", NoticeOnOffView.as_view()),
     path("newsfeed/<int:post_id>/comment/", CommentListView.as_view()),
     path("newsfeed/<int:post_id>/<int:comment_id>/", CommentUpdateDeleteView.as_view()),
     path("newsfeed/<int:post_id>/like/", PostLikeView.as_view()),
     path("newsfeed/<int:post_id>/<int:comment_id>/like/", CommentLikeView.as_view()),
+    path(
+        "newsfeed/<int:post_id>/<int:comment_id>/children/",
+        CommentChildrenListView.as_view(),
+    ),
 ]
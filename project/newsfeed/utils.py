@@ -1,4 +1,9 @@
+from ast import literal_eval
 from datetime import datetime, timedelta
+from django.db import IntegrityError, OperationalError, transaction
+from django.db.models import F
+from django.http import Http404, QueryDict
+from user.models import User
 
 
 def format_time(time):
@@ -26,3 +31,99 @@ def get_directory_path(instance, filename):
 
 def comment_directory_path(instance, filename):
     return f"user/{instance.author}/comments/{instance.id}/{filename}"
+
+
+def form_data(request):
+    # request.data에서 파일을 뺀 값만 복사 (임시 파일로 받은 파일은 deepcopy할 수 없으므로)
+    if not isinstance(request.data, QueryDict):
+        return request.data.copy()
+    data = QueryDict(mutable=True)
+    for key, values in request.data.lists():
+        if key not in request.FILES:
+            data.setlist(key, values)
+    return data
+
+
+def get_list(data, key):
+    # form(QueryDict)과 JSON 요청에서 같은 방식으로 목록 값 가져오기
+    if isinstance(data, QueryDict):
+        return data.getlist(key, [])
+    value = data.get(key)
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def parse_subpost(subpost):
+    # form에서는 문자열, JSON에서는 객체
+    return literal_eval(subpost) if isinstance(subpost, str) else subpost
+
+
+# MySQL에서 교착 상태로 트랜잭션이 취소된 경우의 오류 코드 (ER_LOCK_DEADLOCK)
+DEADLOCK_ERROR_CODE = 1213
+TOGGLE_LIKE_RETRIES = 3
+
+
+def toggle_like(obj, user):
+    # 좋아요 테이블에 조건부 삽입/삭제 후 likes만 원자적으로 갱신
+    # 좋아요 했으면 True, 취소했으면 False, 동시 요청으로 이미 반영된 경우 None
+    # 교착 상태로 취소되면 다시 시도, 바깥 트랜잭션이 있으면 함께 취소되었으므로 그대로 raise
+    retries = 0 if transaction.get_connection().in_atomic_block else TOGGLE_LIKE_RETRIES
+    for attempt in range(retries + 1):
+        try:
+            liked = apply_like(obj, user)
+            break
+        except OperationalError as error:
+            if attempt == retries or error.args[:1] != (DEADLOCK_ERROR_CODE,):
+                raise
+
+    obj.refresh_from_db(fields=["likes"])
+    return liked
+
+
+def apply_like(obj, user):
+    manager = obj.likeusers
+    lookup = {manager.source_field_name: obj, manager.target_field_name: user}
+    rows = manager.through.objects.filter(**lookup)
+    objects = type(obj).objects.filter(pk=obj.pk)
+
+    with transaction.atomic():
+        # 없는 row를 먼저 DELETE하면 REPEATABLE READ에서 gap lock을 잡아 동시 INSERT와 교착되므로
+        # INSERT를 먼저 하고, 이미 있는 경우에만 삭제
+        try:
+            with transaction.atomic():
+                manager.through.objects.create(**lookup)
+        except IntegrityError:
+            deleted, _ = rows.delete()
+            if not deleted:
+                return None
+            objects.filter(likes__gt=0).update(likes=F("likes") - 1)
+            return False
+        objects.update(likes=F("likes") + 1)
+        return True
+
+
+def tag_users(obj, user_ids):
+    # 태그할 유저들을 한번에 검증하고 태그 테이블에 한번에 추가, 태그된 유저 id 목록 반환
+    user_ids = {int(user_id) for user_id in user_ids}
+    if not user_ids:
+        return []
+
+    found = set(User.objects.filter(id__in=user_ids).values_list("id", flat=True))
+    if found != user_ids:
+        raise Http404("태그할 유저가 존재하지 않습니다.")
+
+    manager = obj.tagged_users
+    manager.through.objects.bulk_create(
+        [
+            manager.through(
+                **{
+                    manager.source_field_name: obj,
+                    f"{manager.target_field_name}_id": user_id,
+                }
+            )
+            for user_id in user_ids
+        ],
+        ignore_conflicts=True,
+    )
+    return list(user_ids)
@@ -1,13 +1,16 @@
 from drf_yasg import openapi
 from rest_framework import status, permissions, parsers
 from rest_framework.generics import (
+    ListAPIView,
     ListCreateAPIView,
     GenericAPIView,
     RetrieveUpdateDestroyAPIView,
 )
 from rest_framework.response import Response
-from django.db.models import Q
+from django.conf import settings
+from django.core import signing
 from django.db import transaction
+from django.db.models import F
 from rest_framework.views import APIView
 from ast import literal_eval
 
@@ -18,6 +21,7 @@ from .serializers import (
     CommentCreateSerializer,
     CommentSerializer,
     CommentLikeSerializer,
+    UploadRequestSerializer,
 )
 from .swagger import (
     CommentCreateSwaggerSerializer,
@@ -26,12 +30,20 @@ from .swagger import (
     PostUpdateSwaggerSerializer,
 )
 from .models import Post, Comment
+from .pagination import CommentChildrenPagination
 from user.models import User
 from datetime import datetime
 from django.shortcuts import get_object_or_404
 from drf_yasg.utils import swagger_auto_schema, no_body
 from rest_framework.parsers import DataAndFiles, MultiPartParser, FormParser, JSONParser
-from notice.views import NoticeCancel, NoticeCreate
+from notice.views import NoticeCancel, NoticeCreate, NoticeBulkCreate
+from .utils import form_data, get_list, parse_subpost, toggle_like, tag_users
+from .media import FILE_FIELD, upload_media
+from .uploads import claim_uploads, issue_uploads, load_policy
+from .blobs import save_blob, set_blob, upload_blob
+from config.images import generate_variants
+from .likebuffer import like_buffer
+from .visibility import get_visibility
 from config.permissions import IsValidAccount
 
 
@@ -40,29 +52,27 @@ class PostListView(ListCreateAPIView):
     serializer_class = PostSerializer
     queryset = Post.objects.all()
     permission_classes = (permissions.IsAuthenticated & IsValidAccount,)
-    parser_classes = (MultiPartParser,)
+    parser_classes = (MultiPartParser, JSONParser)
 
     @swagger_auto_schema(
-        operation_description="로그인된 유저의 friend들의 post들을 최신순으로 가져오기(현재는 모든 유저 가져오도록 설정되어 있음)",
+        operation_description="로그인된 유저와 friend들의 post들을 최신순으로 가져오기",
         responses={200: PostSerializer()},
     )
     def get(self, request):
 
-        user = request.user
+        # 친구 및 자신의 mainpost는 작성 시점에 타임라인 테이블에 기록되어 있음
+        self.queryset = request.user.timeline.select_related("post__author")
 
-        self.queryset = Post.objects.filter(
-            (Q(author__in=user.friends.all(), scope__gt=1) | Q(author=user)),
-            mainpost=None,
-        )
-
-        return super().list(request)
+        page = self.paginate_queryset(self.get_queryset())
+        posts = [entry.post for entry in page]
+        serializer = self.get_serializer(posts, many=True)
+        return self.get_paginated_response(serializer.data)
 
     @swagger_auto_schema(
         operation_description="Post 작성하기",
         request_body=PostCreateSwaggerSerializer(),
         responses={201: PostSerializer()},
     )
-    @transaction.atomic
     def post(self, request):
 
         user = request.user
@@ -70,45 +80,46 @@ class PostListView(ListCreateAPIView):
         shared_post = request.data.get("shared_post")
 
         files = request.FILES.getlist("file")
+        # 업로드 URL로 storage에 직접 올린 파일은 file 대신 keys로
+        keys = get_list(request.data, "keys")
 
-        tagged_users = request.data.getlist("tagged_users", [])
+        tagged_users = get_list(request.data, "tagged_users")
 
         context = {"isFile": False, "request": request}
 
-        if files or shared_post:
+        if files or keys or shared_post:
             context["isFile"] = True
 
         scope = request.data.get("scope", 3)
-        data = request.data.copy()
+        data = form_data(request)
         data["scope"] = scope
         serializer = PostSerializer(data=data, context=context)
 
         serializer.is_valid(raise_exception=True)
-        mainpost = serializer.save()
-        for tagged_user in tagged_users:
-            tagged_user = int(tagged_user)
-            mainpost.tagged_users.add(tagged_user)
-            mainpost.save()
-            if user.id != tagged_user:
-                NoticeCreate(
-                    sender=user,
-                    receiver=User.objects.get(id=tagged_user),
-                    content="PostTag",
-                    post=mainpost,
-                )
 
-        if files:
-            subposts = request.data.getlist("subposts", [])
+        if files and keys:
+            return Response(
+                status=status.HTTP_400_BAD_REQUEST,
+                data="file과 keys 중 하나만 보내주세요.",
+            )
+        subposts = get_list(request.data, "subposts") if files or keys else []
+        if len(files or keys) != len(subposts):
+            return Response(
+                status=status.HTTP_400_BAD_REQUEST,
+                data="files와 subposts의 개수를 맞춰주세요.",
+            )
 
-            if len(files) != len(subposts):
-                return Response(
-                    status=status.HTTP_400_BAD_REQUEST,
-                    data="files와 subposts의 개수를 맞춰주세요.",
-                )
+        # 파일은 트랜잭션을 열기 전에 동시에 올리고, 트랜잭션에서는 저장된 이름만 기록
+        names = claim_uploads(user, keys) if keys else upload_media(files)
+        with transaction.atomic():
+            mainpost = serializer.save()
+            tagged_users = tag_users(mainpost, tagged_users)
+            NoticeBulkCreate(
+                sender=user, receivers=tagged_users, content="PostTag", post=mainpost
+            )
 
-            for i in range(len(files)):
-                subpost = subposts[i]
-                subpost = literal_eval(subpost)
+            for i in range(len(names)):
+                subpost = parse_subpost(subposts[i])
                 content = subpost.get("content", "")
                 tagged_users = subpost.get("tagged_users", [])
                 serializer = PostSerializer(
@@ -121,19 +132,14 @@ class PostListView(ListCreateAPIView):
                 )
                 serializer.is_valid(raise_exception=True)
                 subpost = serializer.save()
-                subpost.file.save(files[i].name, files[i], save=True)
+                set_blob(subpost, "file", names[i])
+                subpost.save(update_fields=["file"])
+                generate_variants([subpost], "file")
 
-                for tagged_user in tagged_users:
-                    tagged_user = User.objects.get(id=tagged_user)
-                    subpost.tagged_users.add(tagged_user)
-                    subpost.save()
-                    if user != tagged_user:
-                        NoticeCreate(
-                            sender=user,
-                            receiver=tagged_user,
-                            content="PostTag",
-                            post=subpost,
-                        )
+                tagged_users = tag_users(subpost, tagged_users)
+                NoticeBulkCreate(
+                    sender=user, receivers=tagged_users, content="PostTag", post=subpost
+                )
 
         return Response(
             PostSerializer(mainpost, context={"request": request}).data,
@@ -141,6 +147,50 @@ class PostListView(ListCreateAPIView):
         )
 
 
+class UploadView(APIView):
+    permission_classes = (permissions.IsAuthenticated & IsValidAccount,)
+
+    @swagger_auto_schema(
+        operation_description="파일을 서버를 거치지 않고 storage에 직접 올릴 업로드 URL 발급받기\n"
+        "각 파일을 url에 fields와 함께 multipart/form-data(file)로 올린 뒤 "
+        "게시글 작성/수정의 keys, 댓글 작성의 key에 발급받은 key를 넣어주세요.",
+        request_body=UploadRequestSerializer(),
+    )
+    def post(self, request):
+        serializer = UploadRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(
+            issue_uploads(request, serializer.validated_data["files"]),
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class LocalUploadView(APIView):
+    # S3를 쓰지 않을 때(LOCAL_UPLOAD_URLS, 테스트) presigned POST 대신 파일을 받는 업로드 URL
+    permission_classes = (permissions.AllowAny,)
+    authentication_classes = ()
+    parser_classes = (MultiPartParser,)
+
+    @swagger_auto_schema(auto_schema=None)
+    def post(self, request):
+        key = request.data.get("key", "")
+        try:
+            max_size = load_policy(key, request.data.get("policy", ""))
+        except signing.BadSignature:
+            return Response(
+                status=status.HTTP_403_FORBIDDEN, data="유효하지 않은 업로드 URL입니다."
+            )
+
+        file = request.FILES.get("file")
+        if file is None:
+            return Response(status=status.HTTP_400_BAD_REQUEST, data="파일을 올려주세요.")
+        if file.size > max_size:
+            return Response(status=status.HTTP_400_BAD_REQUEST, data="파일이 너무 큽니다.")
+
+        upload_blob(FILE_FIELD.storage, key, file)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 class PostUpdateView(RetrieveUpdateDestroyAPIView):
     serializer_class = PostSerializer
     queryset = Post.objects.all()
@@ -156,22 +206,9 @@ class PostUpdateView(RetrieveUpdateDestroyAPIView):
     def get(self, request, pk=None):
 
         post = get_object_or_404(Post, pk=pk)
-        user = request.user
 
-        if post.author == user:
-            pass
-
-        elif user in post.author.friends.all():
-            if post.scope == 1:
-                return Response(
-                    status=status.HTTP_404_NOT_FOUND, data="해당 게시글이 존재하지 않습니다."
-                )
-
-        else:
-            if post.scope < 3:
-                return Response(
-                    status=status.HTTP_404_NOT_FOUND, data="해당 게시글이 존재하지 않습니다."
-                )
+        if not get_visibility(request).can_view(post):
+            return Response(status=status.HTTP_404_NOT_FOUND, data="해당 게시글이 존재하지 않습니다.")
         return Response(
             PostSerializer(post, context={"request": request}).data,
             status=status.HTTP_200_OK,
@@ -182,7 +219,6 @@ class PostUpdateView(RetrieveUpdateDestroyAPIView):
         request_body=PostUpdateSwaggerSerializer(),
         responses={200: PostSerializer()},
     )
-    @transaction.atomic
     def put(self, request, pk=None):
 
         post = get_object_or_404(Post, pk=pk)
@@ -200,6 +236,7 @@ class PostUpdateView(RetrieveUpdateDestroyAPIView):
 
         content = request.data.get("content")
         files = request.FILES.getlist("file", [])
+        keys = request.data.getlist("keys")
         subposts = request.data.getlist("subposts")
         scope = request.data.get("scope")
         removed_subposts = request.data.getlist("removed_subposts")
@@ -216,7 +253,12 @@ class PostUpdateView(RetrieveUpdateDestroyAPIView):
             scope = int(scope)
             post.scope = scope
 
-        if len(files) != len(new_subposts):
+        if files and keys:
+            return Response(
+                status=status.HTTP_400_BAD_REQUEST,
+                data="file과 keys 중 하나만 보내주세요.",
+            )
+        if len(files or keys) != len(new_subposts):
             return Response(
                 status=status.HTTP_400_BAD_REQUEST,
                 data="new_subposts와 files의 개수를 맞춰주세요.",
@@ -228,112 +270,103 @@ class PostUpdateView(RetrieveUpdateDestroyAPIView):
             if not content:
                 return Response(status=status.HTTP_400_BAD_REQUEST, data="내용을 입력해주세요.")
 
-        post.content = content
-
-        canceled_users = post.tagged_users.exclude(id__in=tagged_users)
-        for canceled_user in canceled_users:
-            post.tagged_users.remove(canceled_user)
-            if user != canceled_user:
-                NoticeCancel(
-                    sender=user,
-                    receiver=canceled_user,
-                    content="PostTag",
-                    post=post,
-                )
-
-        for tagged_user in tagged_users:
+        # 새 파일은 트랜잭션을 열기 전에 동시에 올리고, 트랜잭션에서는 저장된 이름만 기록
+        names = claim_uploads(user, keys) if keys else upload_media(files)
+        with transaction.atomic():
+            post.content = content
 
-            if not post.tagged_users.filter(id=tagged_user).exists():
-                tagged_user = get_object_or_404(User, id=tagged_user)
-                post.tagged_users.add(tagged_user)
-                if user != tagged_user:
-                    NoticeCreate(
+            canceled_users = post.tagged_users.exclude(id__in=tagged_users)
+            for canceled_user in canceled_users:
+                post.tagged_users.remove(canceled_user)
+                if user != canceled_user:
+                    NoticeCancel(
                         sender=user,
-                        receiver=tagged_user,
+                        receiver=canceled_user,
                         content="PostTag",
                         post=post,
                     )
-        post.save()
-
-        # subposts 삭제
-        if removed_subposts:
-            removed_subposts = post.subposts.filter(id__in=removed_subposts)
-            removed_subposts.delete()
-
-        # 기존의 subposts content 수정
-        if subposts:
-            for subpost in subposts:
-                subpost = literal_eval(subpost)
-                subpost_content = subpost.get("content", "")
-                subpost_id = subpost["id"]
-                subpost_tagged_users = subpost.get("tagged_users", [])
-
-                subpost = get_object_or_404(post.subposts, id=subpost_id)
-                subpost.content = subpost_content
-                if scope:
-                    subpost.scope = scope
-
-                canceled_users = subpost.tagged_users.exclude(
-                    id__in=subpost_tagged_users
-                )
-                for canceled_user in canceled_users:
-                    subpost.tagged_users.remove(canceled_user)
-                    if user != canceled_user:
-                        NoticeCancel(
-                            sender=user,
-                            receiver=canceled_user,
-                            content="PostTag",
-                            post=subpost,
-                        )
-
-                for subpost_tagged_user in subpost_tagged_users:
-
-                    if not subpost.tagged_users.filter(id=subpost_tagged_user).exists():
-                        subpost_tagged_user = get_object_or_404(
-                            User, id=subpost_tagged_user
-                        )
-                        subpost.tagged_users.add(subpost_tagged_user)
-                        if user != subpost_tagged_user:
-                            NoticeCreate(
+
+            new_tagged_users = set(map(int, tagged_users)) - set(
+                post.tagged_users.values_list("id", flat=True)
+            )
+            new_tagged_users = tag_users(post, new_tagged_users)
+            NoticeBulkCreate(
+                sender=user, receivers=new_tagged_users, content="PostTag", post=post
+            )
+            post.save()
+
+            # subposts 삭제
+            if removed_subposts:
+                removed_subposts = post.subposts.filter(id__in=removed_subposts)
+                removed_subposts.delete()
+
+            # 기존의 subposts content 수정
+            if subposts:
+                for subpost in subposts:
+                    subpost = literal_eval(subpost)
+                    subpost_content = subpost.get("content", "")
+                    subpost_id = subpost["id"]
+                    subpost_tagged_users = subpost.get("tagged_users", [])
+
+                    subpost = get_object_or_404(post.subposts, id=subpost_id)
+                    subpost.content = subpost_content
+                    if scope:
+                        subpost.scope = scope
+
+                    canceled_users = subpost.tagged_users.exclude(
+                        id__in=subpost_tagged_users
+                    )
+                    for canceled_user in canceled_users:
+                        subpost.tagged_users.remove(canceled_user)
+                        if user != canceled_user:
+                            NoticeCancel(
                                 sender=user,
-                                receiver=subpost_tagged_user,
+                                receiver=canceled_user,
                                 content="PostTag",
                                 post=subpost,
                             )
 
-                subpost.save()
-
-        # 파일 추가하는 경우 subpost 추가
-        if files:
-
-            for i in range(len(files)):
-                new_subpost = new_subposts[i]
-                new_subpost = literal_eval(new_subpost)
-                serializer = PostSerializer(
-                    data={
-                        "content": new_subpost.get("content", ""),
-                        "mainpost": post.id,
-                        "scope": post.scope,
-                    },
-                    context={"isFile": True, "request": request},
-                )
-                serializer.is_valid(raise_exception=True)
-                subpost = serializer.save()
-                subpost.file.save(files[i].name, files[i], save=True)
-
-                subpost_tagged_users = new_subpost.get("tagged_users", [])
+                    new_tagged_users = set(map(int, subpost_tagged_users)) - set(
+                        subpost.tagged_users.values_list("id", flat=True)
+                    )
+                    new_tagged_users = tag_users(subpost, new_tagged_users)
+                    NoticeBulkCreate(
+                        sender=user,
+                        receivers=new_tagged_users,
+                        content="PostTag",
+                        post=subpost,
+                    )
 
-                for subpost_tagged_user in subpost_tagged_users:
-                    subpost_tagged_user = User.objects.get(id=subpost_tagged_user)
-                    subpost.tagged_users.add(subpost_tagged_user)
                     subpost.save()
-                    if user != subpost_tagged_user:
-                        NoticeCreate(
-                            sender=user,
-                            receiver=subpost_tagged_user,
-                            content="PostTag",
-                            post=subpost,
-                        )
+
+            # 파일 추가하는 경우 subpost 추가
+            if names:
+
+                for i in range(len(names)):
+                    new_subpost = new_subposts[i]
+                    new_subpost = literal_eval(new_subpost)
+                    serializer = PostSerializer(
+                        data={
+                            "content": new_subpost.get("content", ""),
+                            "mainpost": post.id,
+                            "scope": post.scope,
+                        },
+                        context={"isFile": True, "request": request},
+                    )
+                    serializer.is_valid(raise_exception=True)
+                    subpost = serializer.save()
+                    set_blob(subpost, "file", names[i])
+                    subpost.save(update_fields=["file"])
+                    generate_variants([subpost], "file")
+
+                    subpost_tagged_users = new_subpost.get("tagged_users", [])
+                    subpost_tagged_users = tag_users(subpost, subpost_tagged_users)
+                    NoticeBulkCreate(
+                        sender=user,
+                        receivers=subpost_tagged_users,
+                        content="PostTag",
+                        post=subpost,
+                    )
         return Response(
             self.get_serializer(post).data,
             status=status.HTTP_200_OK,
@@ -371,6 +404,11 @@ class PostUpdateView(RetrieveUpdateDestroyAPIView):
                                 post=post,
                             )
 
+        if post.is_sharing and post.shared_post_id:
+            Post.objects.filter(id=post.shared_post_id, share_count__gt=0).update(
+                share_count=F("share_count") - 1
+            )
+
         return super().destroy(request, pk=pk)
 
     # 부모의 patch 메서드를 drf-yasg가 읽지 않게 오버리이딩
@@ -401,11 +439,15 @@ class PostLikeView(GenericAPIView):
             )
         """
         # 친구만 좋아요 할 수 있도록 하는 기능 해제
+        # 버퍼 사용시 DB 반영과 알림은 like_buffer가 모아서 처리
+        if settings.LIKE_BUFFER_ENABLED:
+            like_buffer.toggle(post, user)
+            return Response(self.get_serializer(post).data, status=status.HTTP_200_OK)
+
+        liked = toggle_like(post, user)
+
         # 이미 좋아요 한 게시물 -> 좋아요 취소, 관련 알림 삭제
-        if post.likeusers.filter(id=user.id).exists():
-            post.likeusers.remove(user)
-            post.likes = post.likes - 1
-            post.save()
+        if liked is False:
             if user.id != post.author.id:
                 NoticeCancel(
                     sender=user,
@@ -415,11 +457,7 @@ class PostLikeView(GenericAPIView):
                 )
 
         # 좋아요 하지 않은 게시물 -> 좋아요 하기, 알림 생성
-        else:
-            post.likeusers.add(user)
-            post.likes = post.likes + 1
-            post.save()
-
+        elif liked:
             if user.id != post.author.id:
                 NoticeCreate(
                     sender=user, receiver=post.author, content="PostLike", post=post
@@ -440,7 +478,12 @@ class CommentListView(ListCreateAPIView):
     serializer_class = CommentListSerializer
     queryset = Post.objects.all()
     permission_classes = (permissions.IsAuthenticated & IsValidAccount,)
-    parser_classes = (parsers.MultiPartParser, parsers.FileUploadParser)
+    # FileUploadParser는 모든 Content-Type을 받으므로 마지막에
+    parser_classes = (
+        parsers.MultiPartParser,
+        parsers.JSONParser,
+        parsers.FileUploadParser,
+    )
 
     # ListModelMixin의 list() 메소드 오버라이딩
     def list(self, request, *args, **kwargs):
@@ -460,7 +503,12 @@ class CommentListView(ListCreateAPIView):
         responses={200: CommentListSerializer()},
     )
     def get(self, request, post_id=None):
-        self.queryset = Comment.objects.filter(post=post_id, depth=0).order_by("-id")
+        # 답글 미리보기는 CommentBatch에서 (root, path) 인덱스로 한번에 불러옴
+        self.queryset = (
+            Comment.objects.filter(post=post_id, depth=0)
+            .select_related("author")
+            .order_by("-id")
+        )
         return self.list(request)
 
     @swagger_auto_schema(
@@ -479,13 +527,13 @@ class CommentListView(ListCreateAPIView):
     @transaction.atomic
     def post(self, request, post_id=None):
         user = request.user
-        data = request.data.copy()
+        data = form_data(request)
         data["author"] = user.id
 
         post = get_object_or_404(self.queryset, pk=post_id)
         data["post"] = post.id
 
-        tagged_users = request.data.getlist("tagged_users")
+        tagged_users = get_list(request.data, "tagged_users")
 
         """
         if (
@@ -503,9 +551,20 @@ class CommentListView(ListCreateAPIView):
         serializer.is_valid(raise_exception=True)
         comment = serializer.save()
 
+        Post.objects.filter(id=post.id).update(comment_count=F("comment_count") + 1)
+
         file = request.FILES.get("file")
-        if file:
-            comment.file.save(file.name, file, save=True)
+        # 업로드 URL로 storage에 직접 올린 파일은 file 대신 key로
+        key = request.data.get("key")
+        if file or key:
+            name = (
+                claim_uploads(user, [key])[0]
+                if key
+                else save_blob(FILE_FIELD.storage, file)
+            )
+            set_blob(comment, "file", name)
+            comment.save(update_fields=["file"])
+            generate_variants([comment], "file")
 
         if data.get("parent"):
             if user.id != comment.parent.author.id:
@@ -515,6 +574,7 @@ class CommentListView(ListCreateAPIView):
                     content="CommentComment",
                     post=post,
                     parent_comment=comment.parent,
+                    comment=comment,
                 )
         else:
             if user.id != post.author.id:
@@ -523,26 +583,40 @@ class CommentListView(ListCreateAPIView):
                     receiver=post.author,
                     content="PostComment",
                     post=post,
+                    comment=comment,
                 )
 
-        for tagged_user in tagged_users:
-            tagged_user = int(tagged_user)
-            comment.tagged_users.add(tagged_user)
-            comment.save()
-            if user.id != tagged_user:
-                NoticeCreate(
-                    sender=user,
-                    receiver=User.objects.get(id=tagged_user),
-                    content="CommentTag",
-                    post=post,
-                    parent_comment=comment.parent,
-                )
+        tagged_users = tag_users(comment, tagged_users)
+        NoticeBulkCreate(
+            sender=user,
+            receivers=tagged_users,
+            content="CommentTag",
+            post=post,
+            parent_comment=comment.parent,
+            comment=comment,
+        )
 
         return Response(
             self.get_serializer(comment).data, status=status.HTTP_201_CREATED
         )
 
 
+class CommentChildrenListView(ListAPIView):
+    serializer_class = CommentListSerializer
+    queryset = Comment.objects.all()
+    permission_classes = (permissions.IsAuthenticated & IsValidAccount,)
+    pagination_class = CommentChildrenPagination
+
+    @swagger_auto_schema(
+        operation_description="해당 comment의 답글들 작성 순서대로 가져오기",
+        responses={200: CommentListSerializer(many=True)},
+    )
+    def get(self, request, post_id=None, comment_id=None):
+        comment = get_object_or_404(Comment, pk=comment_id, post=post_id)
+        self.queryset = comment.children.select_related("author")
+        return self.list(request)
+
+
 class CommentUpdateDeleteView(GenericAPIView):
     serializer_class = CommentSerializer
     permission_classes = (permissions.IsAuthenticated & IsValidAccount,)
@@ -576,19 +650,18 @@ class CommentUpdateDeleteView(GenericAPIView):
                 content="CommentTag",
                 post=comment.post,
                 parent_comment=comment.parent,
+                comment=comment,
             )
         comment.tagged_users.clear()
-        for tagged_user in tagged_users:
-            tagged_user = int(tagged_user)
-            comment.tagged_users.add(tagged_user)
-            if request.user.id != tagged_user:
-                NoticeCreate(
-                    sender=request.user,
-                    receiver=User.objects.get(id=tagged_user),
-                    content="CommentTag",
-                    post=comment.post,
-                    parent_comment=comment.parent,
-                )
+        tagged_users = tag_users(comment, tagged_users)
+        NoticeBulkCreate(
+            sender=request.user,
+            receivers=tagged_users,
+            content="CommentTag",
+            post=comment.post,
+            parent_comment=comment.parent,
+            comment=comment,
+        )
         comment.save()
         return Response(
             status=status.HTTP_200_OK, data=self.get_serializer(comment).data
@@ -614,6 +687,7 @@ class CommentUpdateDeleteView(GenericAPIView):
                     content="CommentComment",
                     post=post,
                     parent_comment=parent,
+                    comment=comment,
                 )
 
         else:
@@ -623,6 +697,7 @@ class CommentUpdateDeleteView(GenericAPIView):
                     receiver=post.author,
                     content="PostComment",
                     post=post,
+                    comment=comment,
                 )
         if comment.tagged_users.all().exists():
             for tagged_user in comment.tagged_users.all():
@@ -633,9 +708,15 @@ class CommentUpdateDeleteView(GenericAPIView):
                         content="CommentTag",
                         post=post,
                         parent_comment=parent,
+                        comment=comment,
                     )
 
-        comment.delete()
+        # 대댓글도 함께 삭제되므로 삭제된 댓글 수만큼 감소
+        _, deleted = comment.delete()
+        deleted = deleted.get("newsfeed.Comment", 0)
+        Post.objects.filter(id=post.id, comment_count__gte=deleted).update(
+            comment_count=F("comment_count") - deleted
+        )
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -647,22 +728,9 @@ class CommentUpdateDeleteView(GenericAPIView):
 
         comment = get_object_or_404(self.queryset, pk=comment_id, post=post_id)
         post = comment.post
-        user = request.user
-
-        if post.author == user:
-            pass
 
-        elif user in post.author.friends.all():
-            if post.scope == 1:
-                return Response(
-                    status=status.HTTP_404_NOT_FOUND, data="해당 게시글이 존재하지 않습니다."
-                )
-
-        else:
-            if post.scope < 3:
-                return Response(
-                    status=status.HTTP_404_NOT_FOUND, data="해당 게시글이 존재하지 않습니다."
-                )
+        if not get_visibility(request).can_view(post):
+            return Response(status=status.HTTP_404_NOT_FOUND, data="해당 게시글이 존재하지 않습니다.")
 
         return Response(
             status=status.HTTP_200_OK, data=self.get_serializer(comment).data
@@ -683,12 +751,10 @@ class CommentLikeView(GenericAPIView):
         comment = get_object_or_404(self.queryset, pk=comment_id, post=post_id)
         post = comment.post
 
-        # 이미 좋아요 한 댓글 -> 좋아요 취소, 관련 알림 삭제
-        if comment.likeusers.filter(id=user.id).exists():
-            comment.likeusers.remove(user)
-            comment.likes = comment.likes - 1
-            comment.save()
+        liked = toggle_like(comment, user)
 
+        # 이미 좋아요 한 댓글 -> 좋아요 취소, 관련 알림 삭제
+        if liked is False:
             if user.id != comment.author.id:
                 NoticeCancel(
                     sender=user,
@@ -699,11 +765,7 @@ class CommentLikeView(GenericAPIView):
                 )
 
         # 좋아요 하지 않은 댓글 -> 좋아요 하기, 알림 생성
-        else:
-            comment.likeusers.add(user)
-            comment.likes = comment.likes + 1
-            comment.save()
-
+        elif liked:
             if user.id != comment.author.id:
                 NoticeCreate(
                     sender=user,
@@ -0,0 +1,70 @@
+from django.db.models import Exists, OuterRef, Q
+
+from user.models import User
+
+# 게시글 공개범위 (scope: 1(자기 자신), 2(친구), 3(전체 공개))
+SCOPE_SELF = 1
+SCOPE_FRIENDS = 2
+SCOPE_PUBLIC = 3
+
+Friendship = User.friends.through
+
+
+class Visibility:
+    # viewer가 볼 수 있는 게시글인지 판단
+    # 작성자의 친구 목록 전체를 불러오지 않고, 확인할 작성자들과의 친구 여부만 한번의 쿼리로 불러와 기억
+
+    def __init__(self, viewer):
+        self.viewer = viewer
+        self.friends = {}
+
+    def prefetch(self, author_ids):
+        # 여러 작성자와의 친구 여부를 한번에 불러오기 (피드 한 페이지의 공유된 게시글 등)
+        author_ids = set(author_ids) - self.friends.keys()
+        author_ids.discard(self.viewer.id)
+        if not author_ids:
+            return
+        friend_ids = set(
+            Friendship.objects.filter(
+                from_user=self.viewer.id, to_user__in=author_ids
+            ).values_list("to_user", flat=True)
+        )
+        for author_id in author_ids:
+            self.friends[author_id] = author_id in friend_ids
+
+    def is_friend(self, author_id):
+        self.prefetch([author_id])
+        return self.friends.get(author_id, False)
+
+    def min_scope(self, author_id):
+        # viewer가 볼 수 있는 author의 게시글 중 가장 좁은 공개범위
+        if author_id == self.viewer.id:
+            return SCOPE_SELF
+        if self.is_friend(author_id):
+            return SCOPE_FRIENDS
+        return SCOPE_PUBLIC
+
+    def can_view(self, post):
+        return post.scope >= self.min_scope(post.author_id)
+
+    def filter(self, queryset):
+        # queryset을 viewer가 볼 수 있는 게시글로 거르기 (친구 여부는 DB에서 EXISTS로 확인)
+        is_friend = Exists(
+            Friendship.objects.filter(
+                from_user=self.viewer.id, to_user=OuterRef("author")
+            )
+        )
+        return queryset.filter(
+            Q(author=self.viewer.id)
+            | Q(scope__gte=SCOPE_PUBLIC)
+            | Q(is_friend, scope__gte=SCOPE_FRIENDS)
+        )
+
+
+def get_visibility(request):
+    # 한 요청 안에서는 같은 Visibility를 사용해 친구 여부를 다시 조회하지 않기
+    visibility = getattr(request, "_visibility", None)
+    if visibility is None or visibility.viewer != request.user:
+        visibility = Visibility(request.user)
+        request._visibility = visibility
+    return visibility
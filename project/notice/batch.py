@@ -0,0 +1,62 @@
+from collections import defaultdict
+
+from newsfeed.models import Post, Comment
+from newsfeed.serializers import PostSerializer
+from .models import NoticeSender
+from .utils import latest_notice_comment
+
+
+class NoticeBatch:
+    # 한 페이지의 알림을 렌더링하는데 필요한 게시글, 댓글, 보낸 유저를
+    # 알림 개수와 상관없이 고정된 개수의 쿼리로 한번에 불러오기
+
+    def __init__(self, notices, context=None, compact=False):
+        context = context or {}
+
+        # 보낸 유저
+        self.senders = defaultdict(list)
+        for notice_sender in (
+            NoticeSender.objects.filter(notice__in=[notice.id for notice in notices])
+            .select_related("user")
+            .order_by("id")
+        ):
+            self.senders[notice_sender.notice_id].append(notice_sender)
+
+        # 게시글
+        self.posts = Post.objects.in_bulk(
+            {notice.post_id for notice in notices if notice.post_id}
+        )
+        self.post_data = {}
+        if not compact and self.posts:
+            self.post_data = {
+                data["id"]: data
+                for data in PostSerializer(
+                    list(self.posts.values()), many=True, context=context
+                ).data
+            }
+
+        # 부모 댓글과 미리보기 댓글
+        comment_ids = set()
+        for notice in notices:
+            comment_ids.update((notice.parent_comment_id, notice.latest_comment_id))
+        comment_ids.discard(None)
+        self.comments = Comment.objects.select_related("author").in_bulk(comment_ids)
+
+        # 저장된 미리보기 댓글이 없는 알림(댓글이 삭제되는 도중 등)은 직접 찾기
+        self.latest_comments = {}
+        for notice in notices:
+            if notice.latest_comment_id in self.comments:
+                comment = self.comments[notice.latest_comment_id]
+            else:
+                comment = latest_notice_comment(notice)
+            self.latest_comments[notice.id] = comment
+
+    def covers(self, notice):
+        return notice.id in self.latest_comments
+
+    def latest_sender(self, notice):
+        senders = self.senders[notice.id]
+        for notice_sender in senders:
+            if notice_sender.user_id == notice.latest_sender_id:
+                return notice_sender
+        return senders[-1] if senders else None
@@ -0,0 +1,75 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from user.models import User
+from .models import Notice
+
+
+def add_unread(user_ids, amount):
+    # 읽지 않은 알림 개수를 amount만큼 증가(음수면 감소)
+    if not user_ids or not amount:
+        return
+    users = User.objects.filter(id__in=user_ids)
+    if amount < 0:
+        users = users.filter(unread_notice_count__gte=-amount)
+    users.update(unread_notice_count=F("unread_notice_count") + amount)
+
+
+def add_unread_each(amounts):
+    # 유저마다 다른 개수(amounts[user_id])만큼 증가, 개수가 같은 유저끼리 한번의 UPDATE
+    user_ids = defaultdict(list)
+    for user_id, amount in amounts.items():
+        user_ids[amount].append(user_id)
+    for amount, ids in user_ids.items():
+        add_unread(ids, amount)
+
+
+def subtract_unread(notices):
+    # 삭제할 notices 중 읽지 않은 알림 개수만큼 유저별로 줄이기
+    add_unread_each(
+        {
+            user_id: -count
+            for user_id, count in notices.filter(is_checked=False)
+            .values("user")
+            .annotate(count=Count("id"))
+            .values_list("user", "count")
+        }
+    )
+
+
+def mark_checked(notice):
+    # 읽지 않은 알림을 읽음으로 바꾸고, 실제로 바뀐 경우에만 개수 감소
+    updated = Notice.objects.filter(id=notice.id, is_checked=False).update(
+        is_checked=True
+    )
+    notice.is_checked = True
+    add_unread([notice.user_id], -updated)
+    return bool(updated)
+
+
+def delete_notice(notice):
+    # 읽음으로 바꿔서 읽지 않은 알림이었던 경우에만 개수를 줄이고 삭제
+    with transaction.atomic():
+        mark_checked(notice)
+        notice.delete()
+
+
+def mark_all(user, is_checked, chunk_size=1000):
+    # 유저의 모든 알림을 chunk_size개씩 한번의 UPDATE로 바꾸고, 바뀐 개수만큼 읽지 않은 알림 개수 조정
+    updated = 0
+    while True:
+        with transaction.atomic():
+            notice_ids = list(
+                Notice.objects.filter(user=user, is_checked=not is_checked)
+                .order_by("id")
+                .values_list("id", flat=True)[:chunk_size]
+            )
+            if not notice_ids:
+                return updated
+            count = Notice.objects.filter(
+                id__in=notice_ids, is_checked=not is_checked
+            ).update(is_checked=is_checked)
+            add_unread([user.id], -count if is_checked else count)
+        updated += count
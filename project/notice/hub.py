@@ -0,0 +1,335 @@
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Max, QuerySet
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import StreamListener, StreamMessage
+
+logger = logging.getLogger(__name__)
+
+
+class InMemoryHub:
+    # 알림 스트림용 pub/sub, 같은 프로세스 안의 구독자에게만 전달 (테스트, 프로세스가 하나인 개발 서버용)
+    # 여러 프로세스로 배포할 때는 DatabaseHub
+
+    def __init__(self, history_size=100, max_users=10000):
+        self.lock = threading.Lock()
+        self.last_id = 0
+        self.subscribers = {}
+        # 재연결(Last-Event-ID)을 위해 스트림에 연결했던 유저의 최근 이벤트를 보관
+        self.history = OrderedDict()
+        self.history_size = history_size
+        self.max_users = max_users
+
+    def next_id(self):
+        # 프로세스가 재시작되어도 줄어들지 않도록 시간(ms) 기반으로 증가하는 id
+        self.last_id = max(self.last_id + 1, int(time.time() * 1000))
+        return self.last_id
+
+    def listening(self, user_ids):
+        # user_ids 중 스트림에 연결했던 유저
+        return {user_id for user_id in user_ids if user_id in self.history}
+
+    def publish(self, user_id, event, data):
+        with self.lock:
+            if user_id not in self.history:
+                return None
+            message = (self.next_id(), event, data)
+            self.history[user_id].append(message)
+            subscribers = list(self.subscribers.get(user_id, ()))
+
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, message)
+            except RuntimeError:
+                # 이미 종료된 이벤트 루프
+                pass
+        return message[0]
+
+    def subscribe(self, user_id, loop, queue, last_event_id=None):
+        # 구독을 등록하고, last_event_id 이후에 발행된 이벤트를 반환
+        # last_event_id가 보관된 이벤트보다 오래되었으면 None (클라이언트가 목록을 다시 불러와야 함)
+        with self.lock:
+            history = self.history.pop(user_id, None)
+            lost = history is None
+            if lost:
+                history = deque(maxlen=self.history_size)
+            self.history[user_id] = history
+            # 오래전에 연결했고 지금은 연결되어 있지 않은 유저의 이벤트부터 정리
+            for old_user_id in list(self.history):
+                if len(self.history) <= self.max_users:
+                    break
+                if old_user_id not in self.subscribers:
+                    del self.history[old_user_id]
+            self.subscribers.setdefault(user_id, set()).add((loop, queue))
+
+            if last_event_id is None:
+                return []
+            missed = [message for message in history if message[0] > last_event_id]
+            if lost or len(missed) == history.maxlen:
+                return None
+            return missed
+
+    def unsubscribe(self, user_id, loop, queue):
+        with self.lock:
+            subscribers = self.subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard((loop, queue))
+                if not subscribers:
+                    del self.subscribers[user_id]
+
+
+class DatabaseHub:
+    # 여러 프로세스에서 쓰는 알림 스트림용 pub/sub, DB 테이블을 통해 전달
+    # publish는 어느 프로세스(WSGI worker, process_notice_events)에서나 StreamMessage에 저장하고
+    # 스트림을 처리하는 ASGI 프로세스는 백그라운드 스레드에서 NOTICE_HUB_POLL_INTERVAL마다
+    # 새 StreamMessage를 id 순서로 읽어서 연결된 구독자에게 전달
+    # 연결된 유저는 StreamListener에 기록하고, 연결이 끊긴 뒤에도 listener_ttl 동안은 이벤트를 저장해서
+    # 재연결(Last-Event-ID)할 때 전달
+
+    listener_ttl = 60
+    # 커밋 순서가 id 순서와 다를 수 있으므로 읽은 id 사이의 빈 id를 다시 읽는 시간(초)
+    gap_timeout = 5
+    max_gap = 1000
+    batch_size = 1000
+
+    def __init__(self, history_size=100):
+        self.lock = threading.Lock()
+        self.subscribers = {}
+        self.history_size = history_size
+        # cursor까지의 id는 모두 읽었고, cursor 이후에 읽은 id는 seen, 아직 보이지 않는 id는 gaps
+        self.cursor = None
+        self.seen = set()
+        self.gaps = {}
+        # 구독자(queue)마다 subscribe에서 이미 보낸 이벤트 id
+        self.skip = {}
+        self.thread = None
+        self.stopped = threading.Event()
+        self.refreshed = self.pruned = 0
+
+    def listening(self, user_ids):
+        # user_ids 중 스트림에 연결되어 있거나 최근에 연결이 끊긴 유저
+        return set(
+            StreamListener.objects.filter(
+                user_id__in=user_ids, expires__gt=timezone.now()
+            ).values_list("user_id", flat=True)
+        )
+
+    def listen(self, user_ids):
+        expires = timezone.now() + timedelta(seconds=self.listener_ttl)
+        updated = set(
+            StreamListener.objects.filter(user_id__in=user_ids).values_list(
+                "user_id", flat=True
+            )
+        )
+        StreamListener.objects.filter(user_id__in=updated).update(expires=expires)
+        try:
+            StreamListener.objects.bulk_create(
+                [
+                    StreamListener(user_id=user_id, expires=expires)
+                    for user_id in set(user_ids) - updated
+                ],
+                ignore_conflicts=True,
+            )
+        except IntegrityError:
+            # 그 사이에 탈퇴한 유저
+            pass
+
+    def publish(self, user_id, event, data):
+        return StreamMessage.objects.create(user_id=user_id, event=event, data=data).id
+
+    def subscribe(self, user_id, loop, queue, last_event_id=None):
+        # 구독을 등록하고, last_event_id 이후에 저장된 이벤트를 반환
+        # 연결이 끊긴 뒤 listener_ttl이 지나서 저장하지 않은 이벤트가 있을 수 있으면 None
+        self.start()
+        stored = bool(self.listening([user_id]))
+        self.listen([user_id])
+        with self.lock:
+            if self.cursor is None:
+                self.cursor = StreamMessage.objects.aggregate(Max("id"))["id__max"] or 0
+            self.subscribers.setdefault(user_id, set()).add((loop, queue))
+
+            if last_event_id is None:
+                return []
+            if not stored:
+                return None
+            missed = list(
+                StreamMessage.objects.filter(user_id=user_id, id__gt=last_event_id)
+                .order_by("id")
+                .values_list("id", "event", "data")[: self.history_size + 1]
+            )
+            # 백그라운드 스레드가 아직 읽지 않은 이벤트는 나중에 읽을 때 이 구독자에게는 다시 보내지 않기
+            self.skip[queue] = {
+                message[0]
+                for message in missed
+                if message[0] > self.cursor and message[0] not in self.seen
+            }
+        if len(missed) > self.history_size:
+            return None
+        return missed
+
+    def unsubscribe(self, user_id, loop, queue):
+        with self.lock:
+            subscribers = self.subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard((loop, queue))
+                if not subscribers:
+                    del self.subscribers[user_id]
+            self.skip.pop(queue, None)
+
+    def poll(self):
+        # 새 StreamMessage를 읽어서 이 프로세스의 구독자에게 전달
+        with self.lock:
+            if self.cursor is None:
+                return
+            cursor = self.cursor
+        messages = list(
+            StreamMessage.objects.filter(id__gt=cursor)
+            .order_by("id")
+            .values_list("id", "user_id", "event", "data")[: self.batch_size]
+        )
+        now = time.monotonic()
+        with self.lock:
+            for message_id, user_id, event, data in messages:
+                if message_id in self.seen:
+                    continue
+                self.seen.add(message_id)
+                self.gaps.pop(message_id, None)
+                for loop, queue in self.subscribers.get(user_id, ()):
+                    skip = self.skip.get(queue)
+                    if skip and message_id in skip:
+                        skip.discard(message_id)
+                        continue
+                    try:
+                        loop.call_soon_threadsafe(
+                            queue.put_nowait, (message_id, event, data)
+                        )
+                    except RuntimeError:
+                        # 이미 종료된 이벤트 루프
+                        pass
+
+            last = max(self.seen, default=self.cursor)
+            if last - self.cursor <= self.max_gap:
+                for message_id in range(self.cursor + 1, last):
+                    if message_id not in self.seen:
+                        self.gaps.setdefault(message_id, now)
+            for message_id, found in list(self.gaps.items()):
+                if now - found > self.gap_timeout:
+                    del self.gaps[message_id]
+            self.cursor = min(self.gaps) - 1 if self.gaps else last
+            self.seen = {
+                message_id for message_id in self.seen if message_id > self.cursor
+            }
+
+    def maintain(self):
+        # 연결된 유저의 StreamListener 갱신, 오래된 StreamMessage와 만료된 StreamListener 삭제
+        now = time.monotonic()
+        if now - self.refreshed > self.listener_ttl / 3:
+            self.refreshed = now
+            with self.lock:
+                user_ids = list(self.subscribers)
+            if user_ids:
+                self.listen(user_ids)
+        if now - self.pruned > self.listener_ttl:
+            self.pruned = now
+            StreamMessage.objects.filter(
+                created__lt=timezone.now()
+                - timedelta(seconds=settings.NOTICE_HUB_RETENTION)
+            ).delete()
+            StreamListener.objects.filter(expires__lt=timezone.now()).delete()
+
+    def run(self):
+        while not self.stopped.wait(settings.NOTICE_HUB_POLL_INTERVAL):
+            close_old_connections()
+            try:
+                self.poll()
+                self.maintain()
+            except Exception:
+                logger.exception("notice hub poll failed")
+            finally:
+                close_old_connections()
+
+    def start(self):
+        # 구독자가 생긴 프로세스(ASGI)에서만 백그라운드 스레드 시작
+        # NOTICE_HUB_POLL_INTERVAL이 0이면 poll()을 직접 호출 (테스트용)
+        with self.lock:
+            if self.thread is not None or not settings.NOTICE_HUB_POLL_INTERVAL:
+                return
+            self.thread = threading.Thread(
+                target=self.run, name="notice-hub", daemon=True
+            )
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_hub():
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                _hub = import_string(settings.NOTICE_HUB)()
+    return _hub
+
+
+def publish_notices(notices):
+    # 커밋된 후에 스트림에 연결된 유저에게만 알림을 보내기
+    # 연결된 유저 확인과 (notices가 queryset이면) 알림 조회도 커밋 후에 해서 쓰기 요청의 트랜잭션에서는 쿼리 없음
+    hub = get_hub()
+
+    def publish():
+        from .serializers import NoticelistSerializer
+
+        if isinstance(notices, QuerySet):
+            listening = hub.listening(notices.values_list("user", flat=True))
+            selected = list(notices.filter(user__in=listening)) if listening else []
+        else:
+            listening = hub.listening({notice.user_id for notice in notices})
+            selected = [notice for notice in notices if notice.user_id in listening]
+        if not selected:
+            return
+        data = NoticelistSerializer(selected, many=True, context={"compact": True}).data
+        for notice, notice_data in zip(selected, data):
+            hub.publish(notice.user_id, "notice", notice_data)
+
+    transaction.on_commit(partial(run_publish, publish))
+
+
+def publish_notice_deleted(notice):
+    publish_notices_deleted([notice])
+
+
+def publish_notices_deleted(notices):
+    hub = get_hub()
+    deleted = [(notice.user_id, notice.id) for notice in notices]
+
+    def publish():
+        listening = hub.listening({user_id for user_id, _ in deleted})
+        for user_id, notice_id in deleted:
+            if user_id in listening:
+                hub.publish(user_id, "notice_deleted", {"id": notice_id})
+
+    transaction.on_commit(partial(run_publish, publish))
+
+
+def run_publish(publish):
+    # 이미 커밋된 요청이 스트림 전달 실패로 500이 되지 않도록
+    try:
+        publish()
+    except Exception:
+        logger.exception("notice publish failed")
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from notice.outbox import drain
+
+
+class Command(BaseCommand):
+    help = "outbox(NoticeEvent)에 쌓인 알림 생성/취소 작업 처리하기"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--loop", action="store_true", help="종료하지 않고 계속 처리하기")
+        parser.add_argument(
+            "--interval", type=float, default=0.5, help="처리할 작업이 없을 때 대기 시간(초)"
+        )
+
+    def handle(self, *args, **options):
+        processed = 0
+        while True:
+            count = drain(options["batch_size"])
+            processed += count
+            if count:
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+            close_old_connections()
+
+        self.stdout.write(f"{processed}개의 알림 작업을 처리했습니다.")
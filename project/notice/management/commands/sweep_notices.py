@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from notice.sweeper import sweep
+
+
+class Command(BaseCommand):
+    help = "만료된(60일이 지난) 알림 삭제하기, cron으로 실행하거나 --loop로 계속 실행"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--loop", action="store_true", help="종료하지 않고 주기적으로 삭제하기")
+        parser.add_argument("--interval", type=float, default=3600, help="삭제 주기(초)")
+
+    def handle(self, *args, **options):
+        deleted = 0
+        while True:
+            deleted += sweep(options["batch_size"])
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+            close_old_connections()
+
+        self.stdout.write(f"{deleted}개의 만료된 알림을 삭제했습니다.")
@@ -0,0 +1,75 @@
+# Generated by Django 3.2.6 on 2026-10-18 09:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_latest_preview(apps, schema_editor):
+    Notice = apps.get_model("notice", "Notice")
+    NoticeSender = apps.get_model("notice", "NoticeSender")
+    Comment = apps.get_model("newsfeed", "Comment")
+
+    for notice in Notice.objects.all().iterator():
+        sender = NoticeSender.objects.filter(notice=notice).order_by("-id").first()
+        notice.latest_sender_id = sender.user_id if sender else None
+
+        comments = None
+        if notice.content == "PostComment":
+            comments = Comment.objects.filter(post_id=notice.post_id)
+        elif notice.content == "CommentComment":
+            comments = Comment.objects.filter(parent_id=notice.parent_comment_id)
+        elif notice.content == "CommentTag":
+            if notice.parent_comment_id:
+                comments = Comment.objects.filter(parent_id=notice.parent_comment_id)
+            else:
+                comments = Comment.objects.filter(post_id=notice.post_id)
+            comments = comments.filter(tagged_users=notice.user_id)
+        if comments is not None:
+            comment = comments.exclude(author=notice.user_id).order_by("-id").first()
+            notice.latest_comment_id = comment.id if comment else None
+
+        notice.save(update_fields=["latest_sender", "latest_comment"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("newsfeed", "0034_post_counters"),
+        ("notice", "0004_noticeevent"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notice",
+            name="latest_comment",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="newsfeed.comment",
+            ),
+        ),
+        migrations.AddField(
+            model_name="notice",
+            name="latest_sender",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="noticeevent",
+            name="comment",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="newsfeed.comment",
+            ),
+        ),
+        migrations.RunPython(backfill_latest_preview, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.6 on 2026-10-18 09:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notice", "0005_notice_latest_preview"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="notice",
+            index=models.Index(
+                fields=["created"], name="notice_noti_created_c61dd9_idx"
+            ),
+        ),
+    ]
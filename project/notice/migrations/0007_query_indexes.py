@@ -0,0 +1,53 @@
+# Generated by Django 3.2.6 on 2026-10-18 10:11
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_senders(apps, schema_editor):
+    # 같은 (notice, user)의 NoticeSender를 count를 합쳐 하나로
+    NoticeSender = apps.get_model("notice", "NoticeSender")
+
+    duplicates = (
+        NoticeSender.objects.filter(notice__isnull=False, user__isnull=False)
+        .values("notice", "user")
+        .annotate(rows=Count("id"), first=Min("id"), total=Sum("count"))
+        .filter(rows__gt=1)
+    )
+    for duplicate in duplicates.iterator():
+        NoticeSender.objects.filter(id=duplicate["first"]).update(
+            count=duplicate["total"]
+        )
+        NoticeSender.objects.filter(
+            notice=duplicate["notice"], user=duplicate["user"]
+        ).exclude(id=duplicate["first"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notice", "0006_notice_created_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="notice",
+            index=models.Index(
+                fields=["user", "-created"], name="notice_noti_user_id_d7856a_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="notice",
+            index=models.Index(
+                fields=["user", "post", "parent_comment", "content"],
+                name="notice_noti_user_id_0b5388_idx",
+            ),
+        ),
+        migrations.RunPython(merge_duplicate_senders, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="noticesender",
+            constraint=models.UniqueConstraint(
+                fields=("notice", "user"), name="unique_notice_sender"
+            ),
+        ),
+    ]
@@ -1,3 +1,4 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.db.models.deletion import CASCADE
 from django.db.models.fields.related import ForeignKey
@@ -19,6 +20,24 @@ class Notice(models.Model):
     is_accepted = models.BooleanField(default=False)
     url = models.CharField(max_length=1000)
 
+    # 알림 목록에서 미리보기를 위해 매번 댓글/보낸 유저를 찾지 않도록 가장 최근 값을 저장
+    latest_sender = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, related_name="+"
+    )
+    latest_comment = models.ForeignKey(
+        Comment, on_delete=models.SET_NULL, null=True, related_name="+"
+    )
+
+    class Meta:
+        indexes = [
+            # 만료된 알림 삭제용
+            models.Index(fields=["created"]),
+            # 알림 목록 (user, -created 순서)
+            models.Index(fields=["user", "-created"]),
+            # 같은 게시글/댓글의 알림을 합치기 위해 기존 알림 찾기
+            models.Index(fields=["user", "post", "parent_comment", "content"]),
+        ]
+
 
 class NoticeSender(models.Model):
     notice = models.ForeignKey(
@@ -28,3 +47,52 @@ class NoticeSender(models.Model):
         User, on_delete=CASCADE, null=True, related_name="noticesenders"
     )
     count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # 같은 유저가 같은 알림을 여러번 보내면 count만 증가
+        constraints = [
+            models.UniqueConstraint(
+                fields=["notice", "user"], name="unique_notice_sender"
+            )
+        ]
+
+
+class NoticeEvent(models.Model):
+    # NoticeCreate/NoticeCancel을 요청 트랜잭션 밖에서 처리하기 위한 outbox
+    CREATE = "create"
+    CANCEL = "cancel"
+
+    action = models.CharField(max_length=10)
+    content = models.CharField(max_length=30)
+    sender = models.ForeignKey(User, on_delete=CASCADE, related_name="+")
+    receiver = models.ForeignKey(User, on_delete=CASCADE, related_name="+")
+    post = models.ForeignKey(Post, on_delete=CASCADE, null=True, related_name="+")
+    parent_comment = models.ForeignKey(
+        Comment, on_delete=CASCADE, null=True, related_name="+"
+    )
+    comment = models.ForeignKey(
+        Comment, on_delete=models.SET_NULL, null=True, related_name="+"
+    )
+    created = models.DateTimeField(auto_now_add=True)
+
+
+class StreamMessage(models.Model):
+    # DatabaseHub로 다른 프로세스(WSGI worker, process_notice_events)에서 알림 스트림에 보내는 이벤트
+    # 스트림을 처리하는 ASGI 프로세스가 id 순서로 읽어서 연결된 유저에게 전달
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=CASCADE, related_name="+")
+    event = models.CharField(max_length=30)
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        # 재연결(Last-Event-ID)할 때 놓친 이벤트 찾기
+        indexes = [models.Index(fields=["user", "id"])]
+
+
+class StreamListener(models.Model):
+    # 알림 스트림에 연결된 유저, 연결된 동안 ASGI 프로세스가 expires를 갱신
+    user = models.OneToOneField(
+        User, on_delete=CASCADE, primary_key=True, related_name="+"
+    )
+    expires = models.DateTimeField(db_index=True)
@@ -0,0 +1,78 @@
+import logging
+
+from django.db import connection, transaction
+
+from .models import NoticeEvent
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(action, context):
+    # 요청에서는 outbox에 한 줄만 추가
+    receiver = context["receiver"]
+    NoticeEvent.objects.create(
+        action=action,
+        content=context["content"],
+        sender=context["sender"],
+        receiver_id=getattr(receiver, "id", receiver),
+        post=context.get("post"),
+        parent_comment=context.get("parent_comment"),
+        comment=context.get("comment"),
+    )
+
+
+def enqueue_bulk(action, context):
+    # 여러 유저에게 보내는 알림은 한번의 insert로 기록
+    sender = context["sender"]
+    NoticeEvent.objects.bulk_create(
+        [
+            NoticeEvent(
+                action=action,
+                content=context["content"],
+                sender=sender,
+                receiver_id=receiver,
+                post=context.get("post"),
+                parent_comment=context.get("parent_comment"),
+                comment=context.get("comment"),
+            )
+            for receiver in set(context["receivers"]) - {sender.id}
+        ]
+    )
+
+
+def drain(batch_size=100):
+    # outbox에 쌓인 알림 작업을 순서대로 처리하고 처리한 개수를 반환
+    from .views import ApplyNoticeCreate, ApplyNoticeCancel
+
+    apply = {
+        NoticeEvent.CREATE: ApplyNoticeCreate,
+        NoticeEvent.CANCEL: ApplyNoticeCancel,
+    }
+
+    with transaction.atomic():
+        events = NoticeEvent.objects.select_related(
+            "sender", "receiver", "post", "parent_comment", "comment"
+        ).order_by("id")
+        if connection.features.has_select_for_update_skip_locked:
+            events = events.select_for_update(skip_locked=True)
+        events = list(events[:batch_size])
+
+        for event in events:
+            try:
+                with transaction.atomic():
+                    apply[event.action](
+                        sender=event.sender,
+                        receiver=event.receiver,
+                        content=event.content,
+                        post=event.post,
+                        parent_comment=event.parent_comment,
+                        comment=event.comment,
+                        created=event.created,
+                    )
+            except Exception:
+                # 처리할 수 없는 작업은 건너뛰어 뒤의 작업이 막히지 않도록
+                logger.exception("notice event %s failed", event.id)
+
+        NoticeEvent.objects.filter(id__in=[event.id for event in events]).delete()
+
+    return len(events)
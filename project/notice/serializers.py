@@ -1,8 +1,9 @@
+from django.db import models
 from rest_framework import serializers
 from newsfeed.models import Post, Comment
 from .models import Notice, NoticeSender
-from user.serializers import UserSerializer
-from newsfeed.serializers import PostSerializer
+from user.serializers import ImageVariantsField, UserSerializer
+from .batch import NoticeBatch
 from .utils import notice_format_time
 
 
@@ -33,12 +34,36 @@ class NoticeSerializer(serializers.ModelSerializer):
             post=post,
             parent_comment=parent_comment,
             url=url,
+            latest_sender=sender,
+            latest_comment=self.context.get("comment"),
         )
         NoticeSender.objects.create(user=sender, notice=notice, count=1)
 
         return notice
 
 
+def with_notice_batch(notices, context):
+    # notices를 모두 포함하는 NoticeBatch가 context에 없으면 새로 만들어 추가한 context
+    batch = context.get("notice_batch")
+    if batch is not None and all(batch.covers(notice) for notice in notices):
+        return context
+    return {
+        **context,
+        "notice_batch": NoticeBatch(notices, context, context.get("compact", False)),
+    }
+
+
+class NoticeBatchListSerializer(serializers.ListSerializer):
+    # 렌더링할 알림 목록이 정해지면 NoticeBatch를 한번 만들어 context로 child에 전달
+    def __init__(self, instance=None, *args, **kwargs):
+        if instance is not None:
+            instance = list(
+                instance.all() if isinstance(instance, models.Manager) else instance
+            )
+            kwargs["context"] = with_notice_batch(instance, kwargs.get("context", {}))
+        super().__init__(instance, *args, **kwargs)
+
+
 class NoticelistSerializer(serializers.ModelSerializer):
 
     posted_at = serializers.SerializerMethodField()
@@ -66,83 +91,78 @@ class NoticelistSerializer(serializers.ModelSerializer):
             "is_accepted",
             "url",
         )
+        list_serializer_class = NoticeBatchListSerializer
+
+    def __init__(self, instance=None, *args, **kwargs):
+        # 알림 렌더링에 필요한 데이터는 NoticeBatch에서 가져오기
+        if isinstance(instance, Notice):
+            kwargs["context"] = with_notice_batch([instance], kwargs.get("context", {}))
+        super().__init__(instance, *args, **kwargs)
+
+    @property
+    def batch(self):
+        return self.context["notice_batch"]
 
     def get_posted_at(self, notice):
-        posted_at = notice_format_time(notice.created)
-        if posted_at == False:
-            notice.delete()
-        return posted_at
+        return notice_format_time(notice.created)
 
     def get_post(self, notice):
-        if notice.post:
-            return PostSerializer(notice.post, context=self.context).data
-        return None
+        post = self.batch.posts.get(notice.post_id)
+        if post is None:
+            return None
+        if self.context.get("compact"):
+            return NoticePostSerializer(post).data
+        return self.batch.post_data[post.id]
 
     def get_sender_preview(self, notice):
+        if notice.content in ("PostComment", "CommentComment", "CommentTag"):
+            comment = self.batch.latest_comments[notice.id]
+            return UserSerializer(comment.author).data if comment else None
 
-        if notice.content == "PostComment":
-            return UserSerializer(
-                notice.post.comments.exclude(author=notice.user).last().author
-            ).data
-        elif notice.content == "CommentComment":
-            return UserSerializer(
-                notice.parent_comment.children.exclude(author=notice.user).last().author
-            ).data
-
-        elif notice.content == "CommentTag":
-            if notice.parent_comment:
-                return UserSerializer(
-                    notice.parent_comment.children.filter(tagged_users=notice.user)
-                    .exclude(author=notice.user)
-                    .last()
-                    .author
-                ).data
-            else:
-                return UserSerializer(
-                    notice.post.comments.filter(tagged_users=notice.user)
-                    .exclude(author=notice.user)
-                    .last()
-                    .author
-                ).data
-
-        else:
-            return NoticeSenderSerializer(notice.senders.last()).data
+        notice_sender = self.batch.latest_sender(notice)
+        return NoticeSenderSerializer(notice_sender).data if notice_sender else None
 
     def get_senders(self, notice):
-        if notice.content == "PostComment":
-            recent_user = notice.post.comments.exclude(author=notice.user).last().author
-        elif notice.content == "CommentComment":
-            recent_user = (
-                notice.parent_comment.children.exclude(author=notice.user).last().author
-            )
-
+        comment = self.batch.latest_comments[notice.id]
+        if notice.content in ("PostComment", "CommentComment") and comment:
+            recent_user_id = comment.author_id
         else:
-            recent_user = notice.senders.last().user
+            notice_sender = self.batch.latest_sender(notice)
+            recent_user_id = notice_sender.user_id if notice_sender else None
 
         return NoticeSenderSerializer(
-            notice.senders.exclude(user=recent_user), many=True
+            [
+                notice_sender
+                for notice_sender in self.batch.senders[notice.id]
+                if notice_sender.user_id != recent_user_id
+            ],
+            many=True,
         ).data
 
     def get_parent_comment(self, notice):
-        if notice.parent_comment:
-            return NoticeCommentSerializer(notice.parent_comment).data
+        if notice.parent_comment_id:
+            return NoticeCommentSerializer(
+                self.batch.comments[notice.parent_comment_id]
+            ).data
         return None
 
     def get_comment_preview(self, notice):
-        if notice.content == "PostComment":
-            recent_comment = notice.post.comments.exclude(author=notice.user).last()
-        elif notice.content == "CommentComment":
-            recent_comment = notice.parent_comment.children.exclude(
-                author=notice.user
-            ).last()
+        if notice.content in ("PostComment", "CommentComment"):
+            comment = self.batch.latest_comments[notice.id]
+            return NoticeCommentSerializer(comment).data if comment else None
+        return None
 
-        else:
-            return None
+    def get_count(self, notice):
+        return len(self.batch.senders[notice.id]) - 1
 
-        return NoticeCommentSerializer(recent_comment).data
 
-    def get_count(self, notice):
-        return notice.senders.count() - 1
+class NoticePostSerializer(serializers.ModelSerializer):
+    # compact 모드에서 알림과 함께 보여줄 게시글 요약
+    file_variants = ImageVariantsField(source="file_meta")
+
+    class Meta:
+        model = Post
+        fields = ("id", "author", "content", "file", "file_variants", "mainpost")
 
 
 class NoticeSenderSerializer(serializers.ModelSerializer):
@@ -151,11 +171,19 @@ class NoticeSenderSerializer(serializers.ModelSerializer):
     email = serializers.EmailField(source="user.email")
     username = serializers.CharField(source="user.username")
     profile_image = serializers.FileField(source="user.profile_image")
+    profile_image_variants = ImageVariantsField(source="user.profile_image_meta")
     is_valid = serializers.BooleanField(source="user.is_valid")
 
     class Meta:
         model = NoticeSender
-        fields = ("id", "email", "username", "profile_image", "is_valid")
+        fields = (
+            "id",
+            "email",
+            "username",
+            "profile_image",
+            "profile_image_variants",
+            "is_valid",
+        )
 
 
 class NoticeCommentSerializer(serializers.ModelSerializer):
@@ -0,0 +1,24 @@
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+
+from newsfeed.models import Comment, Post
+from .counter import add_unread, subtract_unread
+from .models import Notice
+
+
+@receiver(post_save, sender=Notice)
+def notice_saved(sender, instance, created, **kwargs):
+    if created and not instance.is_checked:
+        add_unread([instance.user_id], 1)
+
+
+# 게시글/댓글과 함께 삭제되는 알림 중 읽지 않은 알림 개수 줄이기 (삭제하는 트랜잭션 안에서)
+# 댓글에 대한 알림은 함께 삭제되는 댓글에서 세므로 게시글에서는 제외해서 한번만
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    subtract_unread(Notice.objects.filter(post=instance, parent_comment=None))
+
+
+@receiver(pre_delete, sender=Comment)
+def comment_deleting(sender, instance, **kwargs):
+    subtract_unread(Notice.objects.filter(parent_comment=instance))
@@ -0,0 +1,142 @@
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+import jwt
+from asgiref.sync import sync_to_async
+from django.core import signals
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_jwt.authentication import JSONWebTokenAuthentication
+from rest_framework_jwt.settings import api_settings
+
+from .hub import get_hub
+
+# 연결이 끊기지 않도록 이벤트가 없을 때 보내는 주석의 주기(초)
+KEEPALIVE_INTERVAL = 15
+
+
+def authenticate(token):
+    try:
+        payload = api_settings.JWT_DECODE_HANDLER(token)
+        return JSONWebTokenAuthentication().authenticate_credentials(payload)
+    except (jwt.InvalidTokenError, AuthenticationFailed, ObjectDoesNotExist):
+        # 탈퇴한 유저의 토큰은 jwt_get_secret_key에서 DoesNotExist
+        return None
+
+
+async def authenticate_scope(scope):
+    headers = dict(scope["headers"])
+    authorization = headers.get(b"authorization", b"").decode()
+    if authorization.startswith("JWT "):
+        token = authorization[4:]
+    else:
+        # EventSource는 헤더를 설정할 수 없으므로 ?token=으로도 받기
+        token = parse_qs(scope["query_string"].decode()).get("token", [None])[0]
+    if not token:
+        return None
+
+    return await run_sync(scope, authenticate, token)
+
+
+async def run_sync(scope, func, *args):
+    # DB를 사용하는 함수를 Django의 요청 처리와 같이 DB 연결을 정리하면서 실행
+    await sync_to_async(signals.request_started.send, thread_sensitive=True)(
+        sender=notice_stream, scope=scope
+    )
+    try:
+        return await sync_to_async(func, thread_sensitive=True)(*args)
+    finally:
+        await sync_to_async(signals.request_finished.send, thread_sensitive=True)(
+            sender=notice_stream
+        )
+
+
+def format_event(event_id, event, data):
+    data = json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+    lines = [f"event: {event}", f"data: {data}"]
+    if event_id is not None:
+        lines.insert(0, f"id: {event_id}")
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+async def wait_disconnect(receive):
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def respond(send, status, body):
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"text/plain; charset=utf-8")],
+        }
+    )
+    await send({"type": "http.response.body", "body": body.encode()})
+
+
+async def notice_stream(scope, receive, send):
+    # 로그인된 유저에게 새로 생기거나 바뀐 알림을 Server-Sent Events로 보내는 ASGI 앱
+    # WSGI worker가 알림 목록 polling을 처리하지 않도록 config/asgi.py에서 연결
+    if scope["method"] != "GET":
+        return await respond(send, 405, "GET만 가능합니다.")
+    user = await authenticate_scope(scope)
+    if user is None:
+        return await respond(send, 401, "로그인이 필요합니다.")
+
+    try:
+        last_event_id = int(dict(scope["headers"]).get(b"last-event-id", b""))
+    except ValueError:
+        last_event_id = None
+
+    hub = get_hub()
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    missed = await run_sync(scope, hub.subscribe, user.id, loop, queue, last_event_id)
+    disconnect = asyncio.ensure_future(wait_disconnect(receive))
+    message = None
+    try:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/event-stream; charset=utf-8"),
+                    (b"cache-control", b"no-cache"),
+                    (b"x-accel-buffering", b"no"),
+                ],
+            }
+        )
+        body = b"retry: 3000\n\n"
+        if missed is None:
+            # 놓친 알림을 알 수 없으므로 클라이언트가 알림 목록을 다시 불러오기
+            body += format_event(None, "resync", {})
+        else:
+            body += b"".join(format_event(*event) for event in missed)
+        await send({"type": "http.response.body", "body": body, "more_body": True})
+
+        while True:
+            if message is None:
+                message = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait(
+                {message, disconnect},
+                timeout=KEEPALIVE_INTERVAL,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if disconnect in done:
+                break
+            if message in done:
+                body = format_event(*message.result())
+                message = None
+            else:
+                body = b": keepalive\n\n"
+            await send({"type": "http.response.body", "body": body, "more_body": True})
+    finally:
+        hub.unsubscribe(user.id, loop, queue)
+        disconnect.cancel()
+        if message is not None:
+            message.cancel()
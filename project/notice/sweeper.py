@@ -0,0 +1,26 @@
+from django.db import transaction
+
+from .counter import subtract_unread
+from .models import Notice, NoticeSender
+from .utils import notice_expired_before
+
+
+def sweep(batch_size=1000):
+    # 만료된 알림을 batch_size개씩 나누어 삭제하고 삭제한 알림 개수를 반환
+    expired_before = notice_expired_before()
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            notice_ids = list(
+                Notice.objects.filter(created__lte=expired_before)
+                .order_by("created")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not notice_ids:
+                return deleted
+            # 읽지 않은 알림 개수는 batch마다 유저별로 한번에 줄이기
+            notices = Notice.objects.filter(id__in=notice_ids)
+            subtract_unread(notices)
+            NoticeSender.objects.filter(notice__in=notice_ids).delete()
+            notices.delete()
+        deleted += len(notice_ids)
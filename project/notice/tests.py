@@ -1,9 +1,24 @@
-from django.test import TestCase
+import asyncio
+from datetime import datetime, timedelta
+from io import StringIO
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.test.client import encode_multipart
 from factory.django import DjangoModelFactory
 from faker import Faker
 from user.models import User
 from newsfeed.models import Post, Comment
+from notice.models import Notice, NoticeEvent, NoticeSender
+from config.asgi import application
+from notice import hub as hub_module
+from notice.counter import mark_all, mark_checked
+from notice.hub import DatabaseHub, InMemoryHub
+from notice.utils import notice_expired_before
+from notice.views import ApplyNoticeCreate
 from rest_framework import status
 from django.core.files.uploadedfile import SimpleUploadedFile
 import os
@@ -1717,3 +1732,683 @@ class NoticeTestCase(TestCase):
         self.assertEqual(data["results"][0]["parent_comment"]["id"], comment_id)
         self.assertEqual(data["results"][0]["sender_preview"]["id"], self.test_user.id)
         self.assertEqual(data["results"][0]["count"], 0)
+
+
+@override_settings(NOTICE_OUTBOX_ENABLED=True)
+class NoticeOutboxTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_user = UserFactory.create(email="notice@test.com")
+        cls.test_friends = UserFactory.create_batch(3)
+        cls.test_post = PostFactory.create(
+            author=cls.test_user, content="알림 테스트 게시물입니다.", likes=0
+        )
+
+    def like(self, user):
+        response = self.client.put(
+            f"/api/v1/newsfeed/{self.test_post.id}/like/",
+            content_type="application/json",
+            HTTP_AUTHORIZATION="JWT " + jwt_token_of(user),
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_notice_outbox(self):
+        # 요청에서는 outbox에만 기록
+        for friend in self.test_friends:
+            self.like(friend)
+        self.like(self.test_friends[0])
+        self.assertEqual(NoticeEvent.objects.count(), 4)
+        self.assertFalse(self.test_user.notices.exists())
+
+        # 처리 후 하나의 알림으로 합쳐짐
+        call_command("process_notice_events", stdout=StringIO())
+        self.assertFalse(NoticeEvent.objects.exists())
+        notice = self.test_user.notices.get()
+        self.assertEqual(notice.content, "PostLike")
+        self.assertEqual(
+            set(notice.senders.values_list("user", flat=True)),
+            {friend.id for friend in self.test_friends[1:]},
+        )
+
+        # 친구 요청 알림
+        response = self.client.post(
+            f"/api/v1/friend/request/{self.test_user.id}/",
+            HTTP_AUTHORIZATION="JWT " + jwt_token_of(self.test_friends[0]),
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        call_command("process_notice_events", stdout=StringIO())
+        self.assertTrue(
+            self.test_user.notices.filter(
+                content="FriendRequest", senders__user=self.test_friends[0]
+            ).exists()
+        )
+
+
+class TagNoticeBulkTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_user = UserFactory.create(email="notice@test.com")
+        cls.test_friends = UserFactory.create_batch(30)
+        cls.user_token = "JWT " + jwt_token_of(cls.test_user)
+        cls.content_type = "multipart/form-data; boundary=BoUnDaRyStRiNg"
+
+    def create_post(self, tagged_users):
+        data = {"content": "태그 테스트입니다.", "tagged_users": tagged_users}
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(
+                "/api/v1/newsfeed/",
+                data=encode_multipart("BoUnDaRyStRiNg", data),
+                content_type=self.content_type,
+                HTTP_AUTHORIZATION=self.user_token,
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.json()["id"], len(context)
+
+    def test_bulk_tag_notice(self):
+        _, one_tag_queries = self.create_post([self.test_friends[0].id])
+        post_id, many_tag_queries = self.create_post(
+            [friend.id for friend in self.test_friends] + [self.test_user.id]
+        )
+        self.assertEqual(one_tag_queries, many_tag_queries)
+
+        # 태그된 유저 모두에게 알림, 작성자 본인에게는 알림 X
+        post = Post.objects.get(id=post_id)
+        self.assertEqual(post.tagged_users.count(), 31)
+        for friend in self.test_friends:
+            notice = friend.notices.get(post=post, content="PostTag")
+            self.assertEqual(notice.senders.get().user, self.test_user)
+        self.assertFalse(self.test_user.notices.exists())
+
+        # 같은 게시글의 댓글 태그 알림은 하나로 합쳐짐
+        for i in range(2):
+            response = self.client.post(
+                f"/api/v1/newsfeed/{post_id}/comment/",
+                data=encode_multipart(
+                    "BoUnDaRyStRiNg",
+                    {
+                        "content": "댓글 태그",
+                        "tagged_users": [friend.id for friend in self.test_friends],
+                    },
+                ),
+                content_type=self.content_type,
+                HTTP_AUTHORIZATION=self.user_token,
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        for friend in self.test_friends:
+            notice = friend.notices.get(post=post, content="CommentTag")
+            self.assertEqual(notice.senders.get().count, 2)
+
+        # 존재하지 않는 유저 태그
+        data = {"content": "태그 테스트입니다.", "tagged_users": [-1]}
+        response = self.client.post(
+            "/api/v1/newsfeed/",
+            data=encode_multipart("BoUnDaRyStRiNg", data),
+            content_type=self.content_type,
+            HTTP_AUTHORIZATION=self.user_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class NoticeListQueryTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_user = UserFactory.create(email="notice@test.com")
+        cls.test_friends = UserFactory.create_batch(3)
+        cls.user_token = "JWT " + jwt_token_of(cls.test_user)
+        cls.content_type = "multipart/form-data; boundary=BoUnDaRyStRiNg"
+
+    def comment(self, post, user, content):
+        response = self.client.post(
+            f"/api/v1/newsfeed/{post.id}/comment/",
+            data=encode_multipart("BoUnDaRyStRiNg", {"content": content}),
+            content_type=self.content_type,
+            HTTP_AUTHORIZATION="JWT " + jwt_token_of(user),
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.json()["id"]
+
+    def notice_list(self, compact=True):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                "/api/v1/notices/",
+                {"compact": "true"} if compact else {},
+                HTTP_AUTHORIZATION=self.user_token,
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()["results"], len(context)
+
+    def add_notices(self):
+        post = PostFactory.create(author=self.test_user, likes=0)
+        for i, friend in enumerate(self.test_friends):
+            self.comment(post, friend, f"댓글 {i}")
+            response = self.client.put(
+                f"/api/v1/newsfeed/{post.id}/like/",
+                content_type="application/json",
+                HTTP_AUTHORIZATION="JWT " + jwt_token_of(friend),
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return post
+
+    def test_notice_list_queries(self):
+        post = self.add_notices()
+        few_notices, few_queries = self.notice_list()
+        _, few_full_queries = self.notice_list(compact=False)
+        for _ in range(3):
+            self.add_notices()
+        many_notices, many_queries = self.notice_list()
+        _, many_full_queries = self.notice_list(compact=False)
+
+        # 알림 개수와 상관없이 고정된 개수의 쿼리
+        self.assertEqual(len(few_notices), 2)
+        self.assertEqual(len(many_notices), 8)
+        self.assertEqual(few_queries, many_queries)
+        self.assertEqual(few_full_queries, many_full_queries)
+
+        # compact 모드에서는 게시글 요약만
+        notice = many_notices[-1]
+        self.assertEqual(notice["post"]["id"], post.id)
+        self.assertNotIn("subposts", notice["post"])
+
+    def test_latest_preview(self):
+        post = PostFactory.create(author=self.test_user, likes=0)
+        first_comment_id = self.comment(post, self.test_friends[0], "첫 댓글")
+        last_comment_id = self.comment(post, self.test_friends[1], "마지막 댓글")
+
+        notice = self.test_user.notices.get(content="PostComment")
+        self.assertEqual(notice.latest_sender, self.test_friends[1])
+        self.assertEqual(notice.latest_comment_id, last_comment_id)
+
+        # 마지막 댓글이 삭제되면 남아있는 댓글로 미리보기 갱신
+        response = self.client.delete(
+            f"/api/v1/newsfeed/{post.id}/{last_comment_id}/",
+            HTTP_AUTHORIZATION="JWT " + jwt_token_of(self.test_friends[1]),
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        notice.refresh_from_db()
+        self.assertEqual(notice.latest_sender, self.test_friends[0])
+        self.assertEqual(notice.latest_comment_id, first_comment_id)
+
+        notices, _ = self.notice_list()
+        self.assertEqual(notices[0]["comment_preview"]["id"], first_comment_id)
+        self.assertEqual(notices[0]["sender_preview"]["id"], self.test_friends[0].id)
+        self.assertEqual(notices[0]["count"], 0)
+
+
+class NoticeExpiryTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_user = UserFactory.create(email="notice@test.com")
+        cls.test_friend = UserFactory.create()
+        cls.user_token = "JWT " + jwt_token_of(cls.test_user)
+        cls.test_posts = [
+            PostFactory.create(author=cls.test_user, likes=0) for _ in range(3)
+        ]
+
+    def test_notice_expiry(self):
+        for days, post in zip((0, 60, 61), self.test_posts):
+            notice = ApplyNoticeCreate(
+                sender=self.test_friend,
+                receiver=self.test_user,
+                content="PostLike",
+                post=post,
+            )
+            Notice.objects.filter(id=notice.id).update(
+                created=datetime.now() - timedelta(days=days, minutes=1)
+            )
+
+        # 만료된 알림은 목록에서 제외되고, 목록을 읽을 때 삭제되지 않음
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                "/api/v1/notices/", HTTP_AUTHORIZATION=self.user_token
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [notice["post"]["id"] for notice in response.json()["results"]],
+            [post.id for post in self.test_posts[:2]],
+        )
+        self.assertFalse(
+            any(query["sql"].startswith("DELETE") for query in context.captured_queries)
+        )
+        self.assertEqual(self.test_user.notices.count(), 3)
+
+        # sweeper가 만료된 알림만 삭제
+        stdout = StringIO()
+        call_command("sweep_notices", "--batch-size", "1", stdout=stdout)
+        self.assertIn("1개", stdout.getvalue())
+        self.assertEqual(
+            list(self.test_user.notices.values_list("post", flat=True).order_by("id")),
+            [post.id for post in self.test_posts[:2]],
+        )
+        self.assertFalse(NoticeSender.objects.filter(notice__post=self.test_posts[2]))
+
+    def test_sweep_unread_count(self):
+        # 유저 3명에게 각각 1, 2, 2개의 만료된 읽지 않은 알림과 1개의 만료되지 않은 알림
+        receivers = [self.test_user] + UserFactory.create_batch(2)
+        for i, receiver in enumerate(receivers):
+            for post in self.test_posts[: min(i, 1) + 1] + self.test_posts[2:]:
+                ApplyNoticeCreate(
+                    sender=self.test_friend,
+                    receiver=receiver,
+                    content="PostLike",
+                    post=post,
+                )
+            receiver.notices.exclude(post=self.test_posts[2]).update(
+                created=datetime.now() - timedelta(days=62)
+            )
+        self.assertEqual(
+            [
+                User.objects.get(id=receiver.id).unread_notice_count
+                for receiver in receivers
+            ],
+            [2, 3, 3],
+        )
+
+        # 알림마다가 아니라 줄이는 개수가 같은 유저끼리 한번에 갱신
+        with CaptureQueriesContext(connection) as context:
+            call_command("sweep_notices", stdout=StringIO())
+        updates = [
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].startswith("UPDATE")
+        ]
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(
+            [
+                User.objects.get(id=receiver.id).unread_notice_count
+                for receiver in receivers
+            ],
+            [1, 1, 1],
+        )
+        self.assertEqual(Notice.objects.count(), 3)
+
+
+class UnreadNoticeCountTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_user = UserFactory.create(email="notice@test.com")
+        cls.test_friends = UserFactory.create_batch(3)
+        cls.user_token = "JWT " + jwt_token_of(cls.test_user)
+        cls.test_posts = [
+            PostFactory.create(author=cls.test_user, likes=0) for _ in range(2)
+        ]
+
+    def unread_count(self, etag=None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        response = self.client.get(
+            "/api/v1/notices/unread-count/",
+            HTTP_AUTHORIZATION=self.user_token,
+            **headers,
+        )
+        return response
+
+    def test_unread_count(self):
+        for post in self.test_posts:
+            for friend in self.test_friends:
+                response = self.client.put(
+                    f"/api/v1/newsfeed/{post.id}/like/",
+                    content_type="application/json",
+                    HTTP_AUTHORIZATION="JWT " + jwt_token_of(friend),
+                )
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.unread_count()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["unread"], 2)
+
+        # 변경이 없으면 304, 인증 외의 쿼리 없음
+        etag = response["ETag"]
+        with CaptureQueriesContext(connection) as context:
+            response = self.unread_count(etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertTrue(
+            all(
+                'FROM "user_user"' in query["sql"] for query in context.captured_queries
+            )
+        )
+
+        # 댓글 알림과 태그 알림(bulk_create)
+        response = self.client.post(
+            f"/api/v1/newsfeed/{self.test_posts[0].id}/comment/",
+            data=encode_multipart(
+                "BoUnDaRyStRiNg",
+                {"content": "태그", "tagged_users": [self.test_user.id]},
+            ),
+            content_type="multipart/form-data; boundary=BoUnDaRyStRiNg",
+            HTTP_AUTHORIZATION="JWT " + jwt_token_of(self.test_friends[0]),
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.unread_count(etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["unread"], 4)
+
+        # 알림 읽기는 한번만 감소
+        notice = self.test_user.notices.get(post=self.test_posts[0], content="PostLike")
+        for _ in range(2):
+            response = self.client.get(
+                f"/api/v1/notices/{notice.id}/", HTTP_AUTHORIZATION=self.user_token
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.unread_count().json()["unread"], 3)
+
+        # 알림 삭제, 게시글 삭제로 함께 삭제된 알림
+        notice = self.test_user.notices.get(content="CommentTag")
+        response = self.client.delete(
+            f"/api/v1/notices/{notice.id}/", HTTP_AUTHORIZATION=self.user_token
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.test_posts[1].delete()
+        self.assertEqual(self.unread_count().json()["unread"], 1)
+
+        # 만료된 알림은 sweep에서 삭제하면서 개수도 감소
+        self.test_user.notices.update(created=datetime.now() - timedelta(days=62))
+        call_command("sweep_notices", stdout=StringIO())
+        self.assertEqual(self.unread_count().json()["unread"], 0)
+
+    def test_cascade_unread(self):
+        # 게시글과 댓글이 함께 삭제되면 두 외래키로 들어오는 알림을 한번만 세기
+        post = self.test_posts[0]
+        for friend in self.test_friends:
+            comment = Comment.objects.create(
+                post=post, author=self.test_user, content="댓글"
+            )
+            for content in ("PostComment", "CommentLike"):
+                ApplyNoticeCreate(
+                    sender=friend,
+                    receiver=self.test_user,
+                    content=content,
+                    post=post,
+                    parent_comment=comment,
+                )
+        ApplyNoticeCreate(
+            sender=self.test_friends[0],
+            receiver=self.test_user,
+            content="PostLike",
+            post=self.test_posts[1],
+        )
+        for notice in self.test_user.notices.filter(content="CommentLike"):
+            mark_checked(notice)
+        self.assertEqual(self.unread_count().json()["unread"], 4)
+
+        post.delete()
+        self.assertEqual(self.unread_count().json()["unread"], 1)
+
+        # 댓글만 삭제
+        comment = Comment.objects.create(
+            post=self.test_posts[1], author=self.test_user, content="댓글"
+        )
+        ApplyNoticeCreate(
+            sender=self.test_friends[0],
+            receiver=self.test_user,
+            content="CommentLike",
+            post=self.test_posts[1],
+            parent_comment=comment,
+        )
+        self.assertEqual(self.unread_count().json()["unread"], 2)
+        comment.delete()
+        self.assertEqual(self.unread_count().json()["unread"], 1)
+
+
+class MarkAllNoticesTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_user = UserFactory.create(email="notice@test.com")
+        cls.test_friend = UserFactory.create()
+        cls.user_token = "JWT " + jwt_token_of(cls.test_user)
+        for _ in range(15):
+            ApplyNoticeCreate(
+                sender=cls.test_friend,
+                receiver=cls.test_user,
+                content="PostLike",
+                post=PostFactory.create(author=cls.test_user, likes=0),
+            )
+
+    def unread_count(self):
+        self.test_user.refresh_from_db()
+        return self.test_user.unread_notice_count
+
+    def test_mark_all(self):
+        self.assertEqual(self.unread_count(), 15)
+
+        # chunk_size개씩 한번의 UPDATE
+        with CaptureQueriesContext(connection) as context:
+            updated = mark_all(self.test_user, True, chunk_size=7)
+        self.assertEqual(updated, 15)
+        self.assertEqual(
+            len(
+                [
+                    query
+                    for query in context.captured_queries
+                    if query["sql"].startswith('UPDATE "notice_notice"')
+                ]
+            ),
+            3,
+        )
+        self.assertEqual(self.unread_count(), 0)
+        self.assertFalse(self.test_user.notices.filter(is_checked=False).exists())
+
+        # 읽지 않음으로 전환 후 첫 페이지만 반환
+        response = self.client.put(
+            "/api/v1/notices/",
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.user_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()["results"]), 10)
+        self.assertFalse(any(n["is_checked"] for n in response.json()["results"]))
+        self.assertEqual(self.unread_count(), 15)
+
+        response = self.client.put(
+            "/api/v1/notices/",
+            data={"is_checked": True},
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.user_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(all(n["is_checked"] for n in response.json()["results"]))
+        self.assertEqual(self.unread_count(), 0)
+
+
+@override_settings(NOTICE_HUB_POLL_INTERVAL=0.05)
+class NoticeStreamTestCase(TransactionTestCase):
+    def setUp(self):
+        # 스트림의 인증은 다른 스레드의 DB 연결에서 실행됨
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("in-memory sqlite는 다른 스레드에서 커밋된 데이터를 볼 수 없음")
+
+        self.test_user = UserFactory.create(email="notice@test.com")
+        self.test_friends = UserFactory.create_batch(2)
+        self.test_post = PostFactory.create(author=self.test_user, likes=0)
+        self.user_token = jwt_token_of(self.test_user)
+        hub_module._hub = None
+
+    def tearDown(self):
+        if isinstance(hub_module._hub, DatabaseHub):
+            hub_module._hub.stop()
+        hub_module._hub = None
+
+    def like(self, user):
+        response = self.client.put(
+            f"/api/v1/newsfeed/{self.test_post.id}/like/",
+            content_type="application/json",
+            HTTP_AUTHORIZATION="JWT " + jwt_token_of(user),
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def connect(self, token, headers=()):
+        communicator = ApplicationCommunicator(
+            application,
+            {
+                "type": "http",
+                "method": "GET",
+                "path": "/api/v1/notices/stream/",
+                "query_string": f"token={token}".encode(),
+                "headers": list(headers),
+            },
+        )
+        return communicator
+
+    async def receive_body(self, communicator):
+        return (await communicator.receive_output(timeout=3))["body"].decode()
+
+    def test_notice_stream(self):
+        async def stream():
+            # 로그인하지 않으면 401
+            communicator = self.connect("invalid")
+            await communicator.send_input({"type": "http.request"})
+            response = await communicator.receive_output(timeout=3)
+            self.assertEqual(response["status"], 401)
+
+            communicator = self.connect(self.user_token)
+            await communicator.send_input({"type": "http.request"})
+            response = await communicator.receive_output(timeout=3)
+            self.assertEqual(response["status"], 200)
+            self.assertIn(
+                (b"content-type", b"text/event-stream; charset=utf-8"),
+                response["headers"],
+            )
+            self.assertTrue((await self.receive_body(communicator)).startswith("retry"))
+
+            # 새 알림이 생기면 바로 전달
+            await sync_to_async(self.like)(self.test_friends[0])
+            body = await self.receive_body(communicator)
+            self.assertIn("event: notice", body)
+            self.assertIn(f'"sender_preview": {{"id": {self.test_friends[0].id}', body)
+            last_event_id = body.split("\n")[0][len("id: ") :]
+
+            await communicator.send_input({"type": "http.disconnect"})
+            await communicator.wait(timeout=3)
+
+            # 연결이 끊긴 동안의 알림은 Last-Event-ID로 재연결할 때 전달
+            await sync_to_async(self.like)(self.test_friends[1])
+            communicator = self.connect(
+                self.user_token,
+                [(b"last-event-id", last_event_id.encode())],
+            )
+            await communicator.send_input({"type": "http.request"})
+            await communicator.receive_output(timeout=3)
+            body = await self.receive_body(communicator)
+            self.assertEqual(body.count("event: notice"), 1)
+            self.assertIn(f'"sender_preview": {{"id": {self.test_friends[1].id}', body)
+            await communicator.send_input({"type": "http.disconnect"})
+            await communicator.wait(timeout=3)
+
+        async_to_sync(stream)()
+
+    @override_settings(NOTICE_HUB_POLL_INTERVAL=0)
+    def test_database_hub(self):
+        # 다른 프로세스의 hub에서 보낸 이벤트도 전달
+        hub, publisher = DatabaseHub(history_size=2), DatabaseHub()
+        loop = asyncio.new_event_loop()
+        queue = asyncio.Queue()
+        user_id = self.test_user.id
+        self.assertEqual(publisher.listening([user_id]), set())
+        # 연결하기 전의 이벤트는 저장하지 않았으므로 다시 불러오기 필요
+        self.assertIsNone(hub.subscribe(user_id, loop, queue, last_event_id=1))
+        self.assertEqual(publisher.listening([user_id, 0]), {user_id})
+
+        ids = [publisher.publish(user_id, "notice", {"id": i}) for i in range(3)]
+        hub.poll()
+        loop.run_until_complete(asyncio.sleep(0))
+        self.assertEqual(
+            [queue.get_nowait() for _ in ids],
+            [(message_id, "notice", {"id": i}) for i, message_id in enumerate(ids)],
+        )
+        self.assertTrue(queue.empty())
+        hub.unsubscribe(user_id, loop, queue)
+
+        # 연결이 끊긴 동안 저장된 이벤트는 재연결할 때 전달
+        self.assertEqual(
+            hub.subscribe(user_id, loop, queue, ids[1]),
+            [(ids[2], "notice", {"id": 2})],
+        )
+        self.assertIsNone(hub.subscribe(user_id, loop, queue, ids[0] - 1))
+        loop.close()
+
+    def test_publish_on_commit(self):
+        # 알림을 만드는 트랜잭션 안에서는 스트림 연결 여부를 확인하지 않고 커밋 후에
+        with CaptureQueriesContext(connection) as context:
+            with transaction.atomic():
+                ApplyNoticeCreate(
+                    sender=self.test_friends[0],
+                    receiver=self.test_user,
+                    content="PostLike",
+                    post=self.test_post,
+                )
+                committed = len(context.captured_queries)
+        listener_queries = [
+            "notice_streamlistener" in query["sql"]
+            for query in context.captured_queries
+        ]
+        self.assertFalse(any(listener_queries[:committed]))
+        self.assertTrue(any(listener_queries[committed:]))
+
+    def test_hub_resync(self):
+        hub = InMemoryHub(history_size=2)
+        loop = asyncio.new_event_loop()
+        queue = asyncio.Queue()
+        # 보관하고 있지 않은 유저는 다시 불러오기 필요
+        self.assertIsNone(hub.subscribe(1, loop, queue, last_event_id=1))
+        ids = [hub.publish(1, "notice", {"id": i}) for i in range(3)]
+        self.assertIsNone(hub.publish(2, "notice", {}))
+        self.assertEqual(hub.listening([1, 2]), {1})
+        self.assertEqual(ids, sorted(set(ids)))
+        self.assertEqual(
+            [message[0] for message in hub.subscribe(1, loop, queue, ids[1])],
+            [ids[2]],
+        )
+        self.assertIsNone(hub.subscribe(1, loop, queue, ids[0] - 1))
+        hub.unsubscribe(1, loop, queue)
+        self.assertFalse(hub.subscribers)
+        loop.close()
+
+
+class NoticeIndexTestCase(TestCase):
+    # 자주 실행되는 알림 쿼리의 인덱스가 있는지, SQLite에서는 EXPLAIN으로 쓰는지 확인
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_user = UserFactory.create(email="notice@test.com")
+        cls.test_friend = UserFactory.create()
+        cls.post = PostFactory.create(author=cls.test_user)
+
+    def assertUsesIndex(self, queryset, model, fields):
+        # 인덱스가 마이그레이션으로 만들어졌는지 확인
+        index = next(index for index in model._meta.indexes if index.fields == fields)
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, model._meta.db_table
+            )
+        self.assertTrue(constraints[index.name]["index"])
+        # 실행 계획은 DB와 데이터 양에 따라 달라지므로 SQLite에서만 확인
+        if connection.vendor == "sqlite":
+            self.assertIn(index.name, queryset.explain())
+
+    def test_notice_list_index(self):
+        queryset = self.test_user.notices.filter(
+            created__gt=notice_expired_before()
+        ).order_by("-created")
+        self.assertUsesIndex(queryset, Notice, ["user", "-created"])
+
+    def test_notice_merge_index(self):
+        queryset = self.test_user.notices.filter(
+            post=self.post, parent_comment=None, content="PostLike"
+        )
+        self.assertUsesIndex(
+            queryset, Notice, ["user", "post", "parent_comment", "content"]
+        )
+
+    def test_unique_notice_sender(self):
+        ApplyNoticeCreate(
+            sender=self.test_friend,
+            receiver=self.test_user,
+            content="PostLike",
+            post=self.post,
+        )
+        ApplyNoticeCreate(
+            sender=self.test_friend,
+            receiver=self.test_user,
+            content="PostLike",
+            post=self.post,
+        )
+        notice = self.test_user.notices.get()
+        self.assertEqual(notice.senders.get().count, 2)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            NoticeSender.objects.create(notice=notice, user=self.test_friend)
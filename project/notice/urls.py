@@ -2,9 +2,11 @@ from django.urls import path
 from .views import (
     NoticeView,
     NoticeListView,
+    UnreadNoticeCountView,
 )
 
 urlpatterns = [
     path("notices/", NoticeListView.as_view()),
+    path("notices/unread-count/", UnreadNoticeCountView.as_view()),
     path("notices/<int:notice_id>/", NoticeView.as_view()),
 ]
@@ -1,5 +1,13 @@
 from datetime import datetime, timedelta
 
+# 알림은 60일이 지나면 만료
+NOTICE_EXPIRE_DAYS = 60
+
+
+def notice_expired_before():
+    # 이 시각 이전에 생성된(created <= 반환값) 알림은 만료된 알림
+    return datetime.now() - timedelta(days=NOTICE_EXPIRE_DAYS + 1)
+
 
 def notice_format_time(time):
     now = datetime.now()
@@ -13,7 +21,28 @@ def notice_format_time(time):
     elif time_elapsed < timedelta(days=7):
         return f"{time_elapsed.days}일"
     else:
-        if time_elapsed.days > 60:
+        if time_elapsed.days > NOTICE_EXPIRE_DAYS:
             return False
         week = time_elapsed.days // 7
         return f"{week}주"
+
+
+def latest_notice_comment(notice, exclude=None):
+    # 댓글 관련 알림의 미리보기로 보여줄 가장 최근 댓글 (알림을 받는 유저가 쓴 댓글 제외)
+    if notice.content == "PostComment":
+        comments = notice.post.comments.all()
+    elif notice.content == "CommentComment":
+        comments = notice.parent_comment.children.all()
+    elif notice.content == "CommentTag":
+        if notice.parent_comment:
+            comments = notice.parent_comment.children.all()
+        else:
+            comments = notice.post.comments.all()
+        comments = comments.filter(tagged_users=notice.user)
+    else:
+        return None
+
+    comments = comments.exclude(author=notice.user)
+    if exclude:
+        comments = comments.exclude(id=exclude.id)
+    return comments.last()
@@ -1,22 +1,294 @@
 from .pagination import NoticePagination
 from .serializers import NoticeSerializer, NoticelistSerializer
-from .models import NoticeSender, Notice
+from .models import NoticeSender, Notice, NoticeEvent
+from .outbox import enqueue, enqueue_bulk
+from .hub import (
+    publish_notices,
+    publish_notice_deleted,
+    publish_notices_deleted,
+)
+from .counter import (
+    add_unread,
+    add_unread_each,
+    delete_notice,
+    mark_all,
+    mark_checked,
+    subtract_unread,
+)
+from .utils import latest_notice_comment, notice_expired_before
 from newsfeed.serializers import PostSerializer
 from rest_framework.response import Response
 from rest_framework.generics import GenericAPIView, ListAPIView
+from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
+from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema, no_body
 from rest_framework import status, permissions
 from newsfeed.models import Post
+from collections import Counter
 from datetime import datetime
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    Case,
+    Count,
+    F,
+    IntegerField,
+    OuterRef,
+    Subquery,
+    Value,
+    When,
+)
 
 
 def NoticeCreate(**context):
+    # 설정에 따라 알림 작업을 outbox에 넣고 process_notice_events에서 처리
+    if settings.NOTICE_OUTBOX_ENABLED:
+        return enqueue(NoticeEvent.CREATE, context)
+    return ApplyNoticeCreate(**context)
+
+
+def NoticeCancel(**context):
+    if settings.NOTICE_OUTBOX_ENABLED:
+        return enqueue(NoticeEvent.CANCEL, context)
+    return ApplyNoticeCancel(**context)
+
+
+def NoticeBulkCreate(**context):
+    # 여러 유저(receivers)에게 같은 알림을 보내기 (태그 알림 등)
+    if settings.NOTICE_OUTBOX_ENABLED:
+        return enqueue_bulk(NoticeEvent.CREATE, context)
+    return ApplyNoticeBulkCreate(**context)
+
+
+def ApplyNoticeBulkCreate(**context):
+    # NoticeCreate와 같은 방식으로 알림을 합치되, 받는 유저 수와 상관없이 고정된 개수의 쿼리로 처리
+    content = context["content"]
+    sender = context["sender"]
+    post = context["post"]
+    parent_comment = context.get("parent_comment")
+    comment = context.get("comment")
+    receivers = set(context["receivers"]) - {sender.id}
+    created = context.get("created") or datetime.now()
+
+    receivers -= set(
+        post.notice_off_users.filter(id__in=receivers).values_list("id", flat=True)
+    )
+    if not receivers:
+        return
+
+    notices = Notice.objects.filter(user__in=receivers, post=post, content=content)
+    if parent_comment:
+        notices = notices.filter(parent_comment=parent_comment)
+
+    existing = {}
+    for notice_id, user_id in notices.order_by("id").values_list("id", "user"):
+        existing.setdefault(user_id, notice_id)
+
+    if existing:
+        latest = {"latest_comment": comment} if comment else {}
+        Notice.objects.filter(id__in=existing.values()).update(
+            created=created, **latest
+        )
+        notice_senders = NoticeSender.objects.filter(
+            notice__in=existing.values(), user=sender
+        )
+        counted = set(notice_senders.values_list("notice", flat=True))
+        notice_senders.update(count=F("count") + 1)
+        uncounted = [
+            notice_id for notice_id in existing.values() if notice_id not in counted
+        ]
+        NoticeSender.objects.bulk_create(
+            [
+                NoticeSender(notice_id=notice_id, user=sender, count=1)
+                for notice_id in uncounted
+            ]
+        )
+        Notice.objects.filter(id__in=uncounted).update(latest_sender=sender)
+
+    new_receivers = receivers - existing.keys()
+    if new_receivers:
+        url = f"api/v1/newsfeed/{post.id}/"
+        if parent_comment and content in ("CommentComment", "CommentTag"):
+            url = f"api/v1/newsfeed/{post.id}/{parent_comment.id}/"
+
+        Notice.objects.bulk_create(
+            [
+                Notice(
+                    user_id=receiver,
+                    post=post,
+                    parent_comment=parent_comment,
+                    content=content,
+                    url=url,
+                    latest_sender=sender,
+                    latest_comment=comment,
+                )
+                for receiver in new_receivers
+            ]
+        )
+        # bulk_create는 post_save를 보내지 않으므로 읽지 않은 알림 개수를 직접 증가
+        add_unread(new_receivers, 1)
+        # bulk_create가 id를 돌려주지 않는 DB(MySQL)를 위해 다시 조회
+        new_notices = Notice.objects.filter(
+            user__in=new_receivers,
+            post=post,
+            parent_comment=parent_comment,
+            content=content,
+        ).values_list("id", flat=True)
+        NoticeSender.objects.bulk_create(
+            [
+                NoticeSender(notice_id=notice_id, user=sender, count=1)
+                for notice_id in new_notices
+            ]
+        )
+
+    # 스트림에 연결된 유저에게 새로 생기거나 합쳐진 알림 보내기
+    publish_notices(notices)
+
+
+def ApplyPostLikeNotices(liked, unliked):
+    # LikeBuffer에서 모아서 반영한 게시글 좋아요/취소((post_id, user_id) 목록)를 작성자의 알림에
+    # NoticeCreate/NoticeCancel과 같은 방식으로 합치되, 게시글/유저 수와 상관없이 고정된 개수의 쿼리로 처리
+    content = "PostLike"
+    authors = dict(
+        Post.objects.filter(
+            id__in={post_id for post_id, _ in [*liked, *unliked]}
+        ).values_list("id", "author")
+    )
+    notice_off = set(
+        Post.notice_off_users.through.objects.filter(
+            post__in=authors, user=F("post__author")
+        ).values_list("post", flat=True)
+    )
+    liked, unliked = (
+        [
+            (post_id, user_id)
+            for post_id, user_id in keys
+            if post_id in authors
+            and post_id not in notice_off
+            and user_id != authors[post_id]
+        ]
+        for keys in (liked, unliked)
+    )
+    if not liked and not unliked:
+        return
+
+    notices = Notice.objects.filter(
+        post__in={post_id for post_id, _ in [*liked, *unliked]},
+        content=content,
+        user=F("post__author"),
+    )
+    existing = {}
+    for notice_id, post_id in notices.order_by("id").values_list("id", "post"):
+        existing.setdefault(post_id, notice_id)
+
+    new_posts = {post_id for post_id, _ in liked} - existing.keys()
+    if new_posts:
+        Notice.objects.bulk_create(
+            [
+                Notice(
+                    user_id=authors[post_id],
+                    post_id=post_id,
+                    content=content,
+                    url=f"api/v1/newsfeed/{post_id}/",
+                )
+                for post_id in new_posts
+            ]
+        )
+        # bulk_create는 post_save를 보내지 않으므로 작성자마다 새 알림 개수만큼 직접 증가
+        add_unread_each(Counter(authors[post_id] for post_id in new_posts))
+        # bulk_create가 id를 돌려주지 않는 DB(MySQL)를 위해 다시 조회
+        for notice_id, post_id in (
+            notices.filter(post__in=new_posts).order_by("id").values_list("id", "post")
+        ):
+            existing.setdefault(post_id, notice_id)
+
+    if liked:
+        pairs = [(existing[post_id], user_id) for post_id, user_id in liked]
+        counted = {
+            (notice_id, user_id): sender_id
+            for sender_id, notice_id, user_id in NoticeSender.objects.filter(
+                notice__in={notice_id for notice_id, _ in pairs},
+                user__in={user_id for _, user_id in pairs},
+            ).values_list("id", "notice", "user")
+        }
+        NoticeSender.objects.filter(
+            id__in=[counted[pair] for pair in pairs if pair in counted]
+        ).update(count=F("count") + 1)
+        uncounted = [pair for pair in pairs if pair not in counted]
+        NoticeSender.objects.bulk_create(
+            [
+                NoticeSender(notice_id=notice_id, user_id=user_id, count=1)
+                for notice_id, user_id in uncounted
+            ]
+        )
+        Notice.objects.filter(id__in={notice_id for notice_id, _ in pairs}).update(
+            created=datetime.now()
+        )
+        # 새로 보낸 유저 중 마지막 유저를 미리보기로
+        latest = dict(uncounted)
+        if latest:
+            Notice.objects.filter(id__in=latest).update(
+                latest_sender=Case(
+                    *[
+                        When(id=notice_id, then=Value(user_id))
+                        for notice_id, user_id in latest.items()
+                    ],
+                    output_field=IntegerField(),
+                )
+            )
+
+    if unliked:
+        pairs = {
+            (existing[post_id], user_id)
+            for post_id, user_id in unliked
+            if post_id in existing
+        }
+        senders = [
+            (sender_id, count)
+            for sender_id, notice_id, user_id, count in NoticeSender.objects.filter(
+                notice__in={notice_id for notice_id, _ in pairs},
+                user__in={user_id for _, user_id in pairs},
+            ).values_list("id", "notice", "user", "count")
+            if (notice_id, user_id) in pairs
+        ]
+        NoticeSender.objects.filter(
+            id__in=[sender_id for sender_id, count in senders if count > 1]
+        ).update(count=F("count") - 1)
+        NoticeSender.objects.filter(
+            id__in=[sender_id for sender_id, count in senders if count <= 1]
+        ).delete()
+
+        # 보낸 유저가 남지 않은 알림은 삭제하고, 남은 알림은 가장 최근 유저로 미리보기 갱신
+        cancelled = Notice.objects.filter(id__in={notice_id for notice_id, _ in pairs})
+        empty = list(
+            cancelled.annotate(sender_count=Count("senders")).filter(sender_count=0)
+        )
+        if empty:
+            publish_notices_deleted(empty)
+            empty = Notice.objects.filter(id__in=[notice.id for notice in empty])
+            subtract_unread(empty)
+            empty.delete()
+        cancelled.update(
+            latest_sender=Subquery(
+                NoticeSender.objects.filter(notice=OuterRef("pk"))
+                .order_by("-id")
+                .values("user")[:1]
+            )
+        )
+
+    # 스트림에 연결된 작성자에게 새로 생기거나 합쳐진 알림 보내기
+    publish_notices(notices)
+
+
+def ApplyNoticeCreate(**context):
     content = context["content"]
     sender = context["sender"]
     post = context.get("post")
     parent_comment = context.get("parent_comment")
     receiver = context["receiver"]
+    comment = context.get("comment")
+    created = context.get("created") or datetime.now()
 
     if post:
         if post.notice_off_users.filter(id=receiver.id).exists():
@@ -35,12 +307,12 @@ def NoticeCreate(**context):
             )
             if notice.exists():
                 notice = notice[0]
+                mark_checked(notice)
                 notice.is_accepted = True
-                notice.is_checked = True
-                notice.save()
+                notice.save(update_fields=["is_accepted"])
 
         data = {
-            "user": receiver,
+            "user": getattr(receiver, "id", receiver),
             "content": content,
             "url": f"api/v1/user/{sender.id}/newsfeed/",
         }
@@ -49,22 +321,30 @@ def NoticeCreate(**context):
             context={"sender": sender},
         )
         serializer.is_valid(raise_exception=True)
-        return serializer.save()
+        notice = serializer.save()
+        publish_notices([notice])
+        return notice
 
     else:
         notice = receiver.notices.filter(post=post, content=content)
 
     if notice:
         notice = notice[0]
-        notice.created = datetime.now()
+        notice.created = created
+        # 같은 유저의 동시 요청이 NoticeSender를 먼저 추가한 경우에는 개수만 증가
+        counted = notice.senders.filter(user=sender)
+        if not counted.update(count=F("count") + 1):
+            try:
+                with transaction.atomic():
+                    NoticeSender.objects.create(notice=notice, user=sender, count=1)
+            except IntegrityError:
+                counted.update(count=F("count") + 1)
+            else:
+                notice.latest_sender = sender
+        if comment:
+            notice.latest_comment = comment
         notice.save()
-        notice_sender = notice.senders.filter(user=sender)
-        if notice_sender.exists():
-            notice_sender = notice_sender[0]
-            notice_sender.count += 1
-            notice_sender.save()
-        else:
-            NoticeSender.objects.create(notice=notice, user=sender, count=1)
+        publish_notices([notice])
 
     else:
 
@@ -74,7 +354,7 @@ def NoticeCreate(**context):
             "post": post.id,
             "url": f"api/v1/newsfeed/{post.id}/",
         }
-        context = {"sender": sender}
+        context = {"sender": sender, "comment": comment}
         if parent_comment:
             data["parent_comment"] = parent_comment.id
 
@@ -87,10 +367,12 @@ def NoticeCreate(**context):
             context=context,
         )
         serializer.is_valid(raise_exception=True)
-        return serializer.save()
+        notice = serializer.save()
+        publish_notices([notice])
+        return notice
 
 
-def NoticeCancel(**context):
+def ApplyNoticeCancel(**context):
 
     receiver = context["receiver"]
     sender = context["sender"]
@@ -108,7 +390,8 @@ def NoticeCancel(**context):
         )
         if notice.exists():
             notice = notice[0]
-            notice.delete()
+            publish_notice_deleted(notice)
+            delete_notice(notice)
             return True
         return False
 
@@ -133,8 +416,18 @@ def NoticeCancel(**context):
                 else:
                     notice_sender.delete()
 
-            if notice.senders.count() == 0:
-                notice.delete()
+            latest_sender = notice.senders.last()
+            if latest_sender is None:
+                publish_notice_deleted(notice)
+                delete_notice(notice)
+            else:
+                # 취소된 댓글/보낸 유저 대신 남아있는 가장 최근 값으로 미리보기 갱신
+                notice.latest_sender = latest_sender.user
+                notice.latest_comment = latest_notice_comment(
+                    notice, exclude=context.get("comment")
+                )
+                notice.save(update_fields=["latest_sender", "latest_comment"])
+                publish_notices([notice])
 
         return True
 
@@ -147,9 +440,11 @@ class NoticeView(GenericAPIView):
         responses={200: NoticelistSerializer()},
     )
     def get(self, request, notice_id=None):
-        notice = get_object_or_404(request.user.notices, id=notice_id)
-        notice.is_checked = True
-        notice.save()
+        notice = get_object_or_404(
+            request.user.notices.filter(created__gt=notice_expired_before()),
+            id=notice_id,
+        )
+        mark_checked(notice)
         return Response(
             self.get_serializer(notice).data,
             status=status.HTTP_200_OK,
@@ -161,7 +456,7 @@ class NoticeView(GenericAPIView):
     def delete(self, request, notice_id=None):
 
         notice = get_object_or_404(request.user.notices, id=notice_id)
-        notice.delete()
+        delete_notice(notice)
         return Response(data="알림이 삭제되었습니다.", status=status.HTTP_204_NO_CONTENT)
 
 
@@ -171,28 +466,65 @@ class NoticeListView(ListAPIView):
     permission_classes = (permissions.IsAuthenticated,)
     pagination_class = NoticePagination
 
+    def get_serializer_context(self):
+        # compact=true이면 게시글 전체 대신 요약만 함께 보내기
+        context = super().get_serializer_context()
+        context["compact"] = self.request.query_params.get("compact") in (
+            "true",
+            "True",
+        )
+        return context
+
     @swagger_auto_schema(
         operation_description="알림 목록 불러오기",
+        manual_parameters=[
+            openapi.Parameter(
+                "compact",
+                openapi.IN_QUERY,
+                description="true이면 게시글 요약만 포함",
+                type=openapi.TYPE_BOOLEAN,
+            ),
+        ],
         responses={200: NoticelistSerializer(many=True)},
     )
     def get(self, request):
-        self.queryset = request.user.notices.all()
+        # 만료된 알림은 목록에서 제외하고, 삭제는 sweep_notices(cron 또는 --loop)에서
+        self.queryset = request.user.notices.filter(created__gt=notice_expired_before())
         return super().list(request)
 
     @swagger_auto_schema(
-        operation_description="테스트용: 유저의 모든 알림의 is_checked를 False로 전환",
-        request_body=no_body,
+        operation_description="유저의 모든 알림을 읽음(is_checked=true) 또는 읽지 않음(기본값)으로 전환",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={"is_checked": openapi.Schema(type=openapi.TYPE_BOOLEAN)},
+        ),
         responses={200: NoticelistSerializer(many=True)},
     )
     def put(self, request):
-        notices = request.user.notices.all()
-        for notice in notices:
-            notice.is_checked = False
-            notice.save()
-        self.queryset = request.user.notices.all()
+        is_checked = request.data.get("is_checked") in (True, "true", "True")
+        mark_all(request.user, is_checked)
+        self.queryset = request.user.notices.filter(created__gt=notice_expired_before())
         return super().list(request)
 
 
+class UnreadNoticeCountView(APIView):
+    permission_classes = (permissions.IsAuthenticated,)
+
+    @swagger_auto_schema(
+        operation_description="읽지 않은 알림 개수 불러오기, If-None-Match가 같으면 304",
+        responses={200: "{'unread': 읽지 않은 알림 개수}", 304: "변경 없음"},
+    )
+    def get(self, request):
+        # 인증할 때 불러온 유저의 값만 사용하므로 추가 쿼리 없음
+        # 만료된 알림은 sweep에서 삭제하면서 개수도 줄이기
+        count = request.user.unread_notice_count
+        etag = f'"{count}"'
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if request.headers.get("If-None-Match") == etag:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response({"unread": count}, status=status.HTTP_200_OK, headers=headers)
+
+
 class NoticeOnOffView(GenericAPIView):
     serializer_class = PostSerializer
 
@@ -0,0 +1,132 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connection
+
+from .models import User, UserSearchToken
+from .search import normalize, query_key, search_keys
+
+# 한번에 보여주는 자동완성 수
+AUTOCOMPLETE_LIMIT = 10
+
+
+class TTLCache:
+    # 최근에 사용한 max_size개를 ttl초 동안 보관하는 프로세스 로컬 캐시
+
+    def __init__(self, ttl, max_size):
+        self.lock = threading.Lock()
+        self.items = OrderedDict()
+        self.ttl = ttl
+        self.max_size = max_size
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None or time.monotonic() - item[0] >= self.ttl:
+                return None
+            self.items.move_to_end(key)
+            return item[1]
+
+    def set(self, key, value):
+        # 트랜잭션 안에서 읽은 값은 롤백될 수 있으므로 보관하지 않음
+        if connection.in_atomic_block:
+            return
+        with self.lock:
+            self.items[key] = (time.monotonic(), value)
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.items.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+
+class FriendPrefixIndex:
+    # 유저 한명의 친구들의 search_keys를 정렬해 두고 bisect로 앞부분이 일치하는 친구 찾기
+
+    def __init__(self, user_id):
+        self.users = {}
+        keys = set()
+        for friend in User.objects.filter(friends=user_id).values(
+            "id", "username", "email", "first_name", "last_name", "profile_image"
+        ):
+            self.users[friend["id"]] = (
+                friend["id"],
+                friend["username"],
+                friend["profile_image"],
+            )
+            for key in search_keys(
+                friend["username"],
+                friend["email"],
+                friend["first_name"],
+                friend["last_name"],
+            ):
+                keys.add((key, friend["id"]))
+        self.keys = sorted(keys)
+
+    def find(self, key, limit):
+        found = []
+        index = bisect_left(self.keys, (key,))
+        while index < len(self.keys) and self.keys[index][0].startswith(key):
+            user_id = self.keys[index][1]
+            if user_id not in found:
+                found.append(user_id)
+                if len(found) == limit:
+                    break
+            index += 1
+        return [self.users[user_id] for user_id in found]
+
+
+friend_indexes = TTLCache(settings.AUTOCOMPLETE_CACHE_TTL, max_size=10000)
+prefix_cache = TTLCache(settings.AUTOCOMPLETE_CACHE_TTL, max_size=10000)
+
+
+def friend_index(user_id):
+    index = friend_indexes.get(user_id)
+    if index is None:
+        index = FriendPrefixIndex(user_id)
+        friend_indexes.set(user_id, index)
+    return index
+
+
+def global_matches(key):
+    # 검색 인덱스에서 앞부분이 일치하는 유저, 모든 유저가 같은 결과를 보므로 prefix마다 캐시
+    users = prefix_cache.get(key)
+    if users is None:
+        # 캐시되는 결과가 DB의 반환 순서에 따라 달라지지 않도록 이름 순서로
+        users = list(
+            UserSearchToken.objects.filter(token=key)
+            .order_by("user__username", "user")
+            .values_list("user", "user__username", "user__profile_image")[
+                : AUTOCOMPLETE_LIMIT * 2
+            ]
+        )
+        prefix_cache.set(key, users)
+    return users
+
+
+def autocomplete(viewer, query):
+    # 친구 중 앞부분이 일치하는 유저 먼저, 남는 자리는 전체 유저로
+    # (id, username, profile_image 파일 이름) 목록
+    query = normalize(query)
+    if not query:
+        return []
+    key = query_key(query)
+    users = friend_index(viewer.id).find(key, AUTOCOMPLETE_LIMIT)
+    if len(users) < AUTOCOMPLETE_LIMIT:
+        found = {user[0] for user in users}
+        for user in global_matches(key):
+            if user[0] not in found:
+                users.append(user)
+                found.add(user[0])
+                if len(users) == AUTOCOMPLETE_LIMIT:
+                    break
+    return users
@@ -0,0 +1,103 @@
+import threading
+import time
+from array import array
+from bisect import insort
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connection
+
+from .models import User
+
+Friendship = User.friends.through
+
+
+class FriendGraph:
+    # 공통 친구 계산용 프로세스 로컬 친구 그래프
+    # 유저별 친구 id를 정렬된 array로 보관하고, 필요한 유저만 한번의 쿼리로 불러오기
+    # 친구 추가/삭제는 커밋 후 signals에서 반영, 다른 프로세스의 변경은 ttl이 지나면 다시 불러와 반영
+
+    def __init__(self, ttl=60, max_users=100000):
+        self.lock = threading.Lock()
+        # friends[user_id] = (불러온 시간, 정렬된 친구 id array)
+        self.friends = OrderedDict()
+        self.ttl = ttl
+        self.max_users = max_users
+
+    def load(self, user_ids):
+        # user_ids의 친구 목록을 반환, 없거나 오래된 것만 DB에서 한번에 불러오기
+        now = time.monotonic()
+        result = {}
+        with self.lock:
+            for user_id in set(user_ids):
+                entry = self.friends.get(user_id)
+                if entry and now - entry[0] < self.ttl:
+                    self.friends.move_to_end(user_id)
+                    result[user_id] = entry[1]
+
+        missing = set(user_ids) - result.keys()
+        if not missing:
+            return result
+
+        loaded = {user_id: array("q") for user_id in missing}
+        for user_id, friend_id in (
+            Friendship.objects.filter(from_user__in=missing)
+            .order_by("from_user", "to_user")
+            .values_list("from_user", "to_user")
+        ):
+            loaded[user_id].append(friend_id)
+        result.update(loaded)
+
+        # 트랜잭션 안에서 읽은 값은 롤백될 수 있으므로 보관하지 않음
+        if not connection.in_atomic_block:
+            with self.lock:
+                for user_id, friend_ids in loaded.items():
+                    self.friends[user_id] = (now, friend_ids)
+                    self.friends.move_to_end(user_id)
+                while len(self.friends) > self.max_users:
+                    self.friends.popitem(last=False)
+        return result
+
+    def add(self, user_id, friend_ids):
+        with self.lock:
+            for a, b in self.pairs(user_id, friend_ids):
+                entry = self.friends.get(a)
+                if entry and b not in entry[1]:
+                    # 다른 스레드가 읽고 있을 수 있으므로 복사해서 바꾸기
+                    ids = array("q", entry[1])
+                    insort(ids, b)
+                    self.friends[a] = (entry[0], ids)
+
+    def remove(self, user_id, friend_ids):
+        with self.lock:
+            for a, b in self.pairs(user_id, friend_ids):
+                entry = self.friends.get(a)
+                if entry and b in entry[1]:
+                    ids = array("q", entry[1])
+                    ids.remove(b)
+                    self.friends[a] = (entry[0], ids)
+
+    def pairs(self, user_id, friend_ids):
+        # 친구 관계는 대칭이므로 양쪽 모두
+        for friend_id in friend_ids:
+            yield user_id, friend_id
+            yield friend_id, user_id
+
+    def forget(self, user_ids):
+        with self.lock:
+            for user_id in user_ids:
+                self.friends.pop(user_id, None)
+
+    def mutual_friends(self, user_id, candidate_ids):
+        # user와 candidate_ids 각각의 공통 친구 (개수, 가장 작은 id)를 한번에 계산
+        # {candidate_id: (count, example_id or None)}
+        graph = self.load([user_id, *candidate_ids])
+        friend_ids = set(graph[user_id])
+        result = {}
+        for candidate_id in candidate_ids:
+            mutual = friend_ids.intersection(graph[candidate_id])
+            result[candidate_id] = (len(mutual), min(mutual) if mutual else None)
+        return result
+
+
+friend_graph = FriendGraph(ttl=settings.FRIEND_GRAPH_TTL)
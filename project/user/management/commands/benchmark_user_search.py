@@ -0,0 +1,124 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from user.models import User, UserSearchToken
+from user.search import choseong, search_users, tokens_for
+
+LAST_NAMES = "김이박최정강조윤장임한오서신권황안송류홍"
+NAME_SYLLABLES = "민서준지현우예도하윤수연채은시유진영호성재희원태경아"
+LATIN_NAMES = ["alice", "brian", "chris", "daniel", "emma", "grace", "james", "luna"]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "가상의 유저를 만들어 검색 인덱스와 username__icontains의 응답 시간 비교하기 (끝나면 롤백)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000000)
+        parser.add_argument("--queries", type=int, default=100)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        started = time.perf_counter()
+        viewer = self.create_users(options["users"], options["batch_size"])
+        self.stdout.write(
+            f"{options['users']}명 생성: {time.perf_counter() - started:.1f}초"
+        )
+
+        names = list(
+            User.objects.filter(email__startswith="benchmark")
+            .order_by("?")
+            .values_list("username", "last_name", "first_name")[: options["queries"]]
+        )
+        queries = []
+        for username, last_name, first_name in names:
+            queries += [
+                last_name + first_name[:1],  # 앞부분
+                first_name,  # 이름만 (중간)
+                choseong(last_name + first_name) or username[:1],  # 초성
+                username[:2],  # 입력 중
+            ]
+        # 이메일
+        queries += [
+            f"benchmark{self.random.randrange(options['users'])}"
+            for _ in range(options["queries"])
+        ]
+
+        for label, search in (
+            ("search index", lambda query: search_users(viewer, query)[:20]),
+            (
+                # 이전 검색 API의 첫 페이지 쿼리
+                "username__icontains",
+                lambda query: list(
+                    User.objects.filter(username__icontains=query).order_by(
+                        "date_joined"
+                    )[:21]
+                ),
+            ),
+        ):
+            latencies = []
+            for query in queries:
+                started = time.perf_counter()
+                search(query)
+                latencies.append((time.perf_counter() - started) * 1000)
+            latencies.sort()
+            self.stdout.write(
+                f"{label}: {len(queries)}개 검색, "
+                f"p50 {statistics.median(latencies):.2f}ms, "
+                f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.2f}ms"
+            )
+
+    def create_users(self, count, batch_size):
+        last_id = User.objects.order_by("-id").values_list("id", flat=True).first()
+        for start in range(0, count, batch_size):
+            users = []
+            for i in range(start, min(start + batch_size, count)):
+                if self.random.random() < 0.1:
+                    last_name = self.random.choice(LATIN_NAMES)
+                    first_name = self.random.choice(LATIN_NAMES)
+                else:
+                    last_name = self.random.choice(LAST_NAMES)
+                    first_name = "".join(self.random.choices(NAME_SYLLABLES, k=2))
+                users.append(
+                    User(
+                        email=f"benchmark{i}@test.com",
+                        username=last_name + first_name,
+                        first_name=first_name,
+                        last_name=last_name,
+                        birth="2000-01-01",
+                        gender="M",
+                    )
+                )
+            User.objects.bulk_create(users)
+            # bulk_create가 id를 돌려주지 않는 DB(MySQL)를 위해 다시 조회
+            users = (
+                User.objects.filter(email__startswith="benchmark", id__gt=last_id or 0)
+                .order_by("id")
+                .values_list("id", "username", "email", "first_name", "last_name")
+            )
+            tokens = []
+            for user_id, username, email, first_name, last_name in users:
+                last_id = user_id
+                tokens += [
+                    UserSearchToken(user_id=user_id, token=token)
+                    for token in tokens_for(username, email, first_name, last_name)
+                ]
+            UserSearchToken.objects.bulk_create(tokens, batch_size=batch_size)
+        return User.objects.filter(email__startswith="benchmark").first()
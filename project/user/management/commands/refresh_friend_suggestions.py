@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from user.suggestions import enqueue_all, refresh
+
+
+class Command(BaseCommand):
+    help = "친구 관계, 회사, 학교가 바뀐 유저의 알 수도 있는 사람 다시 계산하기"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--all", action="store_true", help="모든 유저의 추천을 다시 계산하기")
+        parser.add_argument("--loop", action="store_true", help="종료하지 않고 주기적으로 계산하기")
+        parser.add_argument("--interval", type=float, default=60, help="계산 주기(초)")
+
+    def handle(self, *args, **options):
+        if options["all"]:
+            enqueue_all()
+
+        refreshed = 0
+        while True:
+            # 한번에 batch_size명씩 큐가 빌 때까지
+            while True:
+                count = refresh(options["batch_size"])
+                refreshed += count
+                if count < options["batch_size"]:
+                    break
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+            close_old_connections()
+
+        self.stdout.write(f"{refreshed}명의 추천을 다시 계산했습니다.")
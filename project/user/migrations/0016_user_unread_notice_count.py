@@ -0,0 +1,35 @@
+# Generated by Django 3.2.6 on 2026-10-18 09:47
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_unread_notice_count(apps, schema_editor):
+    User = apps.get_model("user", "User")
+    Notice = apps.get_model("notice", "Notice")
+
+    counts = (
+        Notice.objects.filter(is_checked=False)
+        .values("user")
+        .annotate(count=Count("id"))
+        .values_list("user", "count")
+    )
+    for user_id, count in counts:
+        User.objects.filter(id=user_id).update(unread_notice_count=count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0015_user_is_valid"),
+        ("notice", "0006_notice_created_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="unread_notice_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_unread_notice_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 3.2.6 on 2026-10-18 10:11
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def delete_duplicate_requests(apps, schema_editor):
+    # 같은 (sender, receiver)의 친구 요청은 가장 먼저 보낸 것만 남기기
+    FriendRequest = apps.get_model("user", "FriendRequest")
+
+    duplicates = (
+        FriendRequest.objects.values("sender", "receiver")
+        .annotate(rows=Count("id"), first=Min("id"))
+        .filter(rows__gt=1)
+    )
+    for duplicate in duplicates.iterator():
+        FriendRequest.objects.filter(
+            sender=duplicate["sender"], receiver=duplicate["receiver"]
+        ).exclude(id=duplicate["first"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0016_user_unread_notice_count"),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_requests, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="friendrequest",
+            constraint=models.UniqueConstraint(
+                fields=("sender", "receiver"), name="unique_friend_request"
+            ),
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 3.2.6 on 2026-10-18 10:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def enqueue_users(apps, schema_editor):
+    # 기존 유저의 추천은 refresh_friend_suggestions 명령이 처음 실행될 때 계산
+    User = apps.get_model("user", "User")
+    FriendSuggestionQueue = apps.get_model("user", "FriendSuggestionQueue")
+
+    FriendSuggestionQueue.objects.bulk_create(
+        [
+            FriendSuggestionQueue(user_id=user_id)
+            for user_id in User.objects.values_list("id", flat=True).iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0017_friendrequest_unique"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FriendSuggestionQueue",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="+",
+                        serialize=False,
+                        to="user.user",
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="FriendSuggestion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("score", models.PositiveIntegerField()),
+                ("mutual_count", models.PositiveIntegerField(default=0)),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                (
+                    "candidate",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="friend_suggestions",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="friendsuggestion",
+            index=models.Index(
+                fields=["user", "-score", "candidate"],
+                name="user_friend_user_id_5b5978_idx",
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="friendsuggestion",
+            unique_together={("user", "candidate")},
+        ),
+        migrations.RunPython(enqueue_users, migrations.RunPython.noop),
+    ]
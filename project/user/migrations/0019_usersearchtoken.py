@@ -0,0 +1,157 @@
+# Generated by Django 3.2.6 on 2026-10-18 10:26
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# 이 마이그레이션 시점의 검색 토큰 (user.search가 바뀌어도 결과가 같도록 복사)
+MAX_PREFIX_LENGTH = 20
+
+CHOSEONG_LIST = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+JUNGSEONG_LIST = "ㅏㅐㅑㅒㅓㅔㅕㅖㅗㅘㅙㅚㅛㅜㅝㅞㅟㅠㅡㅢㅣ"
+JONGSEONG_LIST = " ㄱㄲㄳㄴㄵㄶㄷㄹㄺㄻㄼㄽㄾㄿㅀㅁㅂㅄㅅㅆㅇㅈㅊㅋㅌㅍㅎ"
+# 겹모음/겹받침은 자판에서 두번에 나눠 입력하므로 나눠서 비교
+COMPOUND_JAMO = {
+    "ㅘ": "ㅗㅏ",
+    "ㅙ": "ㅗㅐ",
+    "ㅚ": "ㅗㅣ",
+    "ㅝ": "ㅜㅓ",
+    "ㅞ": "ㅜㅔ",
+    "ㅟ": "ㅜㅣ",
+    "ㅢ": "ㅡㅣ",
+    "ㄳ": "ㄱㅅ",
+    "ㄵ": "ㄴㅈ",
+    "ㄶ": "ㄴㅎ",
+    "ㄺ": "ㄹㄱ",
+    "ㄻ": "ㄹㅁ",
+    "ㄼ": "ㄹㅂ",
+    "ㄽ": "ㄹㅅ",
+    "ㄾ": "ㄹㅌ",
+    "ㄿ": "ㄹㅍ",
+    "ㅀ": "ㄹㅎ",
+    "ㅄ": "ㅂㅅ",
+}
+
+
+def normalize(text):
+    return "".join((text or "").lower().split())
+
+
+def is_syllable(char):
+    return "가" <= char <= "힣"
+
+
+def keystrokes(text):
+    # "김와플" -> "ㄱㅣㅁㅇㅗㅏㅍㅡㄹ", 입력 중인 글자("김와ㅍ", "김왚")도 앞부분이 같음
+    result = []
+    for char in text:
+        if is_syllable(char):
+            index = ord(char) - ord("가")
+            char = (
+                CHOSEONG_LIST[index // 588]
+                + JUNGSEONG_LIST[index % 588 // 28]
+                + JONGSEONG_LIST[index % 28].strip()
+            )
+        result.append("".join(COMPOUND_JAMO.get(jamo, jamo) for jamo in char))
+    return "".join(result)
+
+
+def choseong(text):
+    # 한글로만 된 이름의 초성 ("김와플" -> "ㄱㅇㅍ"), 아니면 None
+    if not text or not all(is_syllable(char) for char in text):
+        return None
+    return "".join(CHOSEONG_LIST[(ord(char) - ord("가")) // 588] for char in text)
+
+
+def prefixes(key):
+    # "p:abc" -> {"p:a", "p:ab", "p:abc"}
+    return {key[: length + 2] for length in range(1, len(key) - 1)}
+
+
+def grams(text):
+    return {f"g:{text[i:i + 2]}" for i in range(len(text) - 1)}
+
+
+def searchable_names(username, email, first_name, last_name):
+    # 검색되는 값: 이름(username, 성+이름, 이름, 성)과 이메일 @ 앞부분
+    names = {
+        normalize(name)
+        for name in (username, last_name + first_name, first_name, last_name)
+    }
+    names.discard("")
+    local = normalize(email.split("@")[0])
+    return names, local
+
+
+def search_keys(username, email, first_name, last_name):
+    # 앞부분 검색에 쓰이는 "종류:값" (검색어의 query_key가 이 값의 앞부분이면 일치)
+    names, local = searchable_names(username, email, first_name, last_name)
+    keys = {f"p:{text}" for text in (*names, local) if text}
+    for name in names:
+        if any(is_syllable(char) for char in name):
+            keys.add(f"j:{keystrokes(name)}")
+        initials = choseong(name)
+        if initials:
+            keys.add(f"c:{initials}")
+    return {key[: MAX_PREFIX_LENGTH + 2] for key in keys}
+
+
+def tokens_for(username, email, first_name, last_name):
+    tokens = set()
+    for key in search_keys(username, email, first_name, last_name):
+        tokens |= prefixes(key)
+    # 이메일은 앞부분으로만 검색 (흔한 2글자 토큰이 유저 수만큼 많아지지 않도록)
+    tokens |= grams(normalize(username))
+    return tokens
+
+
+def build_tokens(apps, schema_editor):
+    User = apps.get_model("user", "User")
+    UserSearchToken = apps.get_model("user", "UserSearchToken")
+
+    for user in User.objects.all().iterator():
+        UserSearchToken.objects.bulk_create(
+            [
+                UserSearchToken(user_id=user.id, token=token)
+                for token in tokens_for(
+                    user.username, user.email, user.first_name, user.last_name
+                )
+            ]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0018_friendsuggestion"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserSearchToken",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("token", models.CharField(max_length=32)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("token", "user")},
+            },
+        ),
+        migrations.RunPython(build_tokens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.6 on 2026-10-18 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0019_usersearchtoken"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="cover_image_meta",
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="profile_image_meta",
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
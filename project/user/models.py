@@ -90,6 +90,9 @@ class User(AbstractBaseUser, PermissionsMixin):
     self_intro = models.CharField(max_length=300, blank=True)
     profile_image = models.ImageField(upload_to=get_profile_image_path, blank=True)
     cover_image = models.ImageField(upload_to=get_cover_image_path, blank=True)
+    # 이미지 크기, blurhash와 축소본 이름 (config.images.make_variants)
+    profile_image_meta = models.JSONField(null=True, blank=True)
+    cover_image_meta = models.JSONField(null=True, blank=True)
 
     # friends 는 다대다 + 재귀적 모델, symmetrical 옵션은 대칭이라는 뜻으로
     # 인스타그램처럼 내가 팔로우 해도 상대가 팔로우 안할 수 있는 경우 symmetrical = False
@@ -102,6 +105,10 @@ class User(AbstractBaseUser, PermissionsMixin):
     jwt_secret = models.UUIDField(default=uuid.uuid4)
     # 거주지는 나중에 구현
 
+    # 읽지 않은 알림 개수, notice.counter에서 F()로만 갱신
+    # 유저를 저장할 때는 오래된 값으로 덮어쓰지 않도록 update_fields를 지정
+    unread_notice_count = models.PositiveIntegerField(default=0)
+
     EMAIL_FIELD = "email"
 
     # 유저 모델에서 필드의 이름을 설명하는 string입니다. 유니크 식별자로 사용됩니다
@@ -165,3 +172,42 @@ class FriendRequest(models.Model):
         User, on_delete=CASCADE, related_name="received_friend_request"
     )
     created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["sender", "receiver"], name="unique_friend_request"
+            )
+        ]
+
+
+class FriendSuggestion(models.Model):
+    # 알 수도 있는 사람: refresh_friend_suggestions 명령이 미리 계산해서 저장
+    user = models.ForeignKey(User, on_delete=CASCADE, related_name="friend_suggestions")
+    candidate = models.ForeignKey(User, on_delete=CASCADE, related_name="+")
+    score = models.PositiveIntegerField()
+    mutual_count = models.PositiveIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("user", "candidate")
+        # 추천 목록 (user, 점수 높은 순서)
+        indexes = [models.Index(fields=["user", "-score", "candidate"])]
+
+
+class FriendSuggestionQueue(models.Model):
+    # 친구 관계, 회사, 학교가 바뀌어서 추천을 다시 계산해야 하는 유저
+    user = models.OneToOneField(
+        User, on_delete=CASCADE, primary_key=True, related_name="+"
+    )
+    created = models.DateTimeField(auto_now_add=True)
+
+
+class UserSearchToken(models.Model):
+    # 유저 검색 인덱스, 유저가 저장될 때 user.search.update_tokens로 갱신
+    user = models.ForeignKey(User, on_delete=CASCADE, related_name="+")
+    token = models.CharField(max_length=32)
+
+    class Meta:
+        # token으로 찾을 때 user까지 인덱스에서 읽도록 (token, user) 순서
+        unique_together = ("token", "user")
@@ -7,3 +7,13 @@ class UserPagination(CursorPagination):
 
 class FriendPagination(LimitOffsetPagination):
     offset_query_param = "cursor"
+
+
+class UserSearchPagination(LimitOffsetPagination):
+    # 검색 결과는 순위를 매긴 목록이므로 offset으로
+    offset_query_param = "cursor"
+
+
+class FriendSuggestionPagination(CursorPagination):
+    # 점수가 높은 순서, 같은 점수는 먼저 가입한 유저부터
+    ordering = ("-score", "candidate")
@@ -0,0 +1,290 @@
+from collections import Counter
+
+from django.db.models import Count, Exists, OuterRef, Q
+
+from .friendgraph import friend_graph
+from .models import User, UserSearchToken
+
+# 검색 토큰 종류 (UserSearchToken.token = "종류:값")
+# p: 이름/이메일 앞부분, j: 한글 이름을 자판 입력 순서로 분리한 앞부분, c: 한글 이름 초성의 앞부분
+# g: 이름 중간 검색을 위한 2글자씩 자른 값
+PREFIX = "p"
+JAMO = "j"
+CHOSEONG = "c"
+GRAM = "g"
+
+# 토큰으로 만드는 최대 길이, 더 긴 검색어는 잘라서 찾은 뒤 다시 확인
+MAX_PREFIX_LENGTH = 20
+# 순위를 매기려고 한번에 불러오는 친구, 친구의 친구 수
+HEAD_LIMIT = 100
+
+CHOSEONG_LIST = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+JUNGSEONG_LIST = "ㅏㅐㅑㅒㅓㅔㅕㅖㅗㅘㅙㅚㅛㅜㅝㅞㅟㅠㅡㅢㅣ"
+JONGSEONG_LIST = " ㄱㄲㄳㄴㄵㄶㄷㄹㄺㄻㄼㄽㄾㄿㅀㅁㅂㅄㅅㅆㅇㅈㅊㅋㅌㅍㅎ"
+# 겹모음/겹받침은 자판에서 두번에 나눠 입력하므로 나눠서 비교
+COMPOUND_JAMO = {
+    "ㅘ": "ㅗㅏ",
+    "ㅙ": "ㅗㅐ",
+    "ㅚ": "ㅗㅣ",
+    "ㅝ": "ㅜㅓ",
+    "ㅞ": "ㅜㅔ",
+    "ㅟ": "ㅜㅣ",
+    "ㅢ": "ㅡㅣ",
+    "ㄳ": "ㄱㅅ",
+    "ㄵ": "ㄴㅈ",
+    "ㄶ": "ㄴㅎ",
+    "ㄺ": "ㄹㄱ",
+    "ㄻ": "ㄹㅁ",
+    "ㄼ": "ㄹㅂ",
+    "ㄽ": "ㄹㅅ",
+    "ㄾ": "ㄹㅌ",
+    "ㄿ": "ㄹㅍ",
+    "ㅀ": "ㄹㅎ",
+    "ㅄ": "ㅂㅅ",
+}
+
+
+def normalize(text):
+    return "".join((text or "").lower().split())
+
+
+def is_syllable(char):
+    return "가" <= char <= "힣"
+
+
+def is_hangul(text):
+    # 완성된 글자나 입력 중인 자모가 있는지
+    return any(is_syllable(char) or "ㄱ" <= char <= "ㅣ" for char in text)
+
+
+def keystrokes(text):
+    # "김와플" -> "ㄱㅣㅁㅇㅗㅏㅍㅡㄹ", 입력 중인 글자("김와ㅍ", "김왚")도 앞부분이 같음
+    result = []
+    for char in text:
+        if is_syllable(char):
+            index = ord(char) - ord("가")
+            char = (
+                CHOSEONG_LIST[index // 588]
+                + JUNGSEONG_LIST[index % 588 // 28]
+                + JONGSEONG_LIST[index % 28].strip()
+            )
+        result.append("".join(COMPOUND_JAMO.get(jamo, jamo) for jamo in char))
+    return "".join(result)
+
+
+def choseong(text):
+    # 한글로만 된 이름의 초성 ("김와플" -> "ㄱㅇㅍ"), 아니면 None
+    if not text or not all(is_syllable(char) for char in text):
+        return None
+    return "".join(CHOSEONG_LIST[(ord(char) - ord("가")) // 588] for char in text)
+
+
+def is_choseong(text):
+    return bool(text) and all(char in CHOSEONG_LIST for char in text)
+
+
+def prefixes(key):
+    # "p:abc" -> {"p:a", "p:ab", "p:abc"}
+    return {key[: length + 2] for length in range(1, len(key) - 1)}
+
+
+def grams(text):
+    return {f"{GRAM}:{text[i:i + 2]}" for i in range(len(text) - 1)}
+
+
+def searchable_names(username, email, first_name, last_name):
+    # 검색되는 값: 이름(username, 성+이름, 이름, 성)과 이메일 @ 앞부분
+    names = {
+        normalize(name)
+        for name in (username, last_name + first_name, first_name, last_name)
+    }
+    names.discard("")
+    local = normalize(email.split("@")[0])
+    return names, local
+
+
+def search_keys(username, email, first_name, last_name):
+    # 앞부분 검색에 쓰이는 "종류:값" (검색어의 query_key가 이 값의 앞부분이면 일치)
+    names, local = searchable_names(username, email, first_name, last_name)
+    keys = {f"{PREFIX}:{text}" for text in (*names, local) if text}
+    for name in names:
+        if any(is_syllable(char) for char in name):
+            keys.add(f"{JAMO}:{keystrokes(name)}")
+        initials = choseong(name)
+        if initials:
+            keys.add(f"{CHOSEONG}:{initials}")
+    return {key[: MAX_PREFIX_LENGTH + 2] for key in keys}
+
+
+def query_key(query):
+    # 정규화된 검색어를 search_keys와 비교할 "종류:값"으로
+    if is_choseong(query):
+        key = f"{CHOSEONG}:{query}"
+    elif is_hangul(query):
+        key = f"{JAMO}:{keystrokes(query)}"
+    else:
+        key = f"{PREFIX}:{query}"
+    return key[: MAX_PREFIX_LENGTH + 2]
+
+
+def tokens_for(username, email, first_name, last_name):
+    tokens = set()
+    for key in search_keys(username, email, first_name, last_name):
+        tokens |= prefixes(key)
+    # 이메일은 앞부분으로만 검색 (흔한 2글자 토큰이 유저 수만큼 많아지지 않도록)
+    tokens |= grams(normalize(username))
+    return tokens
+
+
+def update_tokens(user):
+    # 바뀐 토큰만 추가/삭제
+    tokens = tokens_for(user.username, user.email, user.first_name, user.last_name)
+    existing = set(
+        UserSearchToken.objects.filter(user=user.id).values_list("token", flat=True)
+    )
+    if existing - tokens:
+        UserSearchToken.objects.filter(
+            user=user.id, token__in=existing - tokens
+        ).delete()
+    UserSearchToken.objects.bulk_create(
+        [UserSearchToken(user_id=user.id, token=token) for token in tokens - existing],
+        ignore_conflicts=True,
+    )
+
+
+def matches(user, query):
+    # 토큰으로 찾은 후보가 실제로 검색어를 포함하는지 (앞부분 일치: 2, 중간 일치: 1, 없음: 0)
+    names, local = searchable_names(
+        user.username, user.email, user.first_name, user.last_name
+    )
+    if is_choseong(query):
+        names = {choseong(name) or "" for name in names}
+        local = ""
+    elif is_hangul(query):
+        query = keystrokes(query)
+        names = {keystrokes(name) for name in names}
+    texts = (*names, local)
+    if any(text.startswith(query) for text in texts):
+        return 2
+    if any(query in text for text in texts):
+        return 1
+    return 0
+
+
+def matching_ids(query):
+    # 검색어의 토큰과 일치하는 유저 id의 subquery (앞부분 일치, 이름 중간 일치)
+    # 2글자 토큰은 이름 중간의 글자가 떨어져 있어도 일치할 수 있으므로 matches로 다시 확인
+    prefix = UserSearchToken.objects.filter(token=query_key(query)).values("user")
+    query_grams = grams(query)
+    if not query_grams:
+        return prefix, None
+    infix = (
+        UserSearchToken.objects.filter(token__in=query_grams)
+        .values("user")
+        .annotate(count=Count("token"))
+        .filter(count=len(query_grams))
+        .values("user")
+    )
+    return prefix, infix
+
+
+class SearchResults:
+    # 검색 결과를 순위 순서로, 페이지에 필요한 부분만 불러오는 목록 (LimitOffsetPagination에서 count와 slice)
+    # 친구와 공통 친구가 많은 유저(head)는 HEAD_LIMIT명까지 불러와서 순위를 매기고
+    # 나머지(tail)는 앞부분이 일치하는 유저, 중간이 일치하는 유저 순서로 id 순서로
+    # count와 slice가 맞도록 토큰으로만 일치하는 유저는 세기 전에 제외
+
+    def __init__(self, viewer, query):
+        self.query = query
+        prefix, infix = matching_ids(query)
+        matching = Q(id__in=prefix)
+        if infix is not None:
+            matching |= Q(id__in=infix)
+
+        # 검색어와 일치하는 친구, 공통 친구가 많은 친구의 친구 (공통 친구 수)
+        friend_ids = set(friend_graph.load([viewer.id])[viewer.id])
+        mutual = Counter(
+            dict(
+                User.friends.through.objects.filter(
+                    from_user__in=User.objects.filter(matching).values("id"),
+                    to_user__in=friend_ids,
+                )
+                .values("from_user")
+                .annotate(count=Count("to_user"))
+                .order_by("-count", "from_user")
+                .values_list("from_user", "count")[:HEAD_LIMIT]
+            )
+        )
+        candidates = set(mutual) | set(
+            User.objects.filter(matching)
+            .filter(id__in=friend_ids)
+            .order_by("id")
+            .values_list("id", flat=True)[:HEAD_LIMIT]
+        )
+        head_ids = sorted(
+            candidates, key=lambda id: (id not in friend_ids, -mutual[id], id)
+        )[:HEAD_LIMIT]
+        head = User.objects.filter(id__in=head_ids)
+        ranks = {user.id: matches(user, query) for user in head}
+        self.head = sorted(
+            (user for user in head if ranks[user.id]),
+            key=lambda user: (
+                user.id not in friend_ids,
+                -mutual[user.id],
+                -ranks[user.id],
+                len(user.username),
+                user.id,
+            ),
+        )
+
+        tail = User.objects.filter(matching).exclude(id__in=head_ids)
+        key = query_key(query)
+        if len(key) < MAX_PREFIX_LENGTH + 2:
+            # 잘리지 않은 검색어의 앞부분 토큰은 항상 실제로 일치하므로 인덱스에서 세고 페이지만큼
+            self.prefix = tail.filter(id__in=prefix).order_by("id")
+            rest = tail.exclude(id__in=prefix).order_by("id")
+        else:
+            self.prefix = User.objects.none()
+            rest = tail.annotate(
+                prefix=Exists(
+                    UserSearchToken.objects.filter(user=OuterRef("id"), token=key)
+                )
+            ).order_by("-prefix", "id")
+        # 중간 일치(2글자 토큰)와 잘린 앞부분 토큰은 검색에 쓰는 필드만 불러와서 실제로 일치하는 유저만
+        self.rest = [
+            user.id
+            for user in rest.only("id", "username", "email", "first_name", "last_name")
+            if matches(user, query)
+        ]
+        self._prefix_count = None
+
+    def count(self):
+        if self._prefix_count is None:
+            self._prefix_count = self.prefix.count()
+        return len(self.head) + self._prefix_count + len(self.rest)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index : index + 1][0]
+        start, stop = index.start or 0, index.stop
+        count = self.count()
+        if stop is None:
+            stop = count
+        users = self.head[start:stop]
+        start, stop = max(start - len(self.head), 0), stop - len(self.head)
+        if stop > 0:
+            users += list(self.prefix[start:stop])
+            start = max(start - self._prefix_count, 0)
+            stop -= self._prefix_count
+        if stop > 0:
+            rest = User.objects.in_bulk(self.rest[start:stop])
+            users += [rest[id] for id in self.rest[start:stop] if id in rest]
+        return users
+
+
+def search_users(viewer, query):
+    # 검색어와 일치하는 유저를 친구, 공통 친구가 많은 유저, 앞부분이 일치하는 유저, 중간이 일치하는 유저 순서로
+    return SearchResults(viewer, normalize(query))
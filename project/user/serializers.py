@@ -2,13 +2,15 @@ from abc import ABC
 from django.contrib.auth import get_user_model, authenticate
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import update_last_login
-from django.db import transaction
+from django.db import IntegrityError, models, transaction
 from drf_yasg.utils import swagger_serializer_method
 from rest_framework import serializers
 from rest_framework_jwt.settings import api_settings
-from .models import User, Company, University, FriendRequest
+from .models import User, Company, University, FriendRequest, FriendSuggestion
+from .friendgraph import friend_graph
 from datetime import datetime
 from django.contrib.auth.password_validation import validate_password
+from django.core.files.storage import default_storage
 from .utils import validate_gender, validate_birth
 
 
@@ -84,14 +86,40 @@ class UserLoginSerializer(serializers.Serializer):
         return {"user": user, "token": jwt_token_of(user)}
 
 
+class ImageVariantsField(serializers.ReadOnlyField):
+    # <field>_meta를 이미지 크기, blurhash와 가로 크기별 축소본 URL로, 아직 만들지 않았거나 이미지가 아니면 None
+    def to_representation(self, meta):
+        if not meta:
+            return None
+        request = self.context.get("request")
+        urls = {}
+        for width, name in meta["variants"].items():
+            url = default_storage.url(name)
+            urls[width] = request.build_absolute_uri(url) if request else url
+        return {
+            "width": meta["width"],
+            "height": meta["height"],
+            "blurhash": meta["blurhash"],
+            "urls": urls,
+        }
+
+
 class UserSerializer(serializers.ModelSerializer):
 
     # 추가 필드 선언
+    profile_image_variants = ImageVariantsField(source="profile_image_meta")
 
     class Meta:
         model = User
         # Django 기본 User 모델에 존재하는 필드 중 일부
-        fields = ("id", "email", "username", "profile_image", "is_valid")
+        fields = (
+            "id",
+            "email",
+            "username",
+            "profile_image",
+            "profile_image_variants",
+            "is_valid",
+        )
         extra_kwargs = {"password": {"write_only": True}}
 
     def validate(self, data):
@@ -106,7 +134,50 @@ class UserSerializer(serializers.ModelSerializer):
         return user
 
 
+def mutual_friends_of(users, context):
+    # 로그인된 유저와 users 각각의 공통 친구 개수와 예시를 한번에 계산
+    request = context.get("request")
+    if request is None:
+        return {}
+    user_ids = [user.id for user in users if user.id != request.user.id]
+    mutual_friends = friend_graph.mutual_friends(request.user.id, user_ids)
+    usernames = dict(
+        User.objects.filter(
+            id__in={example for _, example in mutual_friends.values() if example}
+        ).values_list("id", "username")
+    )
+    return {
+        user_id: {"count": count, "example": usernames.get(example)}
+        for user_id, (count, example) in mutual_friends.items()
+    }
+
+
+class MutualFriendsListSerializer(serializers.ListSerializer):
+    # 목록의 유저(user_attr가 있으면 각 객체의 user_attr 유저)의 공통 친구를 한번에 계산
+    user_attr = None
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.Manager) else data)
+        users = [
+            getattr(item, self.user_attr) if self.user_attr else item for item in items
+        ]
+        self._context = {
+            **self.context,
+            "mutual_friends": mutual_friends_of(users, self.context),
+        }
+        return super().to_representation(items)
+
+
+class FriendRequestListSerializer(MutualFriendsListSerializer):
+    user_attr = "sender"
+
+
+class FriendSuggestionListSerializer(MutualFriendsListSerializer):
+    user_attr = "candidate"
+
+
 class UserMutualFriendsSerializer(serializers.ModelSerializer):
+    profile_image_variants = ImageVariantsField(source="profile_image_meta")
     is_friend = serializers.SerializerMethodField()
     mutual_friends = serializers.SerializerMethodField()
     friend_info = serializers.SerializerMethodField(
@@ -121,23 +192,23 @@ class UserMutualFriendsSerializer(serializers.ModelSerializer):
             "email",
             "username",
             "profile_image",
+            "profile_image_variants",
             "is_friend",
             "mutual_friends",
             "friend_info",
         )
         extra_kwargs = {"password": {"write_only": True}}
+        list_serializer_class = MutualFriendsListSerializer
 
-    # 공통 친구의 개수와 예시 최대 2명까지 나열
+    # 공통 친구의 개수와 예시 1명, 목록에서는 MutualFriendsListSerializer가 한번에 계산
     def get_mutual_friends(self, user):
         request_user = self.context["request"].user
         if user == request_user:
             return None
-        mutual_friends = request_user.friends.all() & user.friends.all()
-        count = len(mutual_friends)
-        example = mutual_friends.first()
-        example_username = example.username if example else None
-        data = {"count": count, "example": example_username}
-        return data
+        mutual_friends = self.context.get("mutual_friends") or {}
+        if user.id not in mutual_friends:
+            mutual_friends = mutual_friends_of([user], self.context)
+        return mutual_friends[user.id]
 
     def get_is_friend(self, user):
         request_user = self.context["request"].user
@@ -265,6 +336,8 @@ class UserProfileSerializer(serializers.ModelSerializer):
 
     company = CompanySerializer(many=True, read_only=True)
     university = UniversitySerializer(many=True, read_only=True)
+    profile_image_variants = ImageVariantsField(source="profile_image_meta")
+    cover_image_variants = ImageVariantsField(source="cover_image_meta")
     friend_info = serializers.SerializerMethodField(
         read_only=True,
         help_text="오류 상황시 None, 본인이면 self, 친구이면 friend, 로그인된 유저가 요청을 보냈으면 sent, 로그인된 유저가 요청을 받았으면 received, 아무것도 아니면 nothing",
@@ -282,7 +355,9 @@ class UserProfileSerializer(serializers.ModelSerializer):
             "gender",
             "self_intro",
             "profile_image",
+            "profile_image_variants",
             "cover_image",
+            "cover_image_variants",
             "company",
             "university",
             "friend_info",
@@ -307,10 +382,12 @@ class UserProfileSerializer(serializers.ModelSerializer):
         return data
 
     def update(self, instance, validated_data):
-        user = super().update(instance, validated_data)
-        user.username = user.last_name + user.first_name
-        user.save()
-        return user
+        # 읽지 않은 알림 개수 등 다른 필드를 덮어쓰지 않도록 바뀐 필드만 저장
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.username = instance.last_name + instance.first_name
+        instance.save(update_fields=[*validated_data, "username"])
+        return instance
 
     def get_friend_info(self, user):
         request = self.context.get("request")
@@ -334,11 +411,19 @@ class FriendRequestCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = FriendRequest
         fields = "__all__"
+        list_serializer_class = FriendRequestListSerializer
 
     def create(self, validated_data):
         sender = validated_data.get("sender")
         receiver = validated_data.get("receiver")
-        friend_request = FriendRequest.objects.create(sender=sender, receiver=receiver)
+        try:
+            with transaction.atomic():
+                friend_request = FriendRequest.objects.create(
+                    sender=sender, receiver=receiver
+                )
+        except IntegrityError:
+            # validate와 create 사이에 같은 요청이 먼저 저장된 경우
+            raise serializers.ValidationError("이미 이 유저에게 친구 요청을 보냈습니다.")
         return friend_request
 
     def validate(self, data):
@@ -362,6 +447,21 @@ class FriendRequestCreateSerializer(serializers.ModelSerializer):
         ).data
 
 
+class FriendSuggestionSerializer(serializers.ModelSerializer):
+    candidate_profile = serializers.SerializerMethodField()
+
+    class Meta:
+        model = FriendSuggestion
+        fields = ("id", "candidate", "score", "mutual_count", "candidate_profile")
+        list_serializer_class = FriendSuggestionListSerializer
+
+    @swagger_serializer_method(serializer_or_field=UserMutualFriendsSerializer)
+    def get_candidate_profile(self, suggestion):
+        return UserMutualFriendsSerializer(
+            suggestion.candidate, context=self.context
+        ).data
+
+
 # 친구 요청 수락 및 삭제
 class FriendRequestAcceptDeleteSerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,105 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .autocomplete import friend_indexes
+from .friendgraph import friend_graph
+from .models import Company, FriendRequest, FriendSuggestion, University, User
+from .search import update_tokens
+from .suggestions import enqueue
+
+SEARCH_FIELDS = {"username", "email", "first_name", "last_name"}
+
+
+@receiver(m2m_changed, sender=User.friends.through)
+def friends_changed(sender, instance, action, pk_set, **kwargs):
+    # 롤백된 변경이 친구 그래프에 남지 않도록 커밋 후에 반영
+    if action == "post_add":
+        transaction.on_commit(partial(friend_graph.add, instance.id, set(pk_set)))
+
+    elif action == "post_remove":
+        transaction.on_commit(partial(friend_graph.remove, instance.id, set(pk_set)))
+
+    elif action == "pre_clear":
+        friend_ids = list(instance.friends.values_list("id", flat=True))
+        transaction.on_commit(partial(friend_graph.remove, instance.id, friend_ids))
+
+
+@receiver(m2m_changed, sender=User.friends.through)
+def friends_changed_autocomplete(sender, instance, action, pk_set, **kwargs):
+    # 친구가 바뀐 유저의 자동완성 친구 목록은 다음 검색 때 다시 만들기
+    if action in ("post_add", "post_remove"):
+        user_ids = {instance.id, *pk_set}
+    elif action == "pre_clear":
+        user_ids = {instance.id, *instance.friends.values_list("id", flat=True)}
+    else:
+        return
+    for user_id in user_ids:
+        transaction.on_commit(partial(friend_indexes.delete, user_id))
+
+
+@receiver(m2m_changed, sender=User.friends.through)
+def friends_changed_suggestions(sender, instance, action, pk_set, **kwargs):
+    # 두 유저와 두 유저의 친구들의 친구의 친구가 바뀌므로 추천을 다시 계산
+    if action in ("post_add", "post_remove"):
+        user_ids = {instance.id, *pk_set}
+        if action == "post_add":
+            forget_suggestions(instance.id, pk_set)
+    elif action == "pre_clear":
+        user_ids = {instance.id}
+    else:
+        return
+    enqueue(
+        user_ids.union(
+            User.friends.through.objects.filter(from_user__in=user_ids).values_list(
+                "to_user", flat=True
+            )
+        )
+    )
+
+
+@receiver(post_save, sender=FriendRequest)
+def friend_request_saved(sender, instance, created, **kwargs):
+    # 친구 요청을 보냈거나 받은 유저는 서로의 추천에서 바로 제외
+    if created:
+        forget_suggestions(instance.sender_id, [instance.receiver_id])
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, **kwargs):
+    if created:
+        enqueue([instance.id])
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    # 로그인 시간 갱신처럼 이름/이메일이 바뀌지 않는 저장은 검색 인덱스에 영향이 없음
+    if update_fields is not None and not SEARCH_FIELDS.intersection(update_fields):
+        return
+    update_tokens(instance)
+
+
+@receiver(post_save, sender=Company)
+@receiver(post_delete, sender=Company)
+@receiver(post_save, sender=University)
+@receiver(post_delete, sender=University)
+def affiliation_changed(sender, instance, **kwargs):
+    enqueue([instance.user_id])
+
+
+def forget_suggestions(user_id, other_ids):
+    FriendSuggestion.objects.filter(
+        Q(user=user_id, candidate__in=other_ids)
+        | Q(user__in=other_ids, candidate=user_id)
+    ).delete()
+
+
+@receiver(pre_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    # 탈퇴한 유저는 친구들의 친구 목록에서도 제거
+    friend_ids = list(instance.friends.values_list("id", flat=True))
+    transaction.on_commit(partial(friend_graph.remove, instance.id, friend_ids))
+    transaction.on_commit(partial(friend_graph.forget, [instance.id]))
@@ -0,0 +1,139 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .friendgraph import FriendGraph
+from .models import (
+    Company,
+    FriendRequest,
+    FriendSuggestion,
+    FriendSuggestionQueue,
+    University,
+    User,
+)
+
+# 알 수도 있는 사람 점수: 공통 친구 1명당 MUTUAL_WEIGHT, 같은 회사/학교 1곳당 COMPANY/UNIVERSITY_WEIGHT
+MUTUAL_WEIGHT = 1
+COMPANY_WEIGHT = 5
+UNIVERSITY_WEIGHT = 3
+
+# 유저마다 저장하는 추천 수
+SUGGESTION_LIMIT = 50
+# 같은 회사/학교 한 곳에서 후보로 가져오는 유저 수 (큰 회사/학교에서 후보가 너무 많아지지 않도록)
+AFFILIATION_LIMIT = 200
+
+
+def enqueue(user_ids):
+    # 추천을 다시 계산할 유저로 표시, refresh에서 batch로 처리
+    # 탈퇴 중인 유저(회사/학교가 함께 삭제되는 경우)는 제외
+    user_ids = list(
+        User.objects.filter(id__in=set(user_ids)).values_list("id", flat=True)
+    )
+    # 이미 큐에 있는 유저는 refresh가 계산 중이어도 다시 계산하도록 created를 갱신
+    FriendSuggestionQueue.objects.filter(user__in=user_ids).update(
+        created=timezone.now()
+    )
+    FriendSuggestionQueue.objects.bulk_create(
+        [FriendSuggestionQueue(user_id=user_id) for user_id in user_ids],
+        ignore_conflicts=True,
+    )
+
+
+def enqueue_all(chunk_size=1000):
+    # 모든 유저를 chunk_size명씩 큐에 넣기
+    last_id = 0
+    while True:
+        user_ids = list(
+            User.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", flat=True)[:chunk_size]
+        )
+        if not user_ids:
+            return
+        enqueue(user_ids)
+        last_id = user_ids[-1]
+
+
+def affiliation_candidates(model, user_id):
+    # user와 같은 이름의 회사(학교)에 다닌 유저별로 겹치는 곳의 수
+    names = set(model.objects.filter(user=user_id).values_list("name", flat=True))
+    overlaps = Counter()
+    for name in names:
+        colleagues = (
+            model.objects.filter(name=name)
+            .exclude(user=user_id)
+            .values_list("user", flat=True)
+            .distinct()[:AFFILIATION_LIMIT]
+        )
+        overlaps.update(colleagues)
+    return overlaps
+
+
+def suggest(user_id, graph):
+    # 친구의 친구를 공통 친구 수로, 같은 회사/학교 유저를 겹치는 곳의 수로 점수를 매겨
+    # 점수가 높은 순서로 SUGGESTION_LIMIT개의 (candidate_id, score, mutual_count)
+    friend_ids = graph.load([user_id])[user_id]
+    mutual = Counter()
+    for friends_of_friend in graph.load(friend_ids).values():
+        mutual.update(friends_of_friend)
+
+    companies = affiliation_candidates(Company, user_id)
+    universities = affiliation_candidates(University, user_id)
+
+    # 자신, 이미 친구인 유저와 친구 요청을 보냈거나 받은 유저는 제외
+    excluded = {user_id, *friend_ids}
+    for sender, receiver in FriendRequest.objects.filter(
+        Q(sender=user_id) | Q(receiver=user_id)
+    ).values_list("sender", "receiver"):
+        excluded.update((sender, receiver))
+
+    scores = defaultdict(int)
+    for candidate_id, count in mutual.items():
+        scores[candidate_id] += count * MUTUAL_WEIGHT
+    for candidate_id, count in companies.items():
+        scores[candidate_id] += count * COMPANY_WEIGHT
+    for candidate_id, count in universities.items():
+        scores[candidate_id] += count * UNIVERSITY_WEIGHT
+
+    ranked = sorted(
+        (
+            (candidate_id, score, mutual[candidate_id])
+            for candidate_id, score in scores.items()
+            if candidate_id not in excluded
+        ),
+        # 점수가 같으면 먼저 가입한(id가 작은) 유저부터
+        key=lambda suggestion: (-suggestion[1], suggestion[0]),
+    )
+    return ranked[:SUGGESTION_LIMIT]
+
+
+def refresh(batch_size=100):
+    # 큐에서 batch_size명을 꺼내 추천을 다시 계산하고 계산한 유저 수를 반환
+    queued = list(
+        FriendSuggestionQueue.objects.order_by("created").values_list(
+            "user", "created"
+        )[:batch_size]
+    )
+
+    # batch 안에서만 친구 목록을 공유해 다른 프로세스의 변경이 오래 반영되지 않는 일이 없도록
+    graph = FriendGraph()
+    for user_id, created in queued:
+        suggestions = suggest(user_id, graph)
+        with transaction.atomic():
+            FriendSuggestion.objects.filter(user=user_id).delete()
+            FriendSuggestion.objects.bulk_create(
+                [
+                    FriendSuggestion(
+                        user_id=user_id,
+                        candidate_id=candidate_id,
+                        score=score,
+                        mutual_count=mutual_count,
+                    )
+                    for candidate_id, score, mutual_count in suggestions
+                ]
+            )
+            # 계산에 성공한 유저만 큐에서 빼고, 계산하는 동안 다시 바뀐(created가 갱신된) 유저는 남겨두기
+            FriendSuggestionQueue.objects.filter(user=user_id, created=created).delete()
+    return len(queued)
@@ -1,19 +1,34 @@
-from django.test import TestCase
+from io import StringIO
+from unittest.mock import patch
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
 from factory.django import DjangoModelFactory
-from user.models import User, Company, University, FriendRequest
+from user.models import (
+    User,
+    Company,
+    University,
+    FriendRequest,
+    FriendSuggestionQueue,
+)
 from faker import Faker
 from newsfeed.models import Post
-from user.serializers import jwt_token_of
+from user.serializers import FriendRequestCreateSerializer, jwt_token_of
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.test import APITestCase
 import datetime
 import os
 from pathlib import Path
 import json
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.db import transaction
+from django.db import connection, transaction
+from django.test.client import encode_multipart
+from django.test.utils import CaptureQueriesContext
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
+from .autocomplete import autocomplete, friend_indexes, prefix_cache
+from .friendgraph import FriendGraph, friend_graph
+from .suggestions import enqueue, refresh, suggest
 from .utils import account_activation_token
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -1308,6 +1323,18 @@ class FriendTestCase(TestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
+    def test_friend_request_unique(self):
+        # validate를 통과한 뒤 같은 요청이 먼저 저장된 경우
+        serializer = FriendRequestCreateSerializer()
+        with self.assertRaises(ValidationError):
+            serializer.create({"sender": self.test_user, "receiver": self.receiver})
+        self.assertEqual(
+            FriendRequest.objects.filter(
+                sender=self.test_user, receiver=self.receiver
+            ).count(),
+            1,
+        )
+
     def test_accept_friend_request(self):
         user = self.test_user
         user_token = "JWT " + jwt_token_of(user)
@@ -1418,6 +1445,325 @@ class SearchTestCase(TestCase):
         self.assertTrue(data["results"][0]["is_friend"])
         self.assertEqual(data["results"][0]["mutual_friends"]["count"], 0)
 
+    def search(self, query):
+        response = self.client.get(
+            "/api/v1/search/",
+            {"q": query},
+            HTTP_AUTHORIZATION="JWT " + jwt_token_of(self.test_user),
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [user["id"] for user in response.json()["results"]]
+
+    def test_search_korean(self):
+        # 성+이름, 입력 중인 글자, 초성, 이름만
+        for query in ("김와", "김와ㅍ", "김왚", "ㄱㅇㅍ", "ㄱㅇ", "와플", "김 와플"):
+            self.assertIn(self.test_user.id, self.search(query))
+        for query in ("김와플ㅇ", "ㄴㅇ", "와플김치"):
+            self.assertNotIn(self.test_user.id, self.search(query))
+
+    def test_search_email(self):
+        local = self.test_stranger.email.split("@")[0]
+        self.assertEqual(self.search(local.upper()), [self.test_stranger.id])
+        # 이메일은 앞부분으로만 검색
+        user = UserFactory.create(email="waffle.studio@test.com")
+        self.assertEqual(self.search("Waffle"), [user.id])
+        self.assertEqual(self.search("studio"), [])
+
+    def test_search_ranking(self):
+        # 친구 > 공통 친구가 많은 유저 > 앞부분이 일치하는 유저
+        infix = UserFactory.create(first_name="나검색", last_name="가")
+        prefix = UserFactory.create(first_name="가", last_name="검색")
+        mutual = UserFactory.create(first_name="검색", last_name="나")
+        friend = UserFactory.create(first_name="검색", last_name="다")
+        mutual.friends.add(self.test_mutual_friends[0])
+        self.test_user.friends.add(friend)
+        self.assertEqual(self.search("검색"), [friend.id, mutual.id, prefix.id, infix.id])
+
+    def test_search_common_prefix(self):
+        # 앞부분이 일치하는 유저가 많아도 친구, 공통 친구가 있는 유저가 먼저 나오고 중간 일치도 빠지지 않음
+        strangers = [
+            UserFactory.create(first_name=f"검색{i}", last_name="가") for i in range(25)
+        ]
+        infix = UserFactory.create(first_name="나검색", last_name="가")
+        mutual = UserFactory.create(first_name="검색", last_name="나")
+        friend = UserFactory.create(first_name="검색", last_name="다")
+        mutual.friends.add(self.test_mutual_friends[0])
+        self.test_user.friends.add(friend)
+
+        response = self.client.get(
+            "/api/v1/search/",
+            {"q": "검색", "limit": 20},
+            HTTP_AUTHORIZATION="JWT " + jwt_token_of(self.test_user),
+        )
+        data = response.json()
+        self.assertEqual(data["count"], 28)
+        ids = [user["id"] for user in data["results"]]
+        self.assertEqual(ids[:3], [friend.id, mutual.id, strangers[0].id])
+
+        response = self.client.get(
+            data["next"], HTTP_AUTHORIZATION="JWT " + jwt_token_of(self.test_user)
+        )
+        ids += [user["id"] for user in response.json()["results"]]
+        self.assertEqual(ids[2:-1], [user.id for user in strangers])
+        self.assertEqual(ids[-1], infix.id)
+
+    def test_search_false_positive(self):
+        # 2글자 토큰만 일치하는 유저는 count와 페이지에서 모두 제외
+        UserFactory.create_batch(3, first_name="가색어", last_name="검색")
+        prefix = UserFactory.create(first_name="어", last_name="검색")
+        infix = UserFactory.create(first_name="검색어", last_name="가")
+
+        response = self.client.get(
+            "/api/v1/search/",
+            {"q": "검색어", "limit": 1},
+            HTTP_AUTHORIZATION="JWT " + jwt_token_of(self.test_user),
+        )
+        data = response.json()
+        self.assertEqual(data["count"], 2)
+        self.assertEqual([user["id"] for user in data["results"]], [prefix.id])
+
+        response = self.client.get(
+            data["next"], HTTP_AUTHORIZATION="JWT " + jwt_token_of(self.test_user)
+        )
+        data = response.json()
+        self.assertEqual([user["id"] for user in data["results"]], [infix.id])
+        self.assertIsNone(data["next"])
+
+    def test_search_tokens_on_save(self):
+        # 이름/이메일이 아닌 필드만 저장하면 검색 토큰을 다시 만들지 않음
+        user = self.test_stranger
+        user.self_intro = "안녕하세요"
+        with CaptureQueriesContext(connection) as context:
+            user.save(update_fields=["self_intro"])
+        self.assertFalse(
+            any(
+                "user_usersearchtoken" in query["sql"]
+                for query in context.captured_queries
+            )
+        )
+
+        # 프로필 수정은 읽지 않은 알림 개수를 덮어쓰지 않고, 이름이 바뀌면 토큰을 다시 만들기
+        User.objects.filter(id=user.id).update(unread_notice_count=3)
+        response = self.client.put(
+            f"/api/v1/user/{user.id}/profile/",
+            data=encode_multipart("BoUnDaRyStRiNg", {"first_name": "스튜디오"}),
+            content_type="multipart/form-data; boundary=BoUnDaRyStRiNg",
+            HTTP_AUTHORIZATION="JWT " + jwt_token_of(user),
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertEqual(user.unread_notice_count, 3)
+        self.assertIn(user.id, self.search("스튜디오"))
+        self.assertNotIn(user.id, self.search("cd"))
+
+    def test_mutual_friends_batch(self):
+        # 검색 결과 한 페이지의 공통 친구를 한번의 쿼리로 계산
+        candidates = [self.test_stranger, *self.test_mutual_friends]
+        with self.assertNumQueries(1):
+            mutual_friends = friend_graph.mutual_friends(
+                self.test_user.id, [user.id for user in candidates]
+            )
+        self.assertEqual(
+            mutual_friends[self.test_stranger.id],
+            (25, min(user.id for user in self.test_mutual_friends)),
+        )
+        for user in self.test_mutual_friends:
+            self.assertEqual(mutual_friends[user.id], (0, None))
+
+
+class UserSearchBenchmarkTestCase(TestCase):
+    def test_benchmark(self):
+        stdout = StringIO()
+        call_command(
+            "benchmark_user_search", "--users", "50", "--queries", "2", stdout=stdout
+        )
+        self.assertIn("search index", stdout.getvalue())
+        # 가상의 유저는 롤백
+        self.assertFalse(User.objects.filter(email__startswith="benchmark").exists())
+
+
+class FriendGraphTestCase(TransactionTestCase):
+    # 커밋된 친구 목록만 보관하므로 TransactionTestCase에서 확인
+    def setUp(self):
+        self.users = UserFactory.create_batch(4)
+        self.graph = FriendGraph()
+        friend_graph.forget(user.id for user in self.users)
+
+    def test_add_remove(self):
+        a, b, c, d = self.users
+        a.friends.add(c, d)
+        b.friends.add(c)
+        self.assertEqual(self.graph.mutual_friends(a.id, [b.id]), {b.id: (1, c.id)})
+
+        # 보관된 친구 목록을 사용
+        with self.assertNumQueries(0):
+            self.graph.mutual_friends(a.id, [b.id])
+
+        with patch("user.signals.friend_graph", self.graph):
+            b.friends.add(d)
+            self.assertEqual(self.graph.mutual_friends(a.id, [b.id]), {b.id: (2, c.id)})
+            c.friends.remove(a)
+            self.assertEqual(self.graph.mutual_friends(a.id, [b.id]), {b.id: (1, d.id)})
+            d.delete()
+            with self.assertNumQueries(0):
+                self.assertEqual(
+                    self.graph.mutual_friends(a.id, [b.id]), {b.id: (0, None)}
+                )
+
+    def test_in_transaction(self):
+        a, b, c, _ = self.users
+        with transaction.atomic():
+            a.friends.add(c)
+            b.friends.add(c)
+            self.assertEqual(self.graph.mutual_friends(a.id, [b.id]), {b.id: (1, c.id)})
+            transaction.set_rollback(True)
+        # 롤백된 친구 목록은 보관되지 않음
+        self.assertEqual(self.graph.mutual_friends(a.id, [b.id]), {b.id: (0, None)})
+
+
+class AutocompleteTestCase(TransactionTestCase):
+    # 커밋된 값만 캐시하므로 TransactionTestCase에서 확인
+    def setUp(self):
+        self.user = UserFactory.create(first_name="와플", last_name="김")
+        self.stranger = UserFactory.create(first_name="플", last_name="김와")
+        self.friend = UserFactory.create(first_name="와플이", last_name="김")
+        self.user.friends.add(self.friend)
+        friend_indexes.clear()
+        prefix_cache.clear()
+
+    def autocomplete(self, query):
+        response = self.client.get(
+            "/api/v1/search/autocomplete/",
+            {"q": query},
+            HTTP_AUTHORIZATION="JWT " + jwt_token_of(self.user),
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_autocomplete(self):
+        data = self.autocomplete("김와")
+        # 친구 먼저
+        self.assertEqual(data[0]["id"], self.friend.id)
+        # 나머지는 이름, id 순서
+        self.assertEqual(
+            [user["id"] for user in data],
+            [self.friend.id, self.user.id, self.stranger.id],
+        )
+        self.assertEqual(set(data[0]), {"id", "username", "profile_image"})
+        self.assertEqual(data[0]["username"], "김와플이")
+        self.assertIsNone(data[0]["profile_image"])
+
+        self.assertEqual(
+            [user["id"] for user in self.autocomplete("ㄱㅇㅍㅇ")], [self.friend.id]
+        )
+        self.assertEqual(self.autocomplete("없는유저"), [])
+
+        response = self.client.get(
+            "/api/v1/search/autocomplete/",
+            HTTP_AUTHORIZATION="JWT " + jwt_token_of(self.user),
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cache(self):
+        self.autocomplete("김와")
+        with self.assertNumQueries(0):
+            self.assertEqual(len(autocomplete(self.user, "김와")), 3)
+
+        # 친구가 바뀌면 친구 목록만 다시 불러오기
+        self.user.friends.add(self.stranger)
+        with self.assertNumQueries(1):
+            users = autocomplete(self.user, "김와")
+        self.assertEqual(
+            {user[0] for user in users[:2]}, {self.friend.id, self.stranger.id}
+        )
+
+
+class FriendSuggestionTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_user = UserFactory.create()
+        # b, c: 친구, d: b, c의 친구, e: b의 친구이면서 친구 요청을 받은 유저
+        # f: 같은 회사, g: 같은 학교, h: 관계없는 유저
+        cls.b, cls.c, cls.d, cls.e, cls.f, cls.g, cls.h = UserFactory.create_batch(7)
+        cls.test_user.friends.add(cls.b, cls.c)
+        cls.b.friends.add(cls.d, cls.e)
+        cls.c.friends.add(cls.d)
+        FriendRequestFactory.create(sender=cls.test_user, receiver=cls.e)
+        CompanyFactory.create(user=cls.test_user, name="와플스튜디오")
+        CompanyFactory.create(user=cls.f, name="와플스튜디오")
+        UniversityFactory.create(user=cls.test_user, name="서울대학교")
+        UniversityFactory.create(user=cls.g, name="서울대학교")
+        cls.user_token = "JWT " + jwt_token_of(cls.test_user)
+
+    def refresh(self):
+        stdout = StringIO()
+        call_command("refresh_friend_suggestions", "--batch-size", "3", stdout=stdout)
+        return stdout.getvalue()
+
+    def test_suggestions(self):
+        self.assertEqual(self.refresh(), "8명의 추천을 다시 계산했습니다.\n")
+        self.assertEqual(FriendSuggestionQueue.objects.count(), 0)
+
+        response = self.client.get(
+            "/api/v1/friend/suggestion/",
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.user_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()["results"]
+        # 같은 회사(5) > 같은 학교(3) > 공통 친구 2명(2), 친구 요청을 보낸 e는 제외
+        self.assertEqual(
+            [(item["candidate"], item["score"]) for item in data],
+            [(self.f.id, 5), (self.g.id, 3), (self.d.id, 2)],
+        )
+        self.assertEqual(data[2]["mutual_count"], 2)
+        self.assertEqual(data[2]["candidate_profile"]["mutual_friends"]["count"], 2)
+        self.assertEqual(data[2]["candidate_profile"]["friend_info"], "nothing")
+
+        # d의 추천에도 test_user가 있음
+        self.assertTrue(
+            self.d.friend_suggestions.filter(candidate=self.test_user).exists()
+        )
+
+    def test_refresh_failure(self):
+        # 계산에 실패하면 큐에 남고, 계산 중에 다시 바뀐 유저도 큐에 남음
+        with patch("user.suggestions.suggest", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                refresh(3)
+        self.assertEqual(FriendSuggestionQueue.objects.count(), 8)
+
+        def suggest_and_change(user_id, graph):
+            enqueue([user_id])
+            return suggest(user_id, graph)
+
+        with patch("user.suggestions.suggest", side_effect=suggest_and_change):
+            self.assertEqual(refresh(3), 3)
+        self.assertEqual(FriendSuggestionQueue.objects.count(), 8)
+        self.assertEqual(self.refresh(), "8명의 추천을 다시 계산했습니다.\n")
+        self.assertEqual(FriendSuggestionQueue.objects.count(), 0)
+
+    def test_friendship_change(self):
+        self.refresh()
+        self.test_user.friends.add(self.d)
+        # 친구가 된 유저는 서로의 추천에서 바로 제외
+        self.assertFalse(
+            self.test_user.friend_suggestions.filter(candidate=self.d).exists()
+        )
+        self.assertFalse(
+            self.d.friend_suggestions.filter(candidate=self.test_user).exists()
+        )
+        # 두 유저와 그 친구들의 추천을 다시 계산
+        self.assertEqual(
+            set(FriendSuggestionQueue.objects.values_list("user", flat=True)),
+            {self.test_user.id, self.b.id, self.c.id, self.d.id},
+        )
+        self.refresh()
+        # d의 친구의 친구 중 친구가 아닌 유저는 b의 친구 e만 남음
+        self.assertEqual(
+            list(self.d.friend_suggestions.values_list("candidate", "mutual_count")),
+            [(self.e.id, 1)],
+        )
+
 
 class TokenTestCase(APITestCase):
     @classmethod
@@ -13,7 +13,9 @@ from .views import (
     UserFriendRequestView,
     UserFriendDeleteView,
     UserFriendListView,
+    FriendSuggestionListView,
     UserSearchListView,
+    UserAutocompleteView,
     UserProfileView,
     UserProfileImageView,
     CompanyCreateView,
@@ -90,8 +92,18 @@ urlpatterns = [
         UserFriendRequestView.as_view(),
         name="friend_request",
     ),
+    path(
+        "friend/suggestion/",
+        FriendSuggestionListView.as_view(),
+        name="friend_suggestion",
+    ),  # /api/v1/friend/suggestion/
     path("friend/", UserFriendDeleteView.as_view(), name="friend"),  # /api/v1/friend/
     path("search/", UserSearchListView.as_view(), name="search"),  # /api/v1/search/
+    path(
+        "search/autocomplete/",
+        UserAutocompleteView.as_view(),
+        name="search_autocomplete",
+    ),  # /api/v1/search/autocomplete/
     path("token/refresh/", refresh_jwt_token),  # /api/v1/token/refresh/
 ]
 
@@ -27,7 +27,11 @@ from config.settings import get_secret
 from user.models import KakaoId, Company, University, FriendRequest
 from rest_framework.viewsets import GenericViewSet
 from user.models import KakaoId, FriendRequest
-from user.pagination import UserPagination, FriendPagination
+from user.pagination import (
+    FriendPagination,
+    FriendSuggestionPagination,
+    UserSearchPagination,
+)
 from newsfeed.serializers import PostSerializer
 from user.serializers import (
     UserSerializer,
@@ -39,6 +43,7 @@ from user.serializers import (
     jwt_token_of,
     FriendRequestCreateSerializer,
     FriendRequestAcceptDeleteSerializer,
+    FriendSuggestionSerializer,
     UserMutualFriendsSerializer,
 )
 from user.swagger import (
@@ -47,9 +52,14 @@ from user.swagger import (
     UserProfileImageSwaggerSerializer,
 )
 from newsfeed.models import Post
+from newsfeed.visibility import get_visibility
+from user.autocomplete import autocomplete
+from user.search import search_users
 from drf_yasg.utils import swagger_auto_schema
 from .utils import account_activation_token, message
 from config.permissions import IsValidAccount
+from config.images import generate_variants
+from newsfeed.blobs import save_blob, set_blob
 import uuid
 
 from newsfeed.views import NoticeCreate, NoticeCancel
@@ -95,7 +105,7 @@ class UserActivateView(APIView):
         user = get_object_or_404(User.objects.all(), pk=uid)
         if account_activation_token.check_token(user, token):
             user.is_valid = True
-            user.save()
+            user.save(update_fields=["is_valid"])
             return Response("활성화가 완료되었습니다.", status=status.HTTP_200_OK)
         return Response("활성화에 실패했습니다.", status=status.HTTP_400_BAD_REQUEST)
 
@@ -135,7 +145,7 @@ class UserLogoutView(APIView):
 
     def get(self, request):
         request.user.jwt_secret = uuid.uuid4()
-        request.user.save()
+        request.user.save(update_fields=["jwt_secret"])
 
         return Response("로그아웃 되었습니다.", status=status.HTTP_200_OK)
 
@@ -171,7 +181,7 @@ class UserFriendRequestListView(ListAPIView):
         responses={200: FriendRequestCreateSerializer(many=True)},
     )
     def get(self, request):
-        self.queryset = request.user.received_friend_request.all()
+        self.queryset = request.user.received_friend_request.select_related("sender")
         return super().list(request)
 
     def get_context_data(self, **kwargs):
@@ -281,7 +291,7 @@ class UserFriendDeleteView(APIView):
 class UserSearchListView(ListAPIView):
     serializer_class = UserMutualFriendsSerializer
     permission_classes = (permissions.IsAuthenticated & IsValidAccount,)
-    pagination_class = UserPagination
+    pagination_class = UserSearchPagination
 
     @swagger_auto_schema(
         operation_description="유저 검색하기",
@@ -302,10 +312,65 @@ class UserSearchListView(ListAPIView):
             return Response(
                 status=status.HTTP_400_BAD_REQUEST, data="search key를 입력해주세요"
             )
-        self.queryset = User.objects.filter(username__icontains=search_key)
+        # 이름/이메일/초성 검색 인덱스에서 찾은 유저를 친구, 공통 친구 순서로
+        self.queryset = search_users(request.user, search_key)
         return super().list(request)
 
 
+class UserAutocompleteView(APIView):
+    permission_classes = (permissions.IsAuthenticated & IsValidAccount,)
+
+    @swagger_auto_schema(
+        operation_description="유저 검색어 자동완성 (친구 먼저, 최대 10명)",
+        manual_parameters=[
+            openapi.Parameter(
+                "q",
+                openapi.IN_QUERY,
+                description="search key",
+                type=openapi.TYPE_STRING,
+                required=True,
+            ),
+        ],
+        responses={
+            200: openapi.Schema(
+                type=openapi.TYPE_ARRAY,
+                items=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        "id": openapi.Schema(type=openapi.TYPE_INTEGER),
+                        "username": openapi.Schema(type=openapi.TYPE_STRING),
+                        "profile_image": openapi.Schema(type=openapi.TYPE_STRING),
+                    },
+                ),
+            )
+        },
+    )
+    def get(self, request):
+        search_key = request.GET.get("q")
+        if not search_key:
+            return Response(
+                status=status.HTTP_400_BAD_REQUEST, data="search key를 입력해주세요"
+            )
+        # 입력할 때마다 호출되므로 serializer 없이 캐시된 값만으로 응답
+        storage = User._meta.get_field("profile_image").storage
+        return Response(
+            [
+                {
+                    "id": user_id,
+                    "username": username,
+                    "profile_image": request.build_absolute_uri(
+                        storage.url(profile_image)
+                    )
+                    if profile_image
+                    else None,
+                }
+                for user_id, username, profile_image in autocomplete(
+                    request.user, search_key
+                )
+            ]
+        )
+
+
 class KakaoLoginView(APIView):
     permission_classes = (permissions.AllowAny,)
 
@@ -449,14 +514,9 @@ class UserNewsfeedView(ListAPIView):
     def get(self, request, user_id=None):
         user = get_object_or_404(User, pk=user_id)
 
-        if request.user == user:
-            self.queryset = user.posts.filter(mainpost=None)
-
-        elif request.user in user.friends.all():
-            self.queryset = user.posts.filter(mainpost=None, scope__gt=1)
-
-        else:
-            self.queryset = user.posts.filter(mainpost=None, scope__gt=2)
+        # 자신은 모든 게시글, 친구는 친구 공개 이상, 그 외에는 전체 공개 게시글
+        scope = get_visibility(request).min_scope(user.id)
+        self.queryset = user.posts.filter(mainpost=None, scope__gte=scope)
 
         return super().list(request)
 
@@ -482,6 +542,23 @@ class UserFriendListView(ListAPIView):
         return context
 
 
+class FriendSuggestionListView(ListAPIView):
+    serializer_class = FriendSuggestionSerializer
+    permission_classes = (permissions.IsAuthenticated & IsValidAccount,)
+    pagination_class = FriendSuggestionPagination
+
+    @swagger_auto_schema(
+        operation_description="알 수도 있는 사람 목록 가져오기 (공통 친구, 같은 회사/학교 기준)",
+        responses={200: FriendSuggestionSerializer(many=True)},
+    )
+    def get(self, request):
+        # refresh_friend_suggestions 명령이 미리 계산해둔 추천
+        self.queryset = request.user.friend_suggestions.filter(
+            candidate__is_valid=True
+        ).select_related("candidate")
+        return super().list(request)
+
+
 class UserProfileView(RetrieveUpdateAPIView):
     serializer_class = UserProfileSerializer
     queryset = User.objects.all()
@@ -524,12 +601,16 @@ class UserProfileView(RetrieveUpdateAPIView):
             return Response(
                 status=status.HTTP_403_FORBIDDEN, data="다른 유저의 프로필을 고칠 수 없습니다."
             )
-        profile_image = request.FILES.get("profile_image")
-        if profile_image:
-            user.profile_image.save(profile_image.name, profile_image, save=True)
-        cover_image = request.FILES.get("cover_image")
-        if cover_image:
-            user.cover_image.save(cover_image.name, cover_image, save=True)
+        for field_name in ("profile_image", "cover_image"):
+            file = request.FILES.get(field_name)
+            if file:
+                # 같은 내용의 파일이 이미 있으면 다시 올리지 않고 같이 사용
+                name = save_blob(User._meta.get_field(field_name).storage, file)
+                with transaction.atomic():
+                    set_blob(user, field_name, name)
+                    setattr(user, f"{field_name}_meta", None)
+                    user.save(update_fields=[field_name, f"{field_name}_meta"])
+                    generate_variants([user], field_name)
         return super().update(request, pk=pk, partial=True)
 
     # 부모의 patch 메서드를 drf-yasg가 읽지 않게 오버리이딩
@@ -556,11 +637,14 @@ class UserProfileImageView(APIView):
             )
         serializer = UserProfileImageSwaggerSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        if serializer.data["profile_image"]:
-            user.profile_image = None
-        if serializer.data["cover_image"]:
-            user.cover_image = None
-        user.save()
+        with transaction.atomic():
+            update_fields = []
+            for field_name in ("profile_image", "cover_image"):
+                if serializer.data[field_name]:
+                    set_blob(user, field_name, "")
+                    setattr(user, f"{field_name}_meta", None)
+                    update_fields += [field_name, f"{field_name}_meta"]
+            user.save(update_fields=update_fields)
         return Response(self.serializer_class(user).data, status.HTTP_200_OK)
 
 